@@ -0,0 +1,64 @@
+"""Benchmark network stats on synthetic grid street networks."""
+
+import time
+
+import networkx as nx
+
+import osmnx as ox
+
+
+def make_grid_graph(size):
+    """
+    Make a synthetic lat-lng grid of two-way streets.
+
+    Parameters
+    ----------
+    size : int
+        the number of nodes along each side of the grid
+
+    Returns
+    -------
+    G : networkx.MultiDiGraph
+    """
+    grid = nx.grid_2d_graph(size, size)
+    G = nx.MultiDiGraph(crs=ox.settings.default_crs)
+    ids = {node: i for i, node in enumerate(grid.nodes)}
+    for (col, row), i in ids.items():
+        G.add_node(i, x=-122 + col * 1e-3, y=37 + row * 1e-3)
+    for a, b in grid.edges:
+        G.add_edge(ids[a], ids[b], length=100.0, oneway=False)
+        G.add_edge(ids[b], ids[a], length=100.0, oneway=False)
+    return G
+
+
+def benchmark(func, G, repeats=3):
+    """
+    Time the fastest of several calls of a function on a graph.
+
+    Parameters
+    ----------
+    func : function
+        the function to call with the graph
+    G : networkx.MultiDiGraph
+        input graph
+    repeats : int
+        how many times to call the function
+
+    Returns
+    -------
+    float
+        the fastest call's duration in seconds
+    """
+    durations = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        func(G)
+        durations.append(time.perf_counter() - start_time)
+    return min(durations)
+
+
+if __name__ == "__main__":
+    for size in (50, 100, 200, 300):
+        G = make_grid_graph(size)
+        duration = benchmark(ox.basic_stats, G)
+        print(f"basic_stats: {len(G):,} nodes, {len(G.edges):,} edges: {duration:.2f}s")
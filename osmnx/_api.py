@@ -3,12 +3,16 @@
 from .bearing import add_edge_bearings
 from .boundaries import gdf_from_place
 from .boundaries import gdf_from_places
+from .columnar import graph_from_columns
+from .columnar import graph_to_columns
 from .distance import get_nearest_edge
 from .distance import get_nearest_edges
 from .distance import get_nearest_node
 from .distance import get_nearest_nodes
+from .elevation import add_edge_grade_profiles
 from .elevation import add_edge_grades
 from .elevation import add_node_elevations
+from .elevation import add_node_elevations_raster
 from .folium import plot_graph_folium
 from .folium import plot_route_folium
 from .footprints import footprints_from_address
@@ -21,9 +25,15 @@ from .graph import graph_from_place
 from .graph import graph_from_point
 from .graph import graph_from_polygon
 from .graph import graph_from_xml
+from .io import load_graph_binary
+from .io import load_graph_geoparquet
+from .io import load_graph_tiles
 from .io import load_graphml
+from .io import save_graph_binary
 from .io import save_graph_geopackage
+from .io import save_graph_geoparquet
 from .io import save_graph_shapefile
+from .io import save_graph_tiles
 from .io import save_graph_xml
 from .io import save_graphml
 from .plot import plot_figure_ground
@@ -39,10 +49,14 @@ from .pois import pois_from_polygon
 from .projection import project_graph
 from .simplification import consolidate_intersections
 from .simplification import simplify_graph
+from .speed import add_edge_speed_profiles
 from .speed import add_edge_speeds
 from .speed import add_edge_travel_times
+from .speed import shortest_path_time_dependent
 from .stats import basic_stats
+from .stats import basic_stats_batch
 from .stats import extended_stats
+from .stats import gridded_stats
 from .utils import citation
 from .utils import config
 from .utils import log
@@ -2,8 +2,13 @@
 
 import math
 
+import networkx as nx
 import numpy as np
 
+from . import distance
+from . import utils
+from . import utils_graph
+
 
 def get_bearing(origin_point, destination_point):
     """
@@ -44,37 +49,89 @@ def get_bearing(origin_point, destination_point):
     return bearing
 
 
-def add_edge_bearings(G):
+def get_bearing_vec(lat1, lng1, lat2, lng2):
+    """
+    Calculate compass bearings.
+
+    Vectorized function to calculate the compass bearing from one point to
+    another or between vectors of points.
+
+    Parameters
+    ----------
+    lat1 : float or array of float
+        origin lat coord
+    lng1 : float or array of float
+        origin lng coord
+    lat2 : float or array of float
+        destination lat coord
+    lng2 : float or array of float
+        destination lng coord
+
+    Returns
+    -------
+    bearing : float or np.array of floats
+        the compass bearing or array of bearings in decimal degrees from the
+        origin point(s) to the destination point(s)
+    """
+    # get latitudes and the difference in longitude, as radians
+    lat1 = np.deg2rad(lat1)
+    lat2 = np.deg2rad(lat2)
+    diff_lng = np.deg2rad(lng2 - lng1)
+
+    # calculate initial bearing from -180 degrees to +180 degrees
+    x = np.sin(diff_lng) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - (np.sin(lat1) * np.cos(lat2) * np.cos(diff_lng))
+    initial_bearing = np.arctan2(x, y)
+
+    # normalize initial bearing to 0 degrees to 360 degrees to get compass bearing
+    initial_bearing = np.rad2deg(initial_bearing)
+    bearing = (initial_bearing + 360) % 360
+
+    return bearing
+
+
+def add_edge_bearings(G, use_geometry=False):
     """
     Add bearing attributes to all graph edges.
 
     Calculate the compass bearing from origin node to destination
     node for each edge in the directed graph then add each bearing
-    as a new edge attribute.
+    as a new edge attribute. If use_geometry is True, calculate the bearing
+    of edges with geometries instead as the length-weighted mean of their
+    segments' bearings, so a curving edge's bearing follows its shape.
 
     Parameters
     ----------
     G : networkx.MultiDiGraph
         input graph
+    use_geometry : bool
+        if True, calculate bearings along edges' geometries rather than
+        straight between their endpoints
 
     Returns
     -------
     G : networkx.MultiDiGraph
         graph with edge bearing attributes
     """
-    for u, v, data in G.edges(keys=False, data=True):
-
-        if u == v:
-            # a self-loop has an undefined compass bearing
-            data["bearing"] = np.nan
-
-        else:
-            # calculate bearing from edge's origin to its destination
-            origin_point = (G.nodes[u]["y"], G.nodes[u]["x"])
-            destination_point = (G.nodes[v]["y"], G.nodes[v]["x"])
-            bearing = get_bearing(origin_point, destination_point)
-
-            # round to thousandth of a degree
-            data["bearing"] = round(bearing, 3)
-
+    edges, segments, segment_edges = utils_graph._get_edge_segments(G, use_geometry)
+    x1, y1, x2, y2 = segments.T
+    bearings = get_bearing_vec(y1, x1, y2, x2)
+
+    if use_geometry:
+        # sum each edge's segments as vectors weighted by their lengths, then
+        # take the bearing of the resulting vector
+        lengths = np.nan_to_num(distance.great_circle_vec(y1, x1, y2, x2))
+        radians = np.deg2rad(bearings)
+        east = np.bincount(segment_edges, weights=lengths * np.sin(radians), minlength=len(edges))
+        north = np.bincount(segment_edges, weights=lengths * np.cos(radians), minlength=len(edges))
+        bearings = (np.rad2deg(np.arctan2(east, north)) + 360) % 360
+
+    # a self-loop has an undefined compass bearing
+    bearings[[u == v for u, v, _ in edges]] = np.nan
+
+    # round to thousandth of a degree
+    values = dict(zip(edges, bearings.round(3).tolist()))
+    nx.set_edge_attributes(G, name="bearing", values=values)
+
+    utils.log("Added edge bearings to graph")
     return G
@@ -0,0 +1,587 @@
+"""Calculate node centrality and eccentricity from shortest path searches."""
+
+import multiprocessing as mp
+import os
+from heapq import heappop
+from heapq import heappush
+from itertools import count
+
+import networkx as nx
+import numpy as np
+
+from . import utils
+
+# each worker process's copy of the graph's adjacency arrays, set by
+# _init_worker so the graph is sent to each worker once rather than per task
+_worker_arrays = None
+
+
+def betweenness_centrality(
+    G, weight="length", k=None, radius=None, normalized=True, cpus=1, seed=None, return_error=False
+):
+    """
+    Calculate node betweenness centrality.
+
+    Betweenness centrality of a node is the sum of the fraction of all-pairs
+    shortest paths that pass through it. Calculating it exactly takes one
+    shortest path search from every node, so for large graphs either sample
+    `k` source nodes to estimate it, or set a `radius` to calculate local
+    betweenness from only the paths up to that length. Either way, the
+    searches can be distributed across `cpus` processes. Parallel edges are
+    weighted by their minimum `weight`.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    weight : string
+        edge attribute to use as distance, edges missing it have distance 1
+    k : int
+        if not None, estimate betweenness from shortest paths from this many
+        randomly sampled source nodes
+    radius : float
+        if not None, only count shortest paths up to this distance
+    normalized : bool
+        if True, normalize by the number of pairs of nodes other than the
+        node itself
+    cpus : int
+        how many processes to calculate shortest paths with, in parallel. if
+        None, use all available CPUs
+    seed : int
+        seed for the random sample of source nodes
+    return_error : bool
+        if True, also return each node's standard error from sampling
+
+    Returns
+    -------
+    betweenness or (betweenness, error) : dict or tuple of dicts
+        dict keyed by node ID with betweenness centrality values, and
+        optionally a dict keyed by node ID with their standard errors (zero if
+        k is None)
+    """
+    centralities = _get_centralities(
+        G, weight, k, radius, cpus, seed, betweenness=True, closeness=False, normalized=normalized
+    )
+    values, errors = centralities["betweenness"]
+    utils.log("Calculated betweenness centrality")
+    return (values, errors) if return_error else values
+
+
+def closeness_centrality(
+    G, weight="length", k=None, radius=None, cpus=1, seed=None, return_error=False
+):
+    """
+    Calculate node closeness centrality.
+
+    Closeness centrality of a node is the reciprocal of the average shortest
+    path distance to it from the other nodes that can reach it, scaled by the
+    fraction of nodes that can reach it. Calculating it exactly takes one
+    shortest path search from every node, so for large graphs either sample
+    `k` source nodes to estimate it, or set a `radius` to calculate local
+    closeness from only the nodes within that distance (without scaling by
+    the fraction of nodes within it). Either way, the searches can be
+    distributed across `cpus` processes. Parallel edges are weighted by their
+    minimum `weight`.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    weight : string
+        edge attribute to use as distance, edges missing it have distance 1
+    k : int
+        if not None, estimate closeness from shortest paths from this many
+        randomly sampled source nodes
+    radius : float
+        if not None, only count nodes up to this distance
+    cpus : int
+        how many processes to calculate shortest paths with, in parallel. if
+        None, use all available CPUs
+    seed : int
+        seed for the random sample of source nodes
+    return_error : bool
+        if True, also return each node's approximate standard error from
+        sampling
+
+    Returns
+    -------
+    closeness or (closeness, error) : dict or tuple of dicts
+        dict keyed by node ID with closeness centrality values, and optionally
+        a dict keyed by node ID with their standard errors (zero if k is None)
+    """
+    centralities = _get_centralities(
+        G, weight, k, radius, cpus, seed, betweenness=False, closeness=True
+    )
+    values, errors = centralities["closeness"]
+    utils.log("Calculated closeness centrality")
+    return (values, errors) if return_error else values
+
+
+def eccentricity(G, weight="length", cpus=1, filepath=None):
+    """
+    Calculate node eccentricity.
+
+    The eccentricity of a node is the maximum shortest path distance from it
+    to all other nodes. One shortest path search runs from each node, keeping
+    just its maximum distance, so memory use does not grow with the square of
+    the number of nodes. The searches can be distributed across `cpus`
+    processes. Parallel edges are weighted by their minimum `weight`.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph, which must be strongly connected
+    weight : string
+        edge attribute to use as distance, edges missing it have distance 1
+    cpus : int
+        how many processes to calculate shortest paths with, in parallel. if
+        None, use all available CPUs
+    filepath : string
+        if not None, also save the full matrix of shortest path distances to
+        this path as a float32 .npy file, with rows (from) and columns (to) in
+        the order of G.nodes. load it memory-mapped with
+        numpy.load(filepath, mmap_mode="r")
+
+    Returns
+    -------
+    eccentricity : dict
+        dict keyed by node ID with eccentricity values
+    """
+    nodes, indptr, indices, weights = _graph_to_arrays(G, weight)
+    n = len(nodes)
+    if filepath is not None:
+        # create the file for the workers to write their rows of distances into
+        folder = os.path.dirname(filepath)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        np.lib.format.open_memmap(filepath, mode="w+", dtype=np.float32, shape=(n, n))
+
+    sources = np.arange(n)
+    results = _map_sources(_eccentricities, (indptr, indices, weights), sources, cpus, (filepath,))
+    values = np.concatenate(results)
+    if np.isinf(values).any():
+        raise nx.NetworkXError(
+            "Found infinite path length because the digraph is not strongly connected"
+        )
+    utils.log(f"Calculated eccentricity of {n} nodes")
+    return dict(zip(nodes, values.tolist()))
+
+
+def _get_centralities(
+    G,
+    weight="length",
+    k=None,
+    radius=None,
+    cpus=1,
+    seed=None,
+    betweenness=True,
+    closeness=True,
+    normalized=True,
+):
+    """
+    Calculate betweenness and/or closeness centrality in one pass.
+
+    Both measures come from the same shortest path search from each source
+    node: betweenness by accumulating each source's path dependencies
+    (Brandes' algorithm) and closeness by summing each node's distances from
+    the sources.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    weight : string
+        edge attribute to use as distance
+    k : int
+        if not None, sample this many source nodes
+    radius : float
+        if not None, only search shortest paths up to this distance
+    cpus : int
+        how many processes to search shortest paths with
+    seed : int
+        seed for the random sample of source nodes
+    betweenness : bool
+        if True, calculate betweenness centrality
+    closeness : bool
+        if True, calculate closeness centrality
+    normalized : bool
+        if True, normalize betweenness centrality
+
+    Returns
+    -------
+    centralities : dict
+        keyed by "betweenness" and/or "closeness", with values of tuples of
+        (values, errors) dicts keyed by node ID
+    """
+    nodes, indptr, indices, weights = _graph_to_arrays(G, weight)
+    n = len(nodes)
+    if k is None or k >= n:
+        k = None
+        sources = np.arange(n)
+    else:
+        rng = np.random.default_rng(seed)
+        sources = np.sort(rng.choice(n, size=k, replace=False))
+
+    # search shortest paths from each source, in parallel chunks of sources
+    arrays = (indptr, indices, weights)
+    args = (radius, betweenness, closeness)
+    sums = np.sum(_map_sources(_accumulate, arrays, sources, cpus, args), axis=0)
+    bc_sum, bc_sumsq, dist_sum, dist_sumsq, reach = sums
+    utils.log(f"Searched shortest paths from {len(sources)} of {n} nodes")
+
+    centralities = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if betweenness:
+            values, errors = _rescale_betweenness(
+                bc_sum, bc_sumsq, n, k, normalized, G.is_directed()
+            )
+            centralities["betweenness"] = (
+                dict(zip(nodes, values.tolist())),
+                dict(zip(nodes, errors.tolist())),
+            )
+        if closeness:
+            # each node's distances are from every source other than itself
+            in_sources = np.zeros(n, dtype=bool)
+            in_sources[sources] = True
+            m = len(sources) - in_sources
+            values, errors = _rescale_closeness(dist_sum, dist_sumsq, reach, n, m, radius)
+            centralities["closeness"] = (
+                dict(zip(nodes, values.tolist())),
+                dict(zip(nodes, errors.tolist())),
+            )
+    return centralities
+
+
+def _graph_to_arrays(G, weight):
+    """
+    Convert a graph to compressed sparse row adjacency arrays.
+
+    Self-loops are dropped and parallel edges are weighted by their minimum
+    weight. Each node's neighbors keep the graph's adjacency order.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    weight : string
+        edge attribute to use as distance, edges missing it have distance 1
+
+    Returns
+    -------
+    nodes, indptr, indices, weights : tuple
+        list of node IDs, then arrays of each node's offset into the indices
+        and weights arrays, of neighbor positions, and of edge weights
+    """
+    nodes = list(G.nodes)
+    positions = {node: i for i, node in enumerate(nodes)}
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    indices = []
+    weights = []
+    for i, (u, nbrs) in enumerate(G.adj.items()):
+        for v, keydict in nbrs.items():
+            if v != u:
+                indices.append(positions[v])
+                weights.append(min(d.get(weight, 1) for d in keydict.values()))
+        indptr[i + 1] = len(indices)
+    return nodes, indptr, np.array(indices, dtype=np.int64), np.array(weights, dtype=float)
+
+
+def _init_worker(indptr, indices, weights):
+    """
+    Store the graph's adjacency arrays as lists in this worker process.
+
+    Parameters
+    ----------
+    indptr : numpy.ndarray
+        each node's offset into the indices and weights arrays
+    indices : numpy.ndarray
+        neighbor positions
+    weights : numpy.ndarray
+        edge weights
+
+    Returns
+    -------
+    None
+    """
+    global _worker_arrays
+    _worker_arrays = (indptr.tolist(), indices.tolist(), weights.tolist())
+
+
+def _map_sources(func, arrays, sources, cpus, args=()):
+    """
+    Run a function on chunks of source nodes, in parallel if cpus > 1.
+
+    Parameters
+    ----------
+    func : function
+        function taking the graph's adjacency lists, a list of source node
+        positions, then args
+    arrays : tuple
+        the graph's indptr, indices, and weights arrays
+    sources : numpy.ndarray
+        positions of the source nodes
+    cpus : int
+        how many processes to run the function with
+    args : tuple
+        additional arguments to pass to the function
+
+    Returns
+    -------
+    results : list
+        the function's result for each chunk of sources, in order
+    """
+    if cpus is None:
+        cpus = os.cpu_count()
+    if cpus > 1 and len(sources) > 1:
+        chunks = [c.tolist() for c in np.array_split(sources, cpus * 4) if len(c) > 0]
+        with mp.Pool(min(cpus, len(chunks)), _init_worker, arrays) as pool:
+            return pool.starmap(_run_worker, [(func, c) + tuple(args) for c in chunks])
+    return [func(*[a.tolist() for a in arrays], sources.tolist(), *args)]
+
+
+def _run_worker(func, sources, *args):
+    """
+    Run a function on source nodes using this worker's graph.
+
+    Parameters
+    ----------
+    func : function
+        function taking the graph's adjacency lists, a list of source node
+        positions, then args
+    sources : list
+        positions of the source nodes
+    args : tuple
+        additional arguments to pass to the function
+
+    Returns
+    -------
+    result : object
+        the function's result
+    """
+    return func(*_worker_arrays, sources, *args)
+
+
+def _accumulate(indptr, indices, weights, sources, radius, betweenness, closeness):
+    """
+    Accumulate centrality sums from shortest path searches from sources.
+
+    Parameters
+    ----------
+    indptr : list
+        each node's offset into the indices and weights lists
+    indices : list
+        neighbor positions
+    weights : list
+        edge weights
+    sources : list
+        positions of the source nodes
+    radius : float
+        if not None, only search shortest paths up to this distance
+    betweenness : bool
+        if True, accumulate betweenness dependencies
+    closeness : bool
+        if True, accumulate distances
+
+    Returns
+    -------
+    sums : numpy.ndarray
+        array of shape (5, n) of each node's sum and sum of squares of its
+        betweenness dependencies on the sources, sum and sum of squares of its
+        distances from the sources, and count of sources that reach it
+    """
+    n = len(indptr) - 1
+    bc_sum = [0.0] * n
+    bc_sumsq = [0.0] * n
+    dist_sum = [0.0] * n
+    dist_sumsq = [0.0] * n
+    reach = [0] * n
+
+    for s in sources:
+        # dijkstra from the source, counting the shortest paths to each node
+        # and their predecessors, with ties broken in the same way as networkx
+        S = []
+        P = {s: []}
+        sigma = {s: 1.0}
+        D = {}
+        seen = {s: 0}
+        c = count()
+        Q = [(0, next(c), s, s)]
+        while Q:
+            dist, _, pred, v = heappop(Q)
+            if v in D:
+                continue
+            sigma[v] += sigma[pred]
+            S.append(v)
+            D[v] = dist
+            for i in range(indptr[v], indptr[v + 1]):
+                w = indices[i]
+                vw_dist = dist + weights[i]
+                if radius is not None and vw_dist > radius:
+                    continue
+                if w not in D and (w not in seen or vw_dist < seen[w]):
+                    seen[w] = vw_dist
+                    heappush(Q, (vw_dist, next(c), v, w))
+                    sigma[w] = 0.0
+                    P[w] = [v]
+                elif vw_dist == seen[w]:
+                    sigma[w] += sigma[v]
+                    P[w].append(v)
+
+        if closeness:
+            for v in S[1:]:
+                d = D[v]
+                dist_sum[v] += d
+                dist_sumsq[v] += d * d
+                reach[v] += 1
+
+        if betweenness:
+            # accumulate each node's dependency on the source, in order of
+            # decreasing distance from it
+            delta = dict.fromkeys(S, 0.0)
+            for w in reversed(S):
+                coeff = (1 + delta[w]) / sigma[w]
+                for v in P[w]:
+                    delta[v] += sigma[v] * coeff
+                if w != s:
+                    bc_sum[w] += delta[w]
+                    bc_sumsq[w] += delta[w] * delta[w]
+
+    return np.array([bc_sum, bc_sumsq, dist_sum, dist_sumsq, reach], dtype=float)
+
+
+def _eccentricities(indptr, indices, weights, sources, filepath=None):
+    """
+    Calculate sources' maximum shortest path distances to all nodes.
+
+    Parameters
+    ----------
+    indptr : list
+        each node's offset into the indices and weights lists
+    indices : list
+        neighbor positions
+    weights : list
+        edge weights
+    sources : list
+        positions of the source nodes
+    filepath : string
+        if not None, write each source's row of distances into the float32
+        .npy distance matrix file at this path
+
+    Returns
+    -------
+    eccentricities : numpy.ndarray
+        each source's maximum distance, or inf if it cannot reach every node
+    """
+    n = len(indptr) - 1
+    if filepath is not None:
+        matrix = np.load(filepath, mmap_mode="r+")
+    eccentricities = np.zeros(len(sources))
+
+    for i, s in enumerate(sources):
+        D = {}
+        seen = {s: 0}
+        Q = [(0, s)]
+        while Q:
+            dist, v = heappop(Q)
+            if v in D:
+                continue
+            D[v] = dist
+            for j in range(indptr[v], indptr[v + 1]):
+                w = indices[j]
+                vw_dist = dist + weights[j]
+                if w not in D and (w not in seen or vw_dist < seen[w]):
+                    seen[w] = vw_dist
+                    heappush(Q, (vw_dist, w))
+
+        eccentricities[i] = max(D.values()) if len(D) == n else np.inf
+        if filepath is not None:
+            row = np.full(n, np.inf, dtype=np.float32)
+            row[list(D)] = list(D.values())
+            matrix[s] = row
+
+    if filepath is not None:
+        matrix.flush()
+    return eccentricities
+
+
+def _rescale_betweenness(bc_sum, bc_sumsq, n, k, normalized, directed=True):
+    """
+    Rescale betweenness dependency sums to betweenness centrality.
+
+    Parameters
+    ----------
+    bc_sum : numpy.ndarray
+        each node's sum of dependencies on the sources
+    bc_sumsq : numpy.ndarray
+        each node's sum of squared dependencies on the sources
+    n : int
+        number of nodes in the graph
+    k : int
+        number of sampled sources, or None if every node is a source
+    normalized : bool
+        if True, normalize by the number of pairs of nodes
+    directed : bool
+        if False, the graph is undirected so each path was counted in both
+        directions, and unnormalized values are halved (as in networkx)
+
+    Returns
+    -------
+    values, errors : tuple of numpy.ndarray
+        betweenness centrality and its standard error
+    """
+    if normalized:
+        scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 1
+    else:
+        scale = 1 if directed else 0.5
+    if k is None:
+        return bc_sum * scale, np.zeros(n)
+
+    # scale the sampled sources' dependencies up to all n sources, and estimate
+    # the standard error of this sum from the dependencies' sample variance,
+    # corrected for sampling sources without replacement
+    mean = bc_sum / k
+    variance = np.maximum(bc_sumsq - k * mean ** 2, 0) / max(k - 1, 1)
+    correction = (n - k) / (n - 1)
+    errors = n * np.sqrt(variance / k * correction)
+    return mean * n * scale, errors * scale
+
+
+def _rescale_closeness(dist_sum, dist_sumsq, reach, n, m, radius):
+    """
+    Rescale distance sums to closeness centrality.
+
+    Parameters
+    ----------
+    dist_sum : numpy.ndarray
+        each node's sum of distances from the sources that reach it
+    dist_sumsq : numpy.ndarray
+        each node's sum of squared distances from the sources that reach it
+    reach : numpy.ndarray
+        each node's count of sources that reach it
+    n : int
+        number of nodes in the graph
+    m : numpy.ndarray
+        each node's count of sources other than itself
+    radius : float
+        if None, scale by the fraction of sources that reach each node
+
+    Returns
+    -------
+    values, errors : tuple of numpy.ndarray
+        closeness centrality and its approximate standard error
+    """
+    # closeness is the reciprocal of the mean distance from the sources that
+    # reach a node, scaled by the fraction of sources that reach it
+    values = reach / dist_sum
+    if radius is None:
+        values *= reach / m
+    values[~(dist_sum > 0)] = 0
+
+    # approximate the standard error from the standard error of the mean
+    # distance, corrected for sampling sources without replacement
+    mean = dist_sum / reach
+    variance = np.maximum(dist_sumsq - reach * mean ** 2, 0) / np.maximum(reach - 1, 1)
+    correction = np.maximum(n - 1 - m, 0) / max(n - 2, 1)
+    errors = values * np.sqrt(variance / reach * correction) / mean
+    errors[~(dist_sum > 0)] = 0
+    return values, errors
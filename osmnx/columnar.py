@@ -0,0 +1,519 @@
+"""Convert graphs to and from a compact columnar representation."""
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from shapely.geometry import LineString
+
+from . import distance
+from . import projection
+from . import speed
+from . import stats
+from . import utils
+from . import utils_graph
+
+
+def graph_to_columns(G):
+    """
+    Convert a MultiDiGraph to a compact columnar representation.
+
+    Every node and edge attribute becomes a typed column rather than a value
+    in a per-element dict: boolean, integer, and float attributes become
+    numeric columns, string attributes (like highway or name) become
+    categorical columns, and anything else (like lists) becomes an object
+    column. Edge LineString geometries are packed into a single coordinate
+    array, with offsets marking where each edge's coordinates begin. Null
+    attribute values are treated as missing, as in graph_from_gdfs.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+
+    Returns
+    -------
+    columns : dict
+        dict with keys "graph" (copy of the graph attribute dict), "nodes"
+        (DataFrame of node attributes, indexed by node ID), "edges"
+        (DataFrame of edge attributes plus u, v, key columns), "coords"
+        (array of shape (n, 2) of the edges' packed geometry coordinates) and
+        "offsets" (array of length m + 1: edge i's coordinates are
+        coords[offsets[i]:offsets[i + 1]], which is empty if it has no
+        packed geometry)
+    """
+    nodes = list(G.nodes)
+    node_data = [data for _, data in G.nodes(data=True)]
+    edges = list(G.edges(keys=True, data=True))
+    u = [e[0] for e in edges]
+    v = [e[1] for e in edges]
+    k = [e[2] for e in edges]
+    edge_data = [e[3] for e in edges]
+
+    # pack the 2D LineString edge geometries into a single coordinate array.
+    # any other edge geometries are retained in the edges table
+    geoms = [d.get("geometry") for d in edge_data]
+    is_packed = [isinstance(g, LineString) and not g.is_empty and not g.has_z for g in geoms]
+    coords = [np.asarray(g.coords) if p else np.empty((0, 2)) for g, p in zip(geoms, is_packed)]
+    offsets = np.zeros(len(coords) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(c) for c in coords])
+
+    columns = {
+        "graph": dict(G.graph),
+        "nodes": _dicts_to_table(node_data, index=pd.Index(nodes)),
+        "edges": _dicts_to_table(edge_data, skip_geometry=is_packed),
+        "coords": np.concatenate(coords) if len(coords) > 0 else np.empty((0, 2)),
+        "offsets": offsets,
+    }
+    columns["edges"]["u"] = u
+    columns["edges"]["v"] = v
+    columns["edges"]["key"] = k
+
+    utils.log(f"Converted graph with {len(nodes)} nodes and {len(u)} edges to columns")
+    return columns
+
+
+def graph_from_columns(columns):
+    """
+    Convert a columnar representation back into a MultiDiGraph.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+
+    Returns
+    -------
+    G : networkx.MultiDiGraph
+    """
+    G = nx.MultiDiGraph(**columns["graph"])
+    _add_nodes_from_columns(G, columns)
+    _add_edges_from_columns(G, columns)
+    utils.log(f"Converted columns to graph with {len(G)} nodes and {len(G.edges)} edges")
+    return G
+
+
+def get_edge_endpoints(columns):
+    """
+    Get positions of each edge's u and v nodes in the nodes table.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+
+    Returns
+    -------
+    u_pos, v_pos : tuple
+        arrays of the u and v nodes' positions in the nodes table
+    """
+    index = columns["nodes"].index
+    u_pos = index.get_indexer(columns["edges"]["u"])
+    v_pos = index.get_indexer(columns["edges"]["v"])
+    return u_pos, v_pos
+
+
+def project_columns(columns, to_crs=None):
+    """
+    Project a columnar graph from its current CRS to another.
+
+    If to_crs is None, project to the UTM CRS for the UTM zone in which the
+    graph's centroid lies. Otherwise, project to the CRS defined by to_crs.
+    Node coordinates and packed edge coordinates are each transformed in a
+    single operation. Any edge geometries retained in the edges table (i.e.,
+    that are not packed LineStrings) are transformed individually.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+    to_crs : dict or string or pyproj.CRS
+        if None, project graph to UTM zone in which graph centroid lies,
+        otherwise project graph to this CRS
+
+    Returns
+    -------
+    columns_proj : dict
+        the projected columnar graph
+    """
+    crs = columns["graph"]["crs"]
+    df_nodes = columns["nodes"].copy()
+    df_edges = columns["edges"].copy()
+    x = df_nodes["x"].to_numpy(dtype=float)
+    y = df_nodes["y"].to_numpy(dtype=float)
+
+    if to_crs is None:
+        if projection._get_crs(crs).is_projected:
+            raise ValueError("Geometry must be unprojected to calculate UTM zone")
+        avg_lng = np.unique(np.column_stack((x, y)), axis=0)[:, 0].mean()
+        to_crs = projection._get_utm_crs(avg_lng)
+    to_crs = projection._get_crs(to_crs)
+    transformer = projection._get_transformer(crs, to_crs)
+
+    # preserve lat/lng for later reference if not already there
+    if "lon" not in df_nodes.columns or "lat" not in df_nodes.columns:
+        df_nodes["lon"] = x
+        df_nodes["lat"] = y
+    df_nodes["x"], df_nodes["y"] = transformer.transform(x, y)
+
+    coords = columns["coords"].copy()
+    if len(coords) > 0:
+        coords = np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+
+    if "geometry" in df_edges.columns:
+        mask = df_edges["geometry"].notnull().to_numpy()
+        geoms = df_edges["geometry"].to_numpy()[mask]
+        df_edges.loc[mask, "geometry"] = projection._transform_geometries(geoms, transformer)
+
+    graph_attrs = dict(columns["graph"])
+    graph_attrs["crs"] = to_crs
+    utils.log(f"Projected columnar graph to {to_crs}")
+    return {
+        "graph": graph_attrs,
+        "nodes": df_nodes,
+        "edges": df_edges,
+        "coords": coords,
+        "offsets": columns["offsets"].copy(),
+    }
+
+
+def add_edge_lengths(columns):
+    """
+    Add length (meters) column to a lat-lng columnar graph's edges table.
+
+    Calculate via great circle distance between nodes u and v.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+
+    Returns
+    -------
+    columns : dict
+    """
+    x = columns["nodes"]["x"].to_numpy(dtype=float)
+    y = columns["nodes"]["y"].to_numpy(dtype=float)
+    u_pos, v_pos = get_edge_endpoints(columns)
+    lengths = distance.great_circle_vec(y[u_pos], x[u_pos], y[v_pos], x[v_pos])
+    columns["edges"]["length"] = np.nan_to_num(lengths).round(3)
+    utils.log("Added edge lengths to columnar graph")
+    return columns
+
+
+def add_edge_speeds(columns, hwy_speeds=None, fallback=None):
+    """
+    Add speed_kph (km per hour) column to a columnar graph's edges table.
+
+    Imputes free-flow travel speeds for all edges exactly as
+    speed.add_edge_speeds does, from the edges' `highway` and `maxspeed`
+    columns.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+    hwy_speeds : dict
+        dict keys = OSM highway types and values = typical speeds (km per
+        hour) to assign to edges of that highway type for any edges missing
+        speed data
+    fallback : numeric
+        default speed value (km per hour) to assign to edges whose highway
+        type did not appear in `hwy_speeds` and had no preexisting speed
+        values on any edge
+
+    Returns
+    -------
+    columns : dict
+    """
+    edges = columns["edges"]
+    cols = [col for col in ("highway", "maxspeed") if col in edges.columns]
+    speed_kph = speed._impute_edge_speeds(edges[cols].astype(object), hwy_speeds, fallback)
+    edges["speed_kph"] = speed_kph.to_numpy(dtype=float)
+    return columns
+
+
+def add_edge_travel_times(columns):
+    """
+    Add travel_time (seconds) column to a columnar graph's edges table.
+
+    Calculates free-flow travel time along each edge, based on its `length`
+    and `speed_kph` columns, which must exist and contain no nulls.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+
+    Returns
+    -------
+    columns : dict
+    """
+    edges = columns["edges"]
+    if not ("length" in edges.columns and "speed_kph" in edges.columns):
+        raise KeyError("all edges must have `length` and `speed_kph` attributes.")
+    if pd.isnull(edges["length"]).any() or pd.isnull(edges["speed_kph"]).any():
+        raise ValueError("edge `length` and `speed_kph` values must be non-null.")
+
+    # convert distance meters to km, and speed km per hour to km per second
+    distance_km = edges["length"].to_numpy(dtype=float) / 1000
+    speed_km_sec = edges["speed_kph"].to_numpy(dtype=float) / (60 * 60)
+    edges["travel_time"] = distance_km / speed_km_sec
+    return columns
+
+
+def basic_stats(columns, area=None, circuity_dist="gc"):
+    """
+    Calculate basic descriptive metric and topological stats of a columnar graph.
+
+    Calculates the same stats as stats.basic_stats, from the columnar graph's
+    node and edge arrays, except the clean intersection stats, which require
+    consolidating the intersections of a MultiDiGraph and so are None here.
+    The edges table must have a `length` column.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+    area : numeric
+        the land area of this study site, in square meters. must be greater
+        than 0. if None, will skip all density-based metrics.
+    circuity_dist : string
+        'gc' or 'euclidean', how to calculate straight-line distances for
+        circuity measurement; use former for lat-lng networks and latter for
+        projected networks
+
+    Returns
+    -------
+    stats : dict
+        dictionary of network measures, as described in stats.basic_stats
+    """
+    nodes = columns["nodes"]
+    edges = columns["edges"]
+    u_pos, v_pos = get_edge_endpoints(columns)
+    keys = edges["key"].to_numpy()
+
+    if "streets_per_node" in columns["graph"]:
+        streets_per_node = columns["graph"]["streets_per_node"]
+        counts = np.array([streets_per_node.get(node, 0) for node in nodes.index], dtype=np.int64)
+        streets_per_node_values = np.array(list(streets_per_node.values()), dtype=np.int64)
+    else:
+        counts = utils_graph._count_streets(u_pos, v_pos, keys, len(nodes))
+        streets_per_node_values = counts
+
+    return stats._basic_stats_from_arrays(
+        nodes["x"].to_numpy(dtype=float),
+        nodes["y"].to_numpy(dtype=float),
+        u_pos,
+        v_pos,
+        keys,
+        edges["length"].to_numpy(dtype=float),
+        int((counts > 1).sum()),
+        streets_per_node_values,
+        area,
+        circuity_dist,
+        None,
+    )
+
+
+def get_bounds(columns):
+    """
+    Get the bounding box of a columnar graph's nodes and packed edge geometries.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+
+    Returns
+    -------
+    tuple
+        (north, south, east, west)
+    """
+    xy = np.column_stack(
+        (columns["nodes"]["x"].to_numpy(dtype=float), columns["nodes"]["y"].to_numpy(dtype=float))
+    )
+    xy = np.concatenate((xy, columns["coords"]))
+    west, south = xy.min(axis=0)
+    east, north = xy.max(axis=0)
+    return north, south, east, west
+
+
+def get_edge_lines(columns, use_geom=True):
+    """
+    Get each edge's line coordinates, for example to plot them.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+    use_geom : bool
+        if True, use the edges' packed geometry coordinates where they exist,
+        otherwise draw every edge as a straight line from node to node
+
+    Returns
+    -------
+    lines : list
+        list of arrays of shape (n, 2), one per edge
+    """
+    x = columns["nodes"]["x"].to_numpy(dtype=float)
+    y = columns["nodes"]["y"].to_numpy(dtype=float)
+    u_pos, v_pos = get_edge_endpoints(columns)
+    straight = np.stack(
+        (np.column_stack((x[u_pos], y[u_pos])), np.column_stack((x[v_pos], y[v_pos]))), axis=1
+    )
+
+    lines = list(straight)
+    if use_geom:
+        coords = columns["coords"]
+        offsets = columns["offsets"]
+        for i in np.flatnonzero(np.diff(offsets) > 0).tolist():
+            lines[i] = coords[offsets[i] : offsets[i + 1]]
+
+        # any geometries that were not packed are retained in the edges table
+        if "geometry" in columns["edges"].columns:
+            geoms = columns["edges"]["geometry"].to_numpy()
+            for i in np.flatnonzero(pd.notnull(geoms)).tolist():
+                lines[i] = np.column_stack(geoms[i].xy)
+    return lines
+
+
+def _add_nodes_from_columns(G, columns):
+    """
+    Add a columnar graph's nodes to a graph.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        the graph to add the nodes to
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+
+    Returns
+    -------
+    None
+    """
+    df_nodes = columns["nodes"]
+    node_attrs = utils_graph._non_null_attr_dicts(df_nodes, df_nodes.columns)
+    G.add_nodes_from(zip(df_nodes.index, node_attrs))
+
+
+def _add_edges_from_columns(G, columns, mask=None):
+    """
+    Add a columnar graph's edges to a graph.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        the graph to add the edges to
+    columns : dict
+        the columnar graph, as returned by graph_to_columns
+    mask : numpy.ndarray
+        if not None, boolean array indicating which edges to add
+
+    Returns
+    -------
+    None
+    """
+    df_edges = columns["edges"]
+    starts = np.asarray(columns["offsets"][:-1])
+    ends = np.asarray(columns["offsets"][1:])
+    if mask is not None:
+        df_edges = df_edges[mask]
+        starts = starts[mask]
+        ends = ends[mask]
+    coords = columns["coords"]
+
+    # unpack each edge's coordinates from the packed coordinate array
+    attr_cols = [col for col in df_edges.columns if col not in {"u", "v", "key"}]
+    edge_attrs = utils_graph._non_null_attr_dicts(df_edges, attr_cols)
+    for data, start, end in zip(edge_attrs, starts.tolist(), ends.tolist()):
+        if end > start:
+            data["geometry"] = LineString(coords[start:end])
+
+    G.add_edges_from(
+        zip(df_edges["u"].tolist(), df_edges["v"].tolist(), df_edges["key"].tolist(), edge_attrs)
+    )
+
+
+def _dicts_to_table(data, index=None, skip_geometry=None):
+    """
+    Convert a sequence of attribute dicts into a table of typed columns.
+
+    Parameters
+    ----------
+    data : tuple
+        the attribute dicts
+    index : pandas.Index
+        the index of the table. if None, use a range index
+    skip_geometry : list
+        list of bools, one per dict, indicating whether to skip that dict's
+        geometry attribute (because it has been packed elsewhere)
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    attrs = list(dict.fromkeys(attr for d in data for attr in d))
+    table = {}
+    for attr in attrs:
+        values = [d.get(attr) for d in data]
+        if attr == "geometry" and skip_geometry is not None:
+            values = [None if skip else val for val, skip in zip(values, skip_geometry)]
+            if all(val is None for val in values):
+                continue
+        table[attr] = _make_column(values)
+
+    if index is None:
+        index = pd.RangeIndex(len(data))
+    return pd.DataFrame(table, index=index)
+
+
+def _make_column(values):
+    """
+    Make a typed column from a list of values, where None indicates missing.
+
+    Parameters
+    ----------
+    values : list
+        the column's values
+
+    Returns
+    -------
+    column : numpy.ndarray or pandas.api.extensions.ExtensionArray
+    """
+    present = [val for val in values if val is not None]
+    has_missing = len(present) < len(values)
+
+    if all(isinstance(val, (bool, np.bool_)) for val in present):
+        return pd.array(values, dtype="boolean") if has_missing else np.array(values, dtype=bool)
+
+    elif all(_is_int(val) for val in present):
+        return pd.array(values, dtype="Int64") if has_missing else np.array(values, dtype=np.int64)
+
+    elif all(isinstance(val, (float, np.floating)) for val in present):
+        return np.array([np.nan if val is None else val for val in values], dtype=float)
+
+    elif all(isinstance(val, str) for val in present):
+        # categorical encoding stores each distinct string only once
+        return pd.Categorical(values)
+
+    else:
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+
+
+def _is_int(val):
+    """
+    Determine if a value is an integer (but not a boolean).
+
+    Parameters
+    ----------
+    val : object
+        the value
+
+    Returns
+    -------
+    bool
+    """
+    return isinstance(val, (int, np.integer)) and not isinstance(val, (bool, np.bool_))
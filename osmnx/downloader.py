@@ -9,6 +9,7 @@ import os
 import re
 import time
 from collections import OrderedDict
+from contextlib import contextmanager
 
 import requests
 from dateutil import parser as date_parser
@@ -18,6 +19,12 @@ from . import settings
 from . import utils
 from . import utils_geo
 
+# a lock shared by processes that make requests in parallel, such as the
+# workers of stats.basic_stats_batch, so that only one of them at a time pauses
+# and checks for an available slot, respecting the APIs' rate limits. the
+# requests themselves are made after releasing it, so they can overlap
+_request_lock = None
+
 
 def _get_osm_filter(network_type):
     """
@@ -233,6 +240,22 @@ def _get_http_headers(user_agent=None, referer=None, accept_language=None):
     return headers
 
 
+@contextmanager
+def _throttle():
+    """
+    Hold the shared request lock, if there is one, while pausing before a request.
+
+    Returns
+    -------
+    None
+    """
+    if _request_lock is None:
+        yield
+    else:
+        with _request_lock:
+            yield
+
+
 def _get_pause(recursive_delay=5, default_duration=60):
     """
     Get a pause duration from the Overpass API status endpoint.
@@ -435,8 +458,9 @@ def nominatim_request(params, request_type="search", pause=1, error_pause=180):
 
     else:
         # if this URL is not already in the cache, pause, then request it
-        utils.log(f"Pausing {pause} seconds before making HTTP GET request")
-        time.sleep(pause)
+        with _throttle():
+            utils.log(f"Pausing {pause} seconds before making HTTP GET request")
+            time.sleep(pause)
         utils.log(f"Get {prepared_url} with timeout={settings.timeout}")
         response = requests.get(
             url, params=params, timeout=settings.timeout, headers=_get_http_headers()
@@ -503,10 +527,11 @@ def overpass_request(data, pause=None, error_pause=None):
 
     else:
         # if this URL is not already in the cache, pause, then request it
-        if pause is None:
-            this_pause = _get_pause()
-        utils.log(f"Pausing {this_pause} seconds before making HTTP POST request")
-        time.sleep(this_pause)
+        with _throttle():
+            if pause is None:
+                this_pause = _get_pause()
+            utils.log(f"Pausing {this_pause} seconds before making HTTP POST request")
+            time.sleep(this_pause)
         utils.log(f"Post {prepared_url} with timeout={settings.timeout}")
         response = requests.post(
             url, data=data, timeout=settings.timeout, headers=_get_http_headers()
@@ -1,107 +1,472 @@
 """Get node elevations and calculate edge grades."""
 
-import math
+import hashlib
+import json
+import os
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 
 import networkx as nx
+import numpy as np
 import pandas as pd
 import requests
 
+from . import distance
 from . import downloader
+from . import projection
+from . import settings
 from . import utils
+from . import utils_graph
+
+# rasterio is an optional dependency for sampling elevations from rasters
+try:
+    import rasterio
+    from rasterio.windows import Window
+except ImportError:  # pragma: no cover
+    rasterio = None
+
+# elevation API providers: URL templates with placeholders for the locations
+# and API key, and the max number of locations the API accepts per request
+_ELEVATION_PROVIDERS = {
+    "google": (
+        "https://maps.googleapis.com/maps/api/elevation/json?locations={locations}&key={key}",
+        512,
+    ),
+    "opentopodata": ("https://api.opentopodata.org/v1/srtm30m?locations={locations}", 100),
+}
+
+# elevations already retrieved, keyed by URL template then by "lat,lng"
+_elevation_cache = {}
+
+# lock held while pausing before each elevation API call, so concurrent
+# requests take turns pausing and the request rate does not multiply with
+# the number of threads
+_pause_lock = threading.Lock()
 
 
 def add_node_elevations(
-    G, api_key, max_locations_per_batch=350, pause_duration=0.02
-):  # pragma: no cover
+    G,
+    api_key=None,
+    max_locations_per_batch=None,
+    pause_duration=0.02,
+    provider="google",
+    precision=5,
+    max_url_length=8192,
+    max_workers=4,
+    retries=3,
+):
     """
     Get the elevation (meters) of each node.
 
-    Add it to the node as an attribute.
+    Add it to the node as an attribute. Node coordinates are rounded to
+    `precision` decimal places and each distinct coordinate's elevation is
+    requested just once, then cached in memory (and in the cache folder if
+    settings.use_cache is True) so that later calls on overlapping graphs
+    reuse it. Any coordinates not already cached are requested from the
+    elevation API in batches sized to fit its URL length limit, with several
+    batches in flight at once, and failed requests are retried. The requests
+    take turns pausing, so at most one request starts per pause_duration.
 
     Parameters
     ----------
     G : networkx.MultiDiGraph
         input graph
     api_key : string
-        your google maps elevation API key
+        your elevation API key, if the provider requires one
     max_locations_per_batch : int
-        max number of coordinate pairs to submit in each API call (if this is
-        too high, the server will reject the request because its character
-        limit exceeds the max)
+        max number of coordinate pairs to submit in each API call. if None,
+        use the provider's limit
     pause_duration : float
-        time to pause between API calls
+        time to pause before each API call
+    provider : string
+        "google" or "opentopodata" to use that elevation API, or the URL
+        template of any other API with the same request and response format,
+        with a "{locations}" placeholder and optionally a "{key}" placeholder
+        for the API key
+    precision : int
+        decimal places to round node coordinates to (5 is approx 1 meter)
+    max_url_length : int
+        max number of characters in each API call's URL (if this is too high,
+        the server will reject the request because its character limit
+        exceeds the max)
+    max_workers : int
+        max number of API calls to make concurrently
+    retries : int
+        how many times to retry a failed API call, pausing twice as long
+        before each retry
 
     Returns
     -------
     G : networkx.MultiDiGraph
     """
-    # google maps elevation API endpoint
-    url_template = "https://maps.googleapis.com/maps/api/elevation/json?locations={}&key={}"
+    url_template, provider_max_locations = _ELEVATION_PROVIDERS.get(provider, (provider, None))
+    if "{locations}" not in url_template:
+        raise ValueError(f'Unrecognized elevation provider "{provider}"')
+    if "{key}" in url_template and api_key is None:
+        raise ValueError(f'Elevation provider "{provider}" requires an api_key')
+    if max_locations_per_batch is None:
+        max_locations_per_batch = provider_max_locations or float("inf")
 
-    # make a pandas series of all the nodes' coordinates as 'lat,lng'
-    # round coorindates to 5 decimal places (approx 1 meter) to be able to fit
-    # in more locations per API call
+    # make a pandas series of all the nodes' rounded coordinates as 'lat,lng'
     node_points = pd.Series(
-        {node: f'{data["y"]:.5f},{data["x"]:.5f}' for node, data in G.nodes(data=True)}
+        {
+            node: f'{data["y"]:.{precision}f},{data["x"]:.{precision}f}'
+            for node, data in G.nodes(data=True)
+        },
+        dtype=object,
     )
-    n_calls = math.ceil(len(node_points) / max_locations_per_batch)
-    utils.log(f"Requesting node elevations from the API in {n_calls} calls")
-
-    # break the series of coordinates into chunks of size max_locations_per_batch
-    # API format is locations=lat,lng|lat,lng|lat,lng|lat,lng...
-    results = []
-    for i in range(0, len(node_points), max_locations_per_batch):
-        chunk = node_points.iloc[i : i + max_locations_per_batch]
-        locations = "|".join(chunk)
-        url = url_template.format(locations, api_key)
-
-        # check if this request is already in the cache (if global use_cache=True)
-        cached_response_json = downloader._get_from_cache(url)
-        if cached_response_json is not None:
-            response_json = cached_response_json
-        else:
-            try:
-                # request the elevations from the API
-                utils.log(f"Requesting node elevations: {url}")
-                time.sleep(pause_duration)
-                response = requests.get(url)
-                response_json = response.json()
-                downloader._save_to_cache(url, response_json)
-            except Exception as e:
-                utils.log(e)
-                utils.log(f"Server responded with {response.status_code}: {response.reason}")
-
-        # append these elevation results to the list of all results
-        results.extend(response_json["results"])
-
-    # sanity check that all our vectors have the same number of elements
-    if not (len(results) == len(G) == len(node_points)):
-        raise Exception(
-            f"Graph has {len(G)} nodes but we received {len(results)} results from elevation API"
-        )
-    else:
-        utils.log(
-            f"Graph has {len(G)} nodes and we received {len(results)} results from elevation API"
-        )
-
-    # add elevation as an attribute to the nodes
-    df = pd.DataFrame(node_points, columns=["node_points"])
-    df["elevation"] = [result["elevation"] for result in results]
-    df["elevation"] = df["elevation"].round(3)  # round to millimeter
-    nx.set_node_attributes(G, name="elevation", values=df["elevation"].to_dict())
+
+    # only request the distinct coordinates that are not already cached
+    cache = _get_elevation_cache(url_template)
+    locations = [loc for loc in pd.unique(node_points) if loc not in cache]
+    batches = _make_elevation_batches(
+        locations, url_template, api_key, max_url_length, max_locations_per_batch
+    )
+    utils.log(
+        f"Requesting {len(locations)} of {len(node_points)} node elevations "
+        f"from the API in {len(batches)} calls"
+    )
+
+    # API format is locations=lat,lng|lat,lng|lat,lng|lat,lng... cache each
+    # batch's elevations as soon as it completes, and save the cache even if
+    # a batch fails, so the successful batches need not be requested again
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for batch in batches:
+            url = url_template.format(locations="|".join(batch), key=api_key)
+            future = executor.submit(_request_elevations, url, len(batch), pause_duration, retries)
+            futures[future] = batch
+        try:
+            for future in as_completed(futures):
+                cache.update(zip(futures[future], future.result()))
+        finally:
+            # don't start any more requests if a batch failed
+            for future in futures:
+                future.cancel()
+            if len(batches) > 0:
+                _save_elevation_cache(url_template, cache)
+
+    # add elevation as an attribute to the nodes, rounded to the millimeter
+    elevations = node_points.map(cache).astype(float).round(3)
+    nx.set_node_attributes(G, name="elevation", values=elevations.to_dict())
     utils.log("Added elevation data to all nodes.")
 
     return G
 
 
+def add_node_elevations_raster(G, filepath, band=1, cpus=1):
+    """
+    Add `elevation` attribute to each node from local raster file(s).
+
+    Samples each node's elevation from digital elevation model raster files,
+    such as GeoTIFFs, by bilinear interpolation between the four pixels
+    nearest to it. Only the window of each raster that covers the graph's
+    nodes is read, so large rasters are never read in full. If `filepath` is
+    a list of raster tiles, each node takes its elevation from the first tile
+    that covers it. Nodes outside every raster, or next to nodata pixels, get
+    a null elevation. The rasters may be in any CRS: node coordinates are
+    projected to each raster's CRS.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    filepath : string or list
+        path (or list of paths) to the raster file(s)
+    band : int
+        which raster band to read elevations from
+    cpus : int
+        how many processes to sample the rasters with, in parallel across
+        tiles. if None, use all available CPUs
+
+    Returns
+    -------
+    G : networkx.MultiDiGraph
+        graph with node elevation attributes
+    """
+    if not rasterio:  # pragma: no cover
+        raise ImportError("The rasterio package must be installed to use this optional feature.")
+
+    nodes, data = zip(*G.nodes(data=True))
+    x = np.array([d["x"] for d in data], dtype=float)
+    y = np.array([d["y"] for d in data], dtype=float)
+    elevations = _sample_rasters(filepath, x, y, G.graph["crs"], band, cpus)
+
+    values = dict(zip(nodes, np.round(elevations, 3).tolist()))
+    nx.set_node_attributes(G, name="elevation", values=values)
+    utils.log("Added elevation data from rasters to all nodes.")
+    return G
+
+
+def _sample_rasters(filepath, x, y, crs, band=1, cpus=1):
+    """
+    Sample raster file(s) at points, by bilinear interpolation.
+
+    Parameters
+    ----------
+    filepath : string or list
+        path (or list of paths) to the raster file(s)
+    x : numpy.ndarray
+        the points' x coordinates
+    y : numpy.ndarray
+        the points' y coordinates
+    crs : dict or string or pyproj.CRS
+        the points' CRS
+    band : int
+        which raster band to read
+    cpus : int
+        how many processes to sample the rasters with, in parallel across
+        tiles. if None, use all available CPUs
+
+    Returns
+    -------
+    values : numpy.ndarray
+        the value at each point from the first raster that covers it, or null
+    """
+    if isinstance(filepath, (str, os.PathLike)):
+        filepaths = [filepath]
+    else:
+        filepaths = list(filepath)
+    if cpus is None:
+        cpus = os.cpu_count()
+
+    # find the points within each raster's bounds, in its CRS
+    tasks = []
+    for path in filepaths:
+        with rasterio.open(path) as src:
+            raster_crs = None if src.crs is None else src.crs.to_wkt()
+            bounds = src.bounds
+        if raster_crs is None or projection._get_crs(raster_crs) == projection._get_crs(crs):
+            tile_x, tile_y = x, y
+        else:
+            transformer = projection._get_transformer(crs, raster_crs)
+            tile_x, tile_y = transformer.transform(x, y)
+        mask = (bounds.left <= tile_x) & (tile_x <= bounds.right)
+        mask &= (bounds.bottom <= tile_y) & (tile_y <= bounds.top)
+        positions = np.flatnonzero(mask)
+        if len(positions) > 0:
+            tasks.append((positions, path, band, tile_x[positions], tile_y[positions]))
+    utils.log(f"Sampling {len(x)} points from {len(tasks)} of {len(filepaths)} rasters")
+
+    # sample the tiles, in parallel if there is more than one of them
+    args = [task[1:] for task in tasks]
+    if cpus > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(cpus, len(tasks))) as executor:
+            results = list(executor.map(_sample_raster, *zip(*args)))
+    else:
+        results = [_sample_raster(*a) for a in args]
+
+    # each point takes its value from the first tile that covers it
+    values = np.full(len(x), np.nan)
+    for (positions, *_), tile_values in zip(tasks, results):
+        missing = np.isnan(values[positions])
+        values[positions[missing]] = tile_values[missing]
+    return values
+
+
+def _sample_raster(filepath, band, x, y):
+    """
+    Sample a raster band at points, by bilinear interpolation.
+
+    Parameters
+    ----------
+    filepath : string
+        path to the raster file
+    band : int
+        which raster band to read
+    x : numpy.ndarray
+        the points' x coordinates, in the raster's CRS
+    y : numpy.ndarray
+        the points' y coordinates, in the raster's CRS
+
+    Returns
+    -------
+    values : numpy.ndarray
+        the interpolated values, null next to nodata pixels
+    """
+    with rasterio.open(filepath) as src:
+        # get the points' fractional positions in pixels, relative to the
+        # centers of the pixels
+        cols, rows = ~src.transform * (x, y)
+        cols = np.clip(cols - 0.5, 0, src.width - 1)
+        rows = np.clip(rows - 0.5, 0, src.height - 1)
+
+        # read just the window covering the points' surrounding pixels
+        col_off = int(cols.min())
+        row_off = int(rows.min())
+        width = min(int(cols.max()) + 2, src.width) - col_off
+        height = min(int(rows.max()) + 2, src.height) - row_off
+        window = Window(col_off, row_off, width, height)
+        pixels = src.read(band, window=window, masked=True)
+        pixels = pixels.astype(float).filled(np.nan)
+
+    # interpolate between the four pixels surrounding each point
+    cols -= col_off
+    rows -= row_off
+    col0 = np.minimum(cols.astype(int), width - 1)
+    row0 = np.minimum(rows.astype(int), height - 1)
+    col1 = np.minimum(col0 + 1, width - 1)
+    row1 = np.minimum(row0 + 1, height - 1)
+    dx = cols - col0
+    dy = rows - row0
+    top = pixels[row0, col0] * (1 - dx) + pixels[row0, col1] * dx
+    bottom = pixels[row1, col0] * (1 - dx) + pixels[row1, col1] * dx
+    return top * (1 - dy) + bottom * dy
+
+
+def _make_elevation_batches(locations, url_template, api_key, max_url_length, max_locations):
+    """
+    Split locations into batches whose API call URLs fit in a max length.
+
+    Parameters
+    ----------
+    locations : list
+        the "lat,lng" strings of the locations to request
+    url_template : string
+        the elevation API URL template
+    api_key : string
+        the elevation API key
+    max_url_length : int
+        max number of characters in each batch's URL
+    max_locations : int
+        max number of locations in each batch
+
+    Returns
+    -------
+    batches : list
+        list of lists of "lat,lng" strings
+    """
+    base_length = len(url_template.format(locations="", key=api_key))
+    batches = []
+    batch = []
+    length = base_length
+    for location in locations:
+        # each location after the first is preceded by a | separator
+        if batch and (length + 1 + len(location) > max_url_length or len(batch) >= max_locations):
+            batches.append(batch)
+            batch = []
+            length = base_length
+        length += len(location) + (1 if batch else 0)
+        batch.append(location)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _request_elevations(url, n_locations, pause_duration, retries):
+    """
+    Request elevations from an elevation API, retrying if the call fails.
+
+    Parameters
+    ----------
+    url : string
+        the API call URL
+    n_locations : int
+        the number of locations requested
+    pause_duration : float
+        time to pause before the API call, doubled before each retry. the
+        pause is made while holding a lock shared by all threads
+    retries : int
+        how many times to retry a failed API call
+
+    Returns
+    -------
+    elevations : list
+        the elevation of each location
+    """
+    for attempt in range(retries + 1):
+        with _pause_lock:
+            time.sleep(pause_duration * 2 ** attempt)
+        try:
+            utils.log(f"Requesting node elevations: {url}")
+            response = requests.get(
+                url, timeout=settings.timeout, headers=downloader._get_http_headers()
+            )
+            results = response.json()["results"]
+            if len(results) == n_locations:
+                return [result["elevation"] for result in results]
+            utils.log(f"Received {len(results)} results for {n_locations} locations")
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            utils.log(f"Elevation API request failed: {e}")
+
+    raise Exception(f"Elevation API request failed after {retries} retries: {url}")
+
+
+def _get_elevation_cache(url_template):
+    """
+    Get the cached elevations retrieved from an elevation API.
+
+    Parameters
+    ----------
+    url_template : string
+        the elevation API URL template
+
+    Returns
+    -------
+    cache : dict
+        dict of "lat,lng" strings to elevations
+    """
+    if url_template not in _elevation_cache:
+        _elevation_cache[url_template] = {}
+        filepath = _get_elevation_cache_filepath(url_template)
+        if settings.use_cache and os.path.isfile(filepath):
+            with open(filepath, encoding="utf-8") as f:
+                _elevation_cache[url_template].update(json.load(f))
+            utils.log(f'Retrieved elevations from cache file "{filepath}"')
+    return _elevation_cache[url_template]
+
+
+def _save_elevation_cache(url_template, cache):
+    """
+    Save the cached elevations retrieved from an elevation API to disk.
+
+    Parameters
+    ----------
+    url_template : string
+        the elevation API URL template
+    cache : dict
+        dict of "lat,lng" strings to elevations
+
+    Returns
+    -------
+    None
+    """
+    if settings.use_cache:
+        if not os.path.exists(settings.cache_folder):
+            os.makedirs(settings.cache_folder)
+        filepath = _get_elevation_cache_filepath(url_template)
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        utils.log(f'Saved elevations to cache file "{filepath}"')
+
+
+def _get_elevation_cache_filepath(url_template):
+    """
+    Get the path of the cache file for an elevation API's elevations.
+
+    Parameters
+    ----------
+    url_template : string
+        the elevation API URL template
+
+    Returns
+    -------
+    filepath : string
+    """
+    filename = "elevation_" + hashlib.md5(url_template.encode("utf-8")).hexdigest()
+    return os.path.join(settings.cache_folder, os.extsep.join([filename, "json"]))
+
+
 def add_edge_grades(G, add_absolute=True):
     """
     Add grade attribute to each graph edge.
 
     Get the directed grade (ie, rise over run) for each edge in the network and
     add it to the edge as an attribute. Nodes must have elevation attributes to
-    use this function.
+    use this function. Zero-length edges have a null grade.
 
     Parameters
     ----------
@@ -114,21 +479,121 @@ def add_edge_grades(G, add_absolute=True):
     -------
     G : networkx.MultiDiGraph
     """
-    # for each edge, calculate the difference in elevation from origin to
-    # destination, then divide by edge length
-    for u, v, data in G.edges(keys=False, data=True):
-        elevation_change = G.nodes[v]["elevation"] - G.nodes[u]["elevation"]
+    # look up each edge's origin and destination positions in the node
+    # elevation array, then calculate the difference in elevation from origin
+    # to destination and divide by edge length
+    df_nodes, df_edges = utils_graph.graph_to_dfs(
+        G, node_attrs=["elevation"], edge_attrs=["length"]
+    )
+    elevations = df_nodes["elevation"].to_numpy(dtype=float)
+    u_pos = df_nodes.index.get_indexer(df_edges["u"])
+    v_pos = df_nodes.index.get_indexer(df_edges["v"])
+    lengths = df_edges["length"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grades = np.where(lengths > 0, (elevations[v_pos] - elevations[u_pos]) / lengths, np.nan)
 
-        # round to ten-thousandths decimal place
-        try:
-            grade = round(elevation_change / data["length"], 4)
-        except ZeroDivisionError:
-            grade = None
+    # round to ten-thousandths decimal place
+    grades = grades.round(4)
 
-        # add grade and (optionally) grade absolute value to the edge data
-        data["grade"] = grade
-        if add_absolute:
-            data["grade_abs"] = abs(grade)
+    # add grade and (optionally) grade absolute value to the edge data
+    edges = list(zip(df_edges["u"], df_edges["v"], df_edges["key"]))
+    nx.set_edge_attributes(G, values=dict(zip(edges, grades.tolist())), name="grade")
+    if add_absolute:
+        grades_abs = np.abs(grades).tolist()
+        nx.set_edge_attributes(G, values=dict(zip(edges, grades_abs)), name="grade_abs")
 
     utils.log("Added grade data to all edges.")
     return G
+
+
+def add_edge_grade_profiles(G, filepath, interval=10, band=1, cpus=1):
+    """
+    Add grade and climb attributes along each edge's geometry from rasters.
+
+    Endpoint grades (see add_edge_grades) miss any hills along an edge
+    between its nodes, which matters for edges with long geometries. This
+    instead splits each edge's geometry into pieces no longer than `interval`
+    meters (or graph CRS units, if projected), samples elevations at their
+    ends from digital elevation model raster files, as in
+    add_node_elevations_raster, and adds to each edge:
+
+    - `grade_max`: the steepest grade of any of its pieces, in its direction
+    - `grade_mean`: the length-weighted mean absolute grade of its pieces
+    - `climb`: the total elevation gained (meters) along it
+
+    Pieces with null elevations are skipped, and edges with no pieces left
+    get null attributes.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    filepath : string or list
+        path (or list of paths) to the raster file(s)
+    interval : float
+        max length of the pieces between elevation samples
+    band : int
+        which raster band to read elevations from
+    cpus : int
+        how many processes to sample the rasters with, in parallel across
+        tiles. if None, use all available CPUs
+
+    Returns
+    -------
+    G : networkx.MultiDiGraph
+    """
+    if not rasterio:  # pragma: no cover
+        raise ImportError("The rasterio package must be installed to use this optional feature.")
+
+    edges, segments, segment_edges = utils_graph._get_edge_segments(G, use_geometry=True)
+    x1, y1, x2, y2 = segments.T
+    if projection._get_crs(G.graph["crs"]).is_projected:
+        lengths = distance.euclidean_dist_vec(y1, x1, y2, x2)
+    else:
+        lengths = distance.great_circle_vec(y1, x1, y2, x2)
+
+    # split each segment into equal pieces no longer than interval, then get
+    # the fractions along their segments where the pieces start and end
+    n_pieces = np.maximum(np.ceil(lengths / interval), 1).astype(np.int64)
+    piece_segments = np.repeat(np.arange(len(segments)), n_pieces)
+    piece_positions = np.arange(len(piece_segments)) - np.repeat(
+        np.cumsum(n_pieces) - n_pieces, n_pieces
+    )
+    n = n_pieces[piece_segments]
+    fractions = np.concatenate((piece_positions / n, (piece_positions + 1) / n))
+    segments_twice = np.concatenate((piece_segments, piece_segments))
+    x = x1[segments_twice] + (x2 - x1)[segments_twice] * fractions
+    y = y1[segments_twice] + (y2 - y1)[segments_twice] * fractions
+
+    # sample the elevations where the pieces start and end
+    elevations = _sample_rasters(filepath, x, y, G.graph["crs"], band, cpus)
+    rises = elevations[len(piece_segments) :] - elevations[: len(piece_segments)]
+    runs = lengths[piece_segments] / n
+    mask = (runs > 0) & ~np.isnan(rises)
+    piece_edges = segment_edges[piece_segments][mask]
+    rises = rises[mask]
+    runs = runs[mask]
+
+    # aggregate the pieces' grades and rises by edge
+    counts = np.bincount(piece_edges, minlength=len(edges))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_runs = np.bincount(piece_edges, weights=runs, minlength=len(edges))
+        grade_mean = np.bincount(piece_edges, weights=np.abs(rises), minlength=len(edges))
+        grade_mean = grade_mean / total_runs
+    grade_max = pd.Series(rises / runs).groupby(piece_edges).max()
+    grade_max = grade_max.reindex(range(len(edges))).to_numpy()
+    climb = np.bincount(piece_edges, weights=np.maximum(rises, 0), minlength=len(edges))
+    climb[counts == 0] = np.nan
+
+    # the edges are in the graph's edge order, so add the attributes in one
+    # pass over the edges' data
+    values = zip(grade_max.round(4).tolist(), grade_mean.round(4).tolist(), climb.round(3).tolist())
+    for (_, _, data), (edge_grade_max, edge_grade_mean, edge_climb) in zip(
+        G.edges(data=True), values
+    ):
+        data["grade_max"] = edge_grade_max
+        data["grade_mean"] = edge_grade_mean
+        data["climb"] = edge_climb
+
+    utils.log("Added grade profile data to all edges.")
+    return G
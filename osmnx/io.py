@@ -1,23 +1,59 @@
 """Serialize graphs to/from files on disk."""
 
 import ast
+import base64
+import gzip
+import json
 import os
-from xml.etree import ElementTree as etree
+from xml.sax.saxutils import escape as xml_escape
+from xml.sax.saxutils import quoteattr
 
+import geopandas as gpd
 import networkx as nx
 import numpy as np
 import pandas as pd
+from shapely import wkb
 from shapely import wkt
+from shapely.geometry import LineString
+from shapely.geometry import MultiPoint
+from shapely.geometry import Point
+from shapely.geometry.base import BaseGeometry
 
+from . import columnar
+from . import projection
 from . import settings
+from . import truncate
 from . import utils
 from . import utils_graph
 
+# pyogrio is an optional dependency for faster vector file writing
+try:
+    import pyogrio
+except ImportError:
+    pyogrio = None
 
-def save_graph_geopackage(G, filepath=None, encoding="utf-8"):
+# geopandas added to_file's mode parameter (to append to a layer) in version
+# 0.8, and its engine parameter (to write with pyogrio) in version 0.11
+_GPD_VERSION = tuple(int(v) for v in gpd.__version__.split(".")[:2])
+
+# pyarrow is an optional dependency for saving/loading geoparquet files
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def save_graph_geopackage(G, filepath=None, encoding="utf-8", directed=False, chunksize=None):
     """
     Save graph nodes and edges to disk as layers in a GeoPackage file.
 
+    Attributes keep their types where the file format supports them (e.g.,
+    numeric, boolean, and string attributes), and any others (e.g., lists)
+    are saved as strings. Layers are written with pyogrio if it is installed
+    (and geopandas >= 0.11), otherwise with fiona.
+
     Parameters
     ----------
     G : networkx.MultiDiGraph
@@ -27,6 +63,15 @@ def save_graph_geopackage(G, filepath=None, encoding="utf-8"):
         data folder + graph.gpkg
     encoding : string
         the character encoding for the saved file
+    directed : bool
+        if False, save one edge for each undirected edge in the graph. if
+        True, save every directed edge, which skips the cost of converting
+        the graph to undirected
+    chunksize : int
+        if not None, write each layer in batches of this many rows when
+        writing with fiona. this bounds fiona's memory use while writing,
+        but the nodes and edges GeoDataFrames are still built in full first.
+        ignored when writing with pyogrio or with geopandas < 0.8
 
     Returns
     -------
@@ -41,24 +86,26 @@ def save_graph_geopackage(G, filepath=None, encoding="utf-8"):
     if not folder == "" and not os.path.exists(folder):
         os.makedirs(folder)
 
-    # convert undirected graph to geodataframes
-    gdf_nodes, gdf_edges = utils_graph.graph_to_gdfs(utils_graph.get_undirected(G))
-
-    # make every non-numeric edge attribute (besides geometry) a string
-    for col in [c for c in gdf_edges.columns if not c == "geometry"]:
-        if not pd.api.types.is_numeric_dtype(gdf_edges[col]):
-            gdf_edges[col] = gdf_edges[col].fillna("").astype(str)
+    # convert (undirected) graph to geodataframes
+    if not directed:
+        G = utils_graph.get_undirected(G)
+    gdf_nodes, gdf_edges = utils_graph.graph_to_gdfs(G)
 
     # save the nodes and edges as GeoPackage layers
-    gdf_nodes.to_file(filepath, layer="nodes", driver="GPKG", encoding=encoding)
-    gdf_edges.to_file(filepath, layer="edges", driver="GPKG", encoding=encoding)
+    _save_vector_layer(gdf_nodes, filepath, "nodes", "GPKG", encoding, chunksize)
+    _save_vector_layer(gdf_edges, filepath, "edges", "GPKG", encoding, chunksize)
     utils.log(f'Saved graph as GeoPackage at "{filepath}"')
 
 
-def save_graph_shapefile(G, filepath=None, encoding="utf-8"):
+def save_graph_shapefile(G, filepath=None, encoding="utf-8", directed=False, chunksize=None):
     """
     Save graph nodes and edges to disk as ESRI shapefiles.
 
+    Attributes keep their types where the file format supports them (e.g.,
+    numeric and string attributes), and any others (e.g., lists) are saved
+    as strings. Shapefiles are written with pyogrio if it is installed (and
+    geopandas >= 0.11), otherwise with fiona.
+
     Parameters
     ----------
     G : networkx.MultiDiGraph
@@ -68,6 +115,15 @@ def save_graph_shapefile(G, filepath=None, encoding="utf-8"):
         default data folder + graph_shapefile
     encoding : string
         the character encoding for the saved files
+    directed : bool
+        if False, save one edge for each undirected edge in the graph. if
+        True, save every directed edge, which skips the cost of converting
+        the graph to undirected
+    chunksize : int
+        if not None, write each shapefile in batches of this many rows when
+        writing with fiona. this bounds fiona's memory use while writing,
+        but the nodes and edges GeoDataFrames are still built in full first.
+        ignored when writing with pyogrio or with geopandas < 0.8
 
     Returns
     -------
@@ -84,29 +140,102 @@ def save_graph_shapefile(G, filepath=None, encoding="utf-8"):
     filepath_nodes = os.path.join(filepath, "nodes.shp")
     filepath_edges = os.path.join(filepath, "edges.shp")
 
-    # convert undirected graph to geodataframes
-    gdf_nodes, gdf_edges = utils_graph.graph_to_gdfs(utils_graph.get_undirected(G))
-
-    # make every non-numeric edge attribute (besides geometry) a string
-    for col in [c for c in gdf_edges.columns if not c == "geometry"]:
-        if not pd.api.types.is_numeric_dtype(gdf_edges[col]):
-            gdf_edges[col] = gdf_edges[col].fillna("").astype(str)
-
-    # make every non-numeric node attribute (besides geometry) a string
-    for col in [c for c in gdf_nodes.columns if not c == "geometry"]:
-        if not pd.api.types.is_numeric_dtype(gdf_nodes[col]):
-            gdf_nodes[col] = gdf_nodes[col].fillna("").astype(str)
+    # convert (undirected) graph to geodataframes
+    if not directed:
+        G = utils_graph.get_undirected(G)
+    gdf_nodes, gdf_edges = utils_graph.graph_to_gdfs(G)
 
     # save the nodes and edges as separate ESRI shapefiles
-    gdf_nodes.to_file(filepath_nodes, encoding=encoding)
-    gdf_edges.to_file(filepath_edges, encoding=encoding)
+    _save_vector_layer(gdf_nodes, filepath_nodes, None, None, encoding, chunksize)
+    _save_vector_layer(gdf_edges, filepath_edges, None, None, encoding, chunksize)
     utils.log(f'Saved graph as shapefiles at "{filepath}"')
 
 
+def _save_vector_layer(gdf, filepath, layer, driver, encoding, chunksize):
+    """
+    Save a GeoDataFrame to a vector file layer, with typed attribute columns.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+        the GeoDataFrame to save
+    filepath : string
+        path to the file
+    layer : string
+        name of the layer to save, or None if the format has no layers
+    driver : string
+        the OGR driver name, or None to infer it from the file extension
+    encoding : string
+        the character encoding for the saved file
+    chunksize : int
+        if not None, write in batches of this many rows when writing with
+        fiona, if geopandas supports appending to a layer
+
+    Returns
+    -------
+    None
+    """
+    gdf = _make_vector_columns(gdf)
+    kwargs = {"encoding": encoding}
+    use_pyogrio = pyogrio is not None and _GPD_VERSION >= (0, 11)
+    if use_pyogrio:
+        kwargs["engine"] = "pyogrio"
+    if layer is not None:
+        kwargs["layer"] = layer
+    if driver is not None:
+        kwargs["driver"] = driver
+
+    if chunksize is None or use_pyogrio or _GPD_VERSION < (0, 8) or len(gdf) <= chunksize:
+        gdf.to_file(filepath, **kwargs)
+    else:
+        # create the layer with the first chunk, then append the rest to it
+        for start in range(0, len(gdf), chunksize):
+            mode = "w" if start == 0 else "a"
+            gdf.iloc[start : start + chunksize].to_file(filepath, mode=mode, **kwargs)
+
+
+def _make_vector_columns(gdf):
+    """
+    Type a GeoDataFrame's object columns so they can be saved to a vector file.
+
+    Columns whose non-null values are all booleans, integers, floats, or
+    strings get the corresponding (nullable, if necessary) type, and any
+    other columns' non-null values are converted to strings.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+        the GeoDataFrame to convert
+
+    Returns
+    -------
+    gdf : geopandas.GeoDataFrame
+    """
+    gdf = gdf.copy()
+    for col in gdf.columns:
+        if col == gdf.geometry.name or gdf[col].dtype != object:
+            continue
+        values = [None if _is_missing(value) else value for value in gdf[col].tolist()]
+        column = columnar._make_column(values)
+        if isinstance(column, pd.Categorical):
+            column = np.asarray(column, dtype=object)
+        elif column.dtype == object:
+            column = np.array(
+                [None if value is None else str(value) for value in values], dtype=object
+            )
+        gdf[col] = column
+    return gdf
+
+
 def save_graphml(G, filepath=None, gephi=False, encoding="utf-8"):
     """
     Save graph to disk as GraphML file.
 
+    The file is written element by element, stringifying node, edge, and
+    graph attribute values on the fly, so the graph is neither copied nor
+    held in memory as a full XML document. If filepath ends with ".gz", the
+    file is gzip-compressed (load_graphml reads such files directly).
+
     Parameters
     ----------
     G : networkx.MultiDiGraph
@@ -133,63 +262,142 @@ def save_graphml(G, filepath=None, gephi=False, encoding="utf-8"):
     if not folder == "" and not os.path.exists(folder):
         os.makedirs(folder)
 
-    # create a copy to convert all the node/edge attribute values to string
-    G_save = G.copy()
+    if filepath.endswith(".gz"):
+        f = gzip.open(filepath, "wt", encoding=encoding)
+    else:
+        f = open(filepath, "w", encoding=encoding)
+
+    with f:
+        _write_graphml(f, G, gephi, encoding)
+    utils.log(f'Saved graph as GraphML file at "{filepath}"')
 
-    if gephi:
 
-        gdf_nodes, gdf_edges = utils_graph.graph_to_gdfs(
-            G_save, nodes=True, edges=True, node_geometry=True, fill_edge_geometry=True
-        )
+def _write_graphml(f, G, gephi, encoding):
+    """
+    Write a graph to an open file handle as GraphML, element by element.
+
+    Parameters
+    ----------
+    f : file object
+        the text file handle to write to
+    G : networkx.MultiDiGraph
+        input graph
+    gephi : bool
+        if True, give each edge a unique key, add node xcoord/ycoord and node
+        and edge geometry attributes, and omit graph attributes, to work
+        around Gephi's restrictive interpretation of the GraphML specification
+    encoding : string
+        the character encoding declared in the XML header
+
+    Returns
+    -------
+    None
+    """
+    # gather all the attribute names first, as GraphML declares them up front
+    graph_attrs = [] if gephi else list(G.graph)
+    node_attrs = list(dict.fromkeys(attr for _, d in G.nodes(data=True) for attr in d))
+    edge_attrs = list(dict.fromkeys(attr for _, _, d in G.edges(data=True) for attr in d))
+    if gephi:
+        node_attrs = list(dict.fromkeys(node_attrs + ["geometry", "xcoord", "ycoord"]))
+        edge_attrs = list(dict.fromkeys(edge_attrs + ["geometry"]))
+
+    f.write(f"<?xml version='1.0' encoding='{encoding}'?>\n")
+    f.write(
+        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+        'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n'
+    )
 
+    # declare every attribute as a key: all values are saved as strings
+    # except for gephi's numeric x/y coordinates
+    keys = {}
+    for domain, attrs in (("graph", graph_attrs), ("node", node_attrs), ("edge", edge_attrs)):
+        keys[domain] = {}
+        for attr in attrs:
+            key_id = f"d{sum(len(k) for k in keys.values())}"
+            keys[domain][attr] = key_id
+            attr_type = "double" if gephi and attr in {"xcoord", "ycoord"} else "string"
+            f.write(
+                f'<key id="{key_id}" for="{domain}" attr.name={quoteattr(str(attr))} '
+                f'attr.type="{attr_type}" />\n'
+            )
+
+    f.write('<graph edgedefault="directed">\n')
+    for attr in graph_attrs:
+        value = G.graph[attr]
+        if isinstance(value, np.ndarray):
+            value = json.dumps(_encode_array(value))
+        f.write(_graphml_data(keys["graph"][attr], value))
+
+    node_keys = keys["node"]
+    for node, data in G.nodes(data=True):
+        f.write(f"<node id={quoteattr(str(node))}>")
+        for attr, value in data.items():
+            f.write(_graphml_data(node_keys[attr], value))
+        if gephi:
+            if "geometry" not in data:
+                f.write(_graphml_data(node_keys["geometry"], Point(data["x"], data["y"])))
+            f.write(_graphml_data(node_keys["xcoord"], data["x"]))
+            f.write(_graphml_data(node_keys["ycoord"], data["y"]))
+        f.write("</node>\n")
+
+    edge_keys = keys["edge"]
+    for i, (u, v, k, data) in enumerate(G.edges(keys=True, data=True)):
         # turn each edge's key into a unique ID for Gephi compatibility
-        gdf_edges["key"] = range(len(gdf_edges))
+        key = i if gephi else k
+        f.write(f'<edge source={quoteattr(str(u))} target={quoteattr(str(v))} id="{key}">')
+        for attr, value in data.items():
+            f.write(_graphml_data(edge_keys[attr], value))
+        if gephi and "geometry" not in data:
+            line = LineString([(G.nodes[n]["x"], G.nodes[n]["y"]) for n in (u, v)])
+            f.write(_graphml_data(edge_keys["geometry"], line))
+        f.write("</edge>\n")
 
-        # gephi doesn't handle node attrs named x and y well, so rename
-        gdf_nodes["xcoord"] = gdf_nodes["x"]
-        gdf_nodes["ycoord"] = gdf_nodes["y"]
-        G_save = utils_graph.graph_from_gdfs(gdf_nodes, gdf_edges)
+    f.write("</graph></graphml>\n")
 
-        # remove graph attributes as Gephi only accepts node and edge attrs
-        G_save.graph = {}
 
-    else:
-        # if not gephi, keep graph attrs and stringify them
-        for dict_key in G_save.graph:
-            # convert all the graph attribute values to strings
-            G_save.graph[dict_key] = str(G_save.graph[dict_key])
-
-    # stringify node and edge attributes
-    for _, data in G_save.nodes(data=True):
-        for dict_key in data:
-            if gephi and dict_key in ["xcoord", "ycoord"]:
-                # don't convert x y values to string if saving for gephi
-                continue
-            else:
-                # convert all the node attribute values to strings
-                data[dict_key] = str(data[dict_key])
+def _graphml_data(key_id, value):
+    """
+    Make a GraphML data element containing a stringified attribute value.
 
-    for _, _, data in G_save.edges(keys=False, data=True):
-        for dict_key in data:
-            # convert all the edge attribute values to strings
-            data[dict_key] = str(data[dict_key])
+    Parameters
+    ----------
+    key_id : string
+        the ID of the attribute's key declaration
+    value : object
+        the attribute value
 
-    nx.write_graphml(G_save, path=filepath, encoding=encoding)
-    utils.log(f'Saved graph as GraphML file at "{filepath}"')
+    Returns
+    -------
+    string
+    """
+    return f'<data key="{key_id}">{xml_escape(str(value))}</data>'
 
 
-def load_graphml(filepath, node_type=int):
+def load_graphml(filepath, node_type=int, node_dtypes=None, edge_dtypes=None):
     """
     Load an OSMnx-saved GraphML file from disk.
 
-    Then convert the node/edge attributes to appropriate data types.
+    Then convert the node/edge attributes to appropriate data types. Each
+    attribute is converted from string with the type (or any callable that
+    takes a string) that the node_dtypes/edge_dtypes schema maps it to. A
+    stringified list value (e.g., from graph simplification) is converted to
+    a list, with each of its elements converted by the attribute's type.
+    Attributes not in the schema are left as strings.
 
     Parameters
     ----------
     filepath : string
         path to the GraphML file
     node_type : type
-        convert node ids to this data type
+        convert node ids (and osmid attributes) to this data type
+    node_dtypes : dict
+        dict of node attribute name:type, to update the default node
+        attribute schema with
+    edge_dtypes : dict
+        dict of edge attribute name:type, to update the default edge
+        attribute schema with
 
     Returns
     -------
@@ -198,10 +406,44 @@ def load_graphml(filepath, node_type=int):
     # read the graph from disk
     G = nx.MultiDiGraph(nx.read_graphml(filepath, node_type=node_type))
 
+    # build the node and edge attribute schemas
+    node_schema = {"osmid": node_type, "x": float, "y": float}
+    node_schema.update({attr: float for attr in ["elevation", "elevation_res"]})
+    node_schema.update(node_dtypes if node_dtypes is not None else {})
+
+    edge_schema = {"osmid": node_type, "oneway": _convert_bool_string, "geometry": wkt.loads}
+    for attr in [
+        "length",
+        "grade",
+        "grade_abs",
+        "bearing",
+        "speed_kph",
+        "travel_time",
+    ]:
+        edge_schema[attr] = float
+    edge_schema["speed_profile"] = int
+    for attr in [
+        "highway",
+        "name",
+        "bridge",
+        "tunnel",
+        "lanes",
+        "ref",
+        "maxspeed",
+        "service",
+        "access",
+        "area",
+        "landuse",
+        "width",
+        "est_width",
+    ]:
+        edge_schema[attr] = str
+    edge_schema.update(edge_dtypes if edge_dtypes is not None else {})
+
     # convert node/edge attribute data types
     utils.log("Converting node and edge attribute data types")
-    G = _convert_node_attr_types(G, node_type)
-    G = _convert_edge_attr_types(G, node_type)
+    _convert_attr_types([data for _, data in G.nodes(data=True)], node_schema)
+    _convert_attr_types([data for _, _, data in G.edges(data=True)], edge_schema)
 
     # convert graph crs attribute from saved string to correct dict data type
     # if it is a stringified dict rather than a proj4 string
@@ -211,6 +453,10 @@ def load_graphml(filepath, node_type=int):
     if "streets_per_node" in G.graph:
         G.graph["streets_per_node"] = ast.literal_eval(G.graph["streets_per_node"])
 
+    if "speed_profiles" in G.graph:
+        G.graph["speed_profiles"] = _decode_array(json.loads(G.graph["speed_profiles"]))
+        G.graph["speed_profile_bucket_seconds"] = float(G.graph["speed_profile_bucket_seconds"])
+
     # remove node_default and edge_default metadata keys if they exist
     if "node_default" in G.graph:
         del G.graph["node_default"]
@@ -221,116 +467,1170 @@ def load_graphml(filepath, node_type=int):
     return G
 
 
-def _convert_node_attr_types(G, node_type):
+def _convert_attr_types(attr_dicts, schema):
     """
-    Convert graph nodes' attributes' types from string to numeric.
+    Convert attribute values from strings to their types, column by column.
+
+    For each attribute in the schema, gather every dict's string value, then
+    convert them all in one pass: stringified lists are parsed with
+    _parse_list_string and the attribute's type is applied to each element,
+    while all other values are converted directly. Values that cannot be
+    converted to the attribute's type (e.g., "2;3" or "2 lanes" as an int)
+    keep their original string.
+
+    Parameters
+    ----------
+    attr_dicts : list
+        the node or edge attribute dicts, modified in place
+    schema : dict
+        dict of attribute name:type (or callable that takes a string)
+
+    Returns
+    -------
+    None
+    """
+    for attr, dtype in schema.items():
+        dicts = [d for d in attr_dicts if attr in d]
+        values = [d[attr] for d in dicts]
+        is_list = [
+            isinstance(value, str) and value.startswith("[") and value.endswith("]")
+            for value in values
+        ]
+        converted = [
+            _parse_list_string(value, dtype) if lst else _convert_value(value, dtype)
+            for value, lst in zip(values, is_list)
+        ]
+        for d, value in zip(dicts, converted):
+            d[attr] = value
+
+
+def _convert_value(value, dtype):
+    """
+    Convert a value to dtype, or return it unchanged if it cannot be converted.
+
+    Parameters
+    ----------
+    value : string
+        the value to convert
+    dtype : type
+        convert the value to this data type
+
+    Returns
+    -------
+    value : dtype or string
+    """
+    try:
+        return dtype(value)
+    except (ValueError, TypeError):
+        return value
+
+
+def _parse_list_string(value, dtype=str):
+    """
+    Parse a stringified python list, converting each element to dtype.
+
+    Handles the common cases of lists of plain numbers or simply quoted
+    strings by splitting, and falls back to ast.literal_eval for anything
+    else (e.g., strings containing quotes, commas, or escapes). If the value
+    cannot be parsed, or its elements cannot be converted to dtype, it is
+    returned as is.
+
+    Parameters
+    ----------
+    value : string
+        the stringified list, such as "['residential', 'tertiary']"
+    dtype : type
+        convert each element to this data type
+
+    Returns
+    -------
+    list or string
+    """
+    elements = value[1:-1].split(", ")
+    parsed = []
+    try:
+        for element in elements:
+            quote = element[:1]
+            if quote in {"'", '"'}:
+                inner = element[1:-1]
+                if len(element) < 2 or element[-1] != quote or quote in inner or "\\" in inner:
+                    break
+                parsed.append(dtype(inner))
+            elif element[:1].isdigit() or element[:1] == "-":
+                parsed.append(dtype(element))
+            else:
+                break
+        else:
+            return parsed
+    except (ValueError, TypeError):
+        return value
+
+    # fast path failed, so evaluate the list with the slower general parser
+    try:
+        return [dtype(element) for element in ast.literal_eval(value)]
+    except (ValueError, SyntaxError, TypeError):
+        return value
+
+
+def _convert_bool_string(value):
+    """
+    Convert a "True" or "False" string to a boolean.
+
+    Integer strings (e.g., the OSM oneway tag value "-1", which may occur if
+    settings.all_oneway was True when the graph was created) are converted to
+    integers, and any other value is returned as is.
+
+    Parameters
+    ----------
+    value : string
+        the string to convert
+
+    Returns
+    -------
+    bool or int or string
+    """
+    if value == "True":
+        return True
+    elif value == "False":
+        return False
+    else:
+        try:
+            return int(value)
+        except ValueError:
+            return value
+
+
+def save_graph_binary(G, filepath=None):
+    """
+    Save graph to disk in a compact binary format.
+
+    The graph is converted to its columnar representation (see the columnar
+    module) and saved as a folder containing one .npy file per typed column
+    array, plus a graph.json file containing the graph attributes and the
+    column schema. Numeric columns, categorical codes, and the packed edge
+    geometry coordinates are saved as raw arrays, so they can be loaded (or
+    memory-mapped) without any parsing.
 
     Parameters
     ----------
     G : networkx.MultiDiGraph
         input graph
-    node_type : type
-        convert osmid to this type
+    filepath : string
+        path to the binary graph folder. if None, use default data folder +
+        graph_binary
 
     Returns
     -------
-    G : networkx.MultiDiGraph
+    None
     """
-    # convert numeric node tags from string to numeric data types
-    for _, data in G.nodes(data=True):
-        data["osmid"] = node_type(data["osmid"])
-        data["x"] = float(data["x"])
-        data["y"] = float(data["y"])
+    # default filepath if none was provided
+    if filepath is None:
+        filepath = os.path.join(settings.data_folder, "graph_binary")
 
-        if "elevation" in data:
-            data["elevation"] = float(data["elevation"])
+    # if save folder does not already exist, create it
+    if not filepath == "" and not os.path.exists(filepath):
+        os.makedirs(filepath)
 
-        if "elevation_res" in data:
-            data["elevation_res"] = float(data["elevation_res"])
+    columns = columnar.graph_to_columns(G)
+    _save_binary_columns(filepath, columns)
+    utils.log(f'Saved graph as binary files at "{filepath}"')
 
-    return G
 
+def load_graph_binary(filepath, mmap=False, as_columns=False):
+    """
+    Load a graph saved by save_graph_binary from disk.
 
-def _convert_edge_attr_types(G, node_type):
+    Parameters
+    ----------
+    filepath : string
+        path to the binary graph folder
+    mmap : bool
+        if True, memory-map the saved arrays rather than reading them into
+        memory. this is mostly useful with as_columns=True, for example to
+        work with a huge graph's packed edge geometry coordinates
+    as_columns : bool
+        if True, return the graph's columnar representation (see the
+        columnar module) rather than converting it into a MultiDiGraph
+
+    Returns
+    -------
+    networkx.MultiDiGraph or dict
+        the graph, or its columnar representation if as_columns is True
+    """
+    columns = _load_binary_columns(filepath, mmap_mode="r" if mmap else None)
+    utils.log(f'Loaded graph columns from "{filepath}"')
+
+    if as_columns:
+        return columns
+    else:
+        return columnar.graph_from_columns(columns)
+
+
+def save_graph_tiles(G, filepath=None, grid_size=16):
     """
-    Convert graph edges' attributes' types from string to numeric.
+    Save graph to disk as a spatially partitioned store of binary tiles.
+
+    The graph's nodes are partitioned into the cells of a grid over the
+    graph, and each edge is assigned to its u node's cell. Each non-empty
+    cell is saved as a tile: a folder in the binary format of
+    save_graph_binary, whose arrays can be memory-mapped. A tiles.json index
+    file records each tile's bounds and the other tiles its edges connect to,
+    so that load_graph_tiles can cut a study area out of a huge graph by
+    reading just the tiles it needs.
 
     Parameters
     ----------
     G : networkx.MultiDiGraph
         input graph
-    node_type : type
-        convert osmid to this type
+    filepath : string
+        path to the tiles folder. if None, use default data folder +
+        graph_tiles
+    grid_size : int
+        the number of rows and columns in the grid of tiles
+
+    Returns
+    -------
+    None
+    """
+    # default filepath if none was provided
+    if filepath is None:
+        filepath = os.path.join(settings.data_folder, "graph_tiles")
+
+    # if save folder does not already exist, create it
+    if not filepath == "" and not os.path.exists(filepath):
+        os.makedirs(filepath)
+
+    # a graph without nodes has no x/y columns, so give it empty ones
+    columns = columnar.graph_to_columns(G)
+    df_nodes = columns["nodes"]
+    df_edges = columns["edges"]
+    if len(df_nodes) < 1:
+        df_nodes = df_nodes.assign(x=np.empty(0), y=np.empty(0))
+    x = df_nodes["x"].to_numpy(dtype=float)
+    y = df_nodes["y"].to_numpy(dtype=float)
+
+    # assign the nodes to grid cells, and the edges to their u nodes' cells
+    node_cells = _get_grid_cells(x, y, grid_size)
+    u_pos, v_pos = columnar.get_edge_endpoints(columns)
+    edge_cells = node_cells[u_pos]
+
+    # tiles are neighbors if an edge connects them, in either direction
+    pairs = np.column_stack((edge_cells, node_cells[v_pos]))
+    pairs = np.unique(pairs[pairs[:, 0] != pairs[:, 1]], axis=0)
+    neighbors = {}
+    for cell, other in np.concatenate((pairs, pairs[:, ::-1])).tolist():
+        neighbors.setdefault(cell, set()).add(other)
+
+    # sort the nodes and edges by cell, then save each cell's rows as a tile
+    node_order = np.argsort(node_cells, kind="stable")
+    edge_order = np.argsort(edge_cells, kind="stable")
+    node_splits = np.searchsorted(node_cells[node_order], np.arange(grid_size ** 2 + 1))
+    edge_splits = np.searchsorted(edge_cells[edge_order], np.arange(grid_size ** 2 + 1))
+
+    tiles = {}
+    for cell in np.unique(node_cells).tolist():
+        nodes = node_order[node_splits[cell] : node_splits[cell + 1]]
+        edges = edge_order[edge_splits[cell] : edge_splits[cell + 1]]
+        coords, offsets = _take_packed_coords(columns["coords"], columns["offsets"], edges)
+        tile_columns = {
+            "graph": columns["graph"],
+            "nodes": df_nodes.iloc[nodes],
+            "edges": df_edges.iloc[edges].reset_index(drop=True),
+            "coords": coords,
+            "offsets": offsets,
+        }
+        name = f"tile_{cell}"
+        os.makedirs(os.path.join(filepath, name), exist_ok=True)
+        _save_binary_columns(os.path.join(filepath, name), tile_columns)
+
+        bounds = [x[nodes].min(), y[nodes].min(), x[nodes].max(), y[nodes].max()]
+        tile_neighbors = [f"tile_{other}" for other in sorted(neighbors.get(cell, []))]
+        tiles[name] = {"bounds": bounds, "neighbors": tile_neighbors}
+
+    with open(os.path.join(filepath, "tiles.json"), "w", encoding="utf-8") as f:
+        json.dump({"graph": _encode_graph_attrs(G.graph), "tiles": tiles}, f)
+
+    utils.log(f'Saved graph as {len(tiles)} tiles at "{filepath}"')
+
+
+def load_graph_tiles(filepath, polygon, retain_all=False, truncate_by_edge=False):
+    """
+    Load the part of a graph saved by save_graph_tiles that lies in a polygon.
+
+    Only the tiles whose nodes' bounds intersect the polygon (plus, if
+    truncate_by_edge is True, the tiles their edges connect to) are read, by
+    memory-mapping their arrays. The graph built from them is then truncated
+    with truncate.truncate_graph_polygon, so the result is the same as loading
+    the whole graph and truncating it to the polygon.
+
+    Parameters
+    ----------
+    filepath : string
+        path to the tiles folder
+    polygon : shapely.geometry.Polygon or shapely.geometry.MultiPolygon
+        only retain nodes in graph that lie within this geometry, which must
+        be in the graph's CRS
+    retain_all : bool
+        if True, return the entire graph even if it is not connected
+    truncate_by_edge : bool
+        if True retain node if it's outside polygon but at least one of node's
+        neighbors are within polygon
 
     Returns
     -------
     G : networkx.MultiDiGraph
     """
-    # convert numeric, bool, and list edge attributes from string to correct data types
-    for _, _, data in G.edges(data=True, keys=False):
+    with open(os.path.join(filepath, "tiles.json"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+
+    # find the tiles whose nodes' bounds intersect the polygon
+    names = []
+    for name, tile in index["tiles"].items():
+        minx, miny, maxx, maxy = tile["bounds"]
+        if polygon.intersects(MultiPoint([(minx, miny), (maxx, maxy)]).envelope):
+            names.append(name)
+    if truncate_by_edge:
+        neighbors = [other for name in names for other in index["tiles"][name]["neighbors"]]
+        names = list(dict.fromkeys(names + neighbors))
+    tiles = [_load_binary_columns(os.path.join(filepath, name), mmap_mode="r") for name in names]
+    utils.log(f"Loading {len(tiles)} of {len(index['tiles'])} tiles")
+
+    # add all the tiles' nodes first, then only the edges whose v nodes were
+    # also loaded
+    G = nx.MultiDiGraph(**_decode_graph_attrs(index["graph"]))
+    for columns in tiles:
+        columnar._add_nodes_from_columns(G, columns)
+    loaded_nodes = pd.Index(list(G.nodes))
+    for columns in tiles:
+        mask = columns["edges"]["v"].isin(loaded_nodes).to_numpy()
+        columnar._add_edges_from_columns(G, columns, mask)
+
+    return truncate.truncate_graph_polygon(
+        G, polygon, retain_all=retain_all, truncate_by_edge=truncate_by_edge
+    )
+
+
+def _take_packed_coords(coords, offsets, positions):
+    """
+    Take the packed coordinates of a subset of edges.
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        array of shape (n, 2) of packed coordinates
+    offsets : numpy.ndarray
+        array of length m + 1 of each edge's coordinates' offsets
+    positions : numpy.ndarray
+        the positions of the edges to take
+
+    Returns
+    -------
+    coords, offsets : tuple
+        the subset's packed coordinates and their offsets
+    """
+    starts = offsets[:-1][positions]
+    counts = offsets[1:][positions] - starts
+    new_offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+    new_offsets[1:] = np.cumsum(counts)
+    rows = np.repeat(starts - new_offsets[:-1], counts) + np.arange(new_offsets[-1])
+    return coords[rows].reshape(-1, 2), new_offsets
 
-        # parse length to float: should always have only 1 value
-        data["length"] = float(data["length"])
 
+def _save_binary_columns(filepath, columns):
+    """
+    Save a columnar graph to a folder of binary files.
+
+    Parameters
+    ----------
+    filepath : string
+        path to the binary graph folder, which must already exist
+    columns : dict
+        the columnar graph, as returned by columnar.graph_to_columns
+
+    Returns
+    -------
+    None
+    """
+    schema = {"nodes": [], "edges": []}
+
+    # save the node IDs, then every column of the nodes and edges tables
+    node_ids = columnar._make_column(columns["nodes"].index.tolist())
+    schema["index"] = _save_binary_column(filepath, "index", node_ids)
+    for table in ["nodes", "edges"]:
+        for i, (name, values) in enumerate(columns[table].items()):
+            col_schema = _save_binary_column(filepath, f"{table}_{i}", values.values)
+            col_schema["name"] = name
+            schema[table].append(col_schema)
+
+    # save the packed edge geometry coordinates and offsets
+    np.save(os.path.join(filepath, "coords.npy"), columns["coords"], allow_pickle=False)
+    np.save(os.path.join(filepath, "offsets.npy"), columns["offsets"], allow_pickle=False)
+
+    # save the graph attributes and schema
+    with open(os.path.join(filepath, "graph.json"), "w", encoding="utf-8") as f:
+        json.dump({"graph": _encode_graph_attrs(columns["graph"]), "schema": schema}, f)
+
+
+def _load_binary_columns(filepath, mmap_mode=None):
+    """
+    Load a columnar graph saved by _save_binary_columns from disk.
+
+    Parameters
+    ----------
+    filepath : string
+        path to the binary graph folder
+    mmap_mode : string
+        passed to numpy.load to memory-map the saved arrays
+
+    Returns
+    -------
+    columns : dict
+        the columnar graph
+    """
+    with open(os.path.join(filepath, "graph.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    schema = meta["schema"]
+
+    graph_attrs = _decode_graph_attrs(meta["graph"])
+
+    index = pd.Index(_load_binary_column(filepath, "index", schema["index"], mmap_mode))
+    tables = {}
+    for table in ["nodes", "edges"]:
+        data = {}
+        for i, col_schema in enumerate(schema[table]):
+            data[col_schema["name"]] = _load_binary_column(
+                filepath, f"{table}_{i}", col_schema, mmap_mode
+            )
+        tables[table] = pd.DataFrame(data, index=index if table == "nodes" else None)
+
+    columns = {
+        "graph": graph_attrs,
+        "nodes": tables["nodes"],
+        "edges": tables["edges"],
+        "coords": np.load(os.path.join(filepath, "coords.npy"), mmap_mode=mmap_mode),
+        "offsets": np.load(os.path.join(filepath, "offsets.npy"), mmap_mode=mmap_mode),
+    }
+    return columns
+
+
+def _encode_graph_attrs(graph_attrs):
+    """
+    Encode graph attributes so they can be saved as json.
+
+    Attribute values are encoded as python literals if possible (so they can
+    be safely evaluated back into their original types when loading), numpy
+    arrays (like speed profile matrices) as their raw binary data, and
+    anything else as strings.
+
+    Parameters
+    ----------
+    graph_attrs : dict
+        the graph attributes
+
+    Returns
+    -------
+    dict
+        dict of attribute name to (kind, encoded value) pairs
+    """
+    encoded = {}
+    for key, value in graph_attrs.items():
+        if isinstance(value, np.ndarray):
+            encoded[key] = ["array", _encode_array(value)]
+            continue
         try:
-            data["oneway"] = ast.literal_eval(data["oneway"])
-        except KeyError:
-            # may lack oneway if settings.all_oneway=True when you created graph
-            pass
-        except ValueError:
-            # may have values it can't eval if settings.all_oneway=True
-            pass
-
-        # parse grade attrs to float: should always have only 1 value each
-        if "grade" in data:
-            data["grade"] = float(data["grade"])
-        if "grade_abs" in data:
-            data["grade_abs"] = float(data["grade_abs"])
-
-        # these attributes might have a single value, or a list if edge's
-        # topology was simplified
-        for attr in [
-            "highway",
-            "name",
-            "bridge",
-            "tunnel",
-            "lanes",
-            "ref",
-            "maxspeed",
-            "service",
-            "access",
-            "area",
-            "landuse",
-            "width",
-            "est_width",
-        ]:
-            # if this edge has this attribute, and it starts with '[' and ends
-            # with ']', then it's a list to be parsed
-            if attr in data and data[attr].startswith("[") and data[attr].endswith("]"):
-                # try to convert the string list to a list type, else leave as
-                # single-value string (and leave as string if error)
-                try:
-                    data[attr] = ast.literal_eval(data[attr])
-                except Exception:
-                    pass
-
-        # osmid might have a single value or a list
-        if "osmid" in data:
-            if data["osmid"].startswith("[") and data["osmid"].endswith("]"):
-                # if it's a list, eval list then convert each element to node_type
-                data["osmid"] = [node_type(i) for i in ast.literal_eval(data["osmid"])]
-            else:
-                # if it's not a list, convert it to the node_type
-                data["osmid"] = node_type(data["osmid"])
+            is_literal = ast.literal_eval(repr(value)) == value
+        except (ValueError, SyntaxError):
+            is_literal = False
+        encoded[key] = ["literal", repr(value)] if is_literal else ["str", str(value)]
+    return encoded
+
+
+def _decode_graph_attrs(encoded):
+    """
+    Decode graph attributes encoded by _encode_graph_attrs.
+
+    Parameters
+    ----------
+    encoded : dict
+        dict of attribute name to (kind, encoded value) pairs
+
+    Returns
+    -------
+    dict
+        the graph attributes
+    """
+    graph_attrs = {}
+    for key, (kind, value) in encoded.items():
+        if kind == "literal":
+            graph_attrs[key] = ast.literal_eval(value)
+        elif kind == "array":
+            graph_attrs[key] = _decode_array(value)
+        else:
+            graph_attrs[key] = value
+    return graph_attrs
+
+
+def _encode_array(values):
+    """
+    Encode a numpy array as its dtype, shape, and base64 raw binary data.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        the array, which must have a numeric or boolean dtype
+
+    Returns
+    -------
+    dict
+        the encoded array, which can be saved as json
+    """
+    values = np.ascontiguousarray(values)
+    return {
+        "dtype": values.dtype.str,
+        "shape": list(values.shape),
+        "data": base64.b64encode(values.tobytes()).decode("ascii"),
+    }
 
-        # if geometry attribute exists, load the string as well-known text to
-        # shapely LineString
-        if "geometry" in data:
-            data["geometry"] = wkt.loads(data["geometry"])
 
+def _decode_array(encoded):
+    """
+    Decode a numpy array encoded by _encode_array.
+
+    Parameters
+    ----------
+    encoded : dict
+        the encoded array
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    values = np.frombuffer(base64.b64decode(encoded["data"]), dtype=encoded["dtype"])
+    return values.reshape(encoded["shape"]).copy()
+
+
+def _save_binary_column(filepath, name, values):
+    """
+    Save a typed column array to disk in one or more files.
+
+    Parameters
+    ----------
+    filepath : string
+        path to the binary graph folder
+    name : string
+        the base name of the column's files
+    values : numpy.ndarray or pandas.api.extensions.ExtensionArray
+        the column's values
+
+    Returns
+    -------
+    col_schema : dict
+        description of how the column was saved, for loading it later
+    """
+    path = os.path.join(filepath, name)
+
+    if isinstance(values, pd.Categorical):
+        # save the integer codes and the list of distinct strings
+        np.save(f"{path}.npy", values.codes, allow_pickle=False)
+        return {"kind": "category", "categories": values.categories.tolist()}
+
+    elif isinstance(values, (pd.arrays.IntegerArray, pd.arrays.BooleanArray)):
+        # save nullable columns as a data array plus a mask of missing values
+        dtype = "int64" if isinstance(values, pd.arrays.IntegerArray) else "bool"
+        na_value = 0 if dtype == "int64" else False
+        np.save(f"{path}.npy", values.to_numpy(dtype=dtype, na_value=na_value))
+        np.save(f"{path}_mask.npy", np.asarray(values.isna()))
+        return {"kind": "masked", "dtype": dtype}
+
+    elif values.dtype != object:
+        np.save(f"{path}.npy", values, allow_pickle=False)
+        return {"kind": "array"}
+
+    else:
+        # save object columns (e.g., lists) as json, with any geometries as wkt
+        def _default(value):
+            if isinstance(value, BaseGeometry):
+                return {"__wkt__": value.wkt}
+            raise TypeError(f"Cannot serialize value {value!r}")
+
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump([None if _is_missing(v) else v for v in values], f, default=_default)
+        return {"kind": "object"}
+
+
+def _load_binary_column(filepath, name, col_schema, mmap_mode=None):
+    """
+    Load a typed column array saved by _save_binary_column from disk.
+
+    Parameters
+    ----------
+    filepath : string
+        path to the binary graph folder
+    name : string
+        the base name of the column's files
+    col_schema : dict
+        description of how the column was saved
+    mmap_mode : string
+        passed to numpy.load to memory-map the column's arrays
+
+    Returns
+    -------
+    values : numpy.ndarray or pandas.api.extensions.ExtensionArray
+        the column's values
+    """
+    path = os.path.join(filepath, name)
+    kind = col_schema["kind"]
+
+    if kind == "category":
+        codes = np.load(f"{path}.npy", mmap_mode=mmap_mode)
+        return pd.Categorical.from_codes(codes, categories=col_schema["categories"])
+
+    elif kind == "masked":
+        data = np.load(f"{path}.npy", mmap_mode=mmap_mode)
+        mask = np.load(f"{path}_mask.npy", mmap_mode=mmap_mode)
+        if col_schema["dtype"] == "int64":
+            return pd.arrays.IntegerArray(np.asarray(data), np.asarray(mask))
+        else:
+            return pd.arrays.BooleanArray(np.asarray(data), np.asarray(mask))
+
+    elif kind == "array":
+        return np.load(f"{path}.npy", mmap_mode=mmap_mode)
+
+    else:
+
+        def _object_hook(d):
+            if "__wkt__" in d:
+                return wkt.loads(d["__wkt__"])
+            return d
+
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            values = json.load(f, object_hook=_object_hook)
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+
+
+def _is_missing(value):
+    """
+    Determine if a scalar value is missing (i.e., None or NaN).
+
+    Parameters
+    ----------
+    value : object
+        the value
+
+    Returns
+    -------
+    bool
+    """
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def save_graph_geoparquet(G, filepath=None, grid_size=16):
+    """
+    Save graph nodes and edges to disk as GeoParquet files.
+
+    Nodes and edges are saved as nodes.parquet and edges.parquet files in a
+    folder, with WKB point and line geometries and typed attribute columns:
+    numeric and boolean attributes keep their types, string attributes are
+    saved as dictionary-encoded strings, and attributes containing lists
+    (e.g., after simplification) are saved as native list columns. As in
+    graph_to_gdfs, edges without a geometry attribute are given straight-line
+    geometries. The nodes (and edges, by their u nodes) are sorted into the
+    cells of a spatial grid over the graph and each cell is saved as its own
+    row group, so load_graph_geoparquet can read just the row groups that
+    intersect a bounding box. Requires the pyarrow package.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    filepath : string
+        path to the GeoParquet folder. if None, use default data folder +
+        graph_geoparquet
+    grid_size : int
+        the number of rows and columns in the spatial grid of row groups
+
+    Returns
+    -------
+    None
+    """
+    if pa is None:
+        raise ImportError("The pyarrow package must be installed to use this optional feature.")
+
+    # default filepath if none was provided
+    if filepath is None:
+        filepath = os.path.join(settings.data_folder, "graph_geoparquet")
+
+    # if save folder does not already exist, create it
+    if not filepath == "" and not os.path.exists(filepath):
+        os.makedirs(filepath)
+
+    # a graph without nodes has no x/y columns, so give it empty ones
+    columns = columnar.graph_to_columns(G)
+    df_nodes = columns["nodes"].drop(columns="geometry", errors="ignore")
+    df_edges = columns["edges"]
+    if len(df_nodes) < 1:
+        df_nodes = df_nodes.assign(x=np.empty(0), y=np.empty(0))
+    x = df_nodes["x"].to_numpy(dtype=float)
+    y = df_nodes["y"].to_numpy(dtype=float)
+
+    # assign the nodes to grid cells, and the edges to their u nodes' cells
+    node_cells = _get_grid_cells(x, y, grid_size)
+    u_pos, _ = columnar.get_edge_endpoints(columns)
+    edge_cells = node_cells[u_pos]
+
+    # make the node and edge WKB geometries and bounds from their coordinates
+    node_geoms = _points_to_wkb(x, y)
+    node_bounds = np.column_stack((x, y, x, y))
+    coords, offsets = _fill_edge_coords(columns)
+    edge_geoms = _lines_to_wkb(coords, offsets)
+    edge_bounds = np.column_stack(
+        [
+            np.minimum.reduceat(coords[:, 0], offsets[:-1]),
+            np.minimum.reduceat(coords[:, 1], offsets[:-1]),
+            np.maximum.reduceat(coords[:, 0], offsets[:-1]),
+            np.maximum.reduceat(coords[:, 1], offsets[:-1]),
+        ]
+    )
+
+    # any edge geometries that were not packed (i.e., not 2D LineStrings)
+    # are saved as-is rather than as straight lines
+    if "geometry" in df_edges.columns:
+        for i in np.flatnonzero(pd.notnull(df_edges["geometry"].to_numpy())):
+            edge_geoms[i] = df_edges["geometry"].iloc[i].wkb
+            edge_bounds[i] = df_edges["geometry"].iloc[i].bounds
+        df_edges = df_edges.drop(columns="geometry")
+
+    # the nodes table gets a node ID column, as its index is not saved
+    node_data = {"node": columnar._make_column(df_nodes.index.tolist())}
+    node_data.update((col, df_nodes[col].values) for col in df_nodes.columns)
+    edge_data = {col: df_edges[col].values for col in df_edges.columns}
+
+    crs = projection._get_crs(G.graph["crs"]).to_json_dict()
+    meta = {"graph": _encode_graph_attrs(G.graph)}
+    for name, data, geoms, bounds, cells, geom_type in [
+        ("nodes", node_data, node_geoms, node_bounds, node_cells, "Point"),
+        ("edges", edge_data, edge_geoms, edge_bounds, edge_cells, "LineString"),
+    ]:
+        path = os.path.join(filepath, f"{name}.parquet")
+        _write_geoparquet(path, data, geoms, bounds, cells, geom_type, crs, meta)
+
+    utils.log(f'Saved graph as GeoParquet files at "{filepath}"')
+
+
+def load_graph_geoparquet(filepath, bbox=None, node_attrs=None, edge_attrs=None):
+    """
+    Load a graph saved by save_graph_geoparquet from disk.
+
+    Only the row groups that intersect the bounding box (if any) are read,
+    and only the requested attribute columns. The graph is then built from
+    the typed columns in bulk. Requires the pyarrow package.
+
+    Parameters
+    ----------
+    filepath : string
+        path to the GeoParquet folder
+    bbox : tuple
+        if not None, only load the nodes within this bounding box, and the
+        edges between them, as (north, south, east, west)
+    node_attrs : list
+        the node attributes to load (x and y are always loaded). if None,
+        load every node attribute
+    edge_attrs : list
+        the edge attributes to load, including geometry if it is wanted. if
+        None, load every edge attribute
+
+    Returns
+    -------
+    G : networkx.MultiDiGraph
+    """
+    if pa is None:
+        raise ImportError("The pyarrow package must be installed to use this optional feature.")
+
+    path = os.path.join(filepath, "nodes.parquet")
+    df_nodes, meta = _read_geoparquet(path, bbox, ["node", "x", "y"], node_attrs)
+    df_nodes = df_nodes.drop(columns="geometry", errors="ignore").set_index("node")
+    df_nodes.index.name = None
+
+    path = os.path.join(filepath, "edges.parquet")
+    df_edges, _ = _read_geoparquet(path, bbox, ["u", "v", "key"], edge_attrs)
+
+    # retain only the nodes within the bounding box and the edges between them
+    if bbox is not None:
+        north, south, east, west = bbox
+        x = df_nodes["x"].to_numpy(dtype=float)
+        y = df_nodes["y"].to_numpy(dtype=float)
+        df_nodes = df_nodes[(x >= west) & (x <= east) & (y >= south) & (y <= north)]
+        mask = df_edges["u"].isin(df_nodes.index) & df_edges["v"].isin(df_nodes.index)
+        df_edges = df_edges[mask.to_numpy()].reset_index(drop=True)
+
+    # unpack the edges' WKB LineStrings into packed coordinates in bulk
+    offsets = np.zeros(len(df_edges) + 1, dtype=np.int64)
+    coords = np.empty((0, 2))
+    if "geometry" in df_edges.columns:
+        coords, offsets, geoms = _wkb_to_lines(df_edges["geometry"].tolist())
+        df_edges = df_edges.drop(columns="geometry")
+        if geoms is not None:
+            df_edges["geometry"] = geoms
+
+    columns = {
+        "graph": _decode_graph_attrs(meta["graph"]),
+        "nodes": df_nodes,
+        "edges": df_edges,
+        "coords": coords,
+        "offsets": offsets,
+    }
+    G = columnar.graph_from_columns(columns)
+    utils.log(f'Loaded graph from GeoParquet files at "{filepath}"')
     return G
 
 
+def _write_geoparquet(path, data, geoms, bounds, cells, geom_type, crs, meta):
+    """
+    Write a table to a GeoParquet file, with one row group per grid cell.
+
+    Parameters
+    ----------
+    path : string
+        path to the file
+    data : dict
+        dict of column name to typed column array
+    geoms : list
+        the rows' WKB geometries
+    bounds : numpy.ndarray
+        array of shape (n, 4) of the rows' geometries' (minx, miny, maxx,
+        maxy) bounds
+    cells : numpy.ndarray
+        the rows' grid cells
+    geom_type : string
+        the geometries' type
+    crs : dict
+        the geometries' CRS as PROJJSON
+    meta : dict
+        extra metadata to save in the file
+
+    Returns
+    -------
+    None
+    """
+    # sort the rows by grid cell and find where each cell's rows start/end
+    order = np.argsort(cells, kind="stable")
+    cells = cells[order]
+    starts = np.flatnonzero(np.diff(cells, prepend=-1))
+    ends = np.concatenate((starts[1:], [len(cells)]))
+    bounds = bounds[order]
+    row_group_bounds = np.column_stack(
+        [
+            np.minimum.reduceat(bounds[:, 0], starts),
+            np.minimum.reduceat(bounds[:, 1], starts),
+            np.maximum.reduceat(bounds[:, 2], starts),
+            np.maximum.reduceat(bounds[:, 3], starts),
+        ]
+    )
+
+    arrays = []
+    list_columns = []
+    for name, values in data.items():
+        array, is_list = _to_arrow_array(values[order])
+        arrays.append(array)
+        if is_list:
+            list_columns.append(name)
+    arrays.append(pa.array([geoms[i] for i in order], type=pa.binary()))
+    names = list(data) + ["geometry"]
+
+    geo = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {"geometry": {"encoding": "WKB", "geometry_types": [geom_type], "crs": crs}},
+    }
+    if len(bounds) > 0:
+        bbox = [*bounds[:, :2].min(axis=0).tolist(), *bounds[:, 2:].max(axis=0).tolist()]
+        geo["columns"]["geometry"]["bbox"] = bbox
+    meta = dict(meta, list_columns=list_columns, row_groups=row_group_bounds.tolist())
+    table = pa.Table.from_arrays(arrays, names=names)
+    table = table.replace_schema_metadata({"geo": json.dumps(geo), "osmnx": json.dumps(meta)})
+
+    with pq.ParquetWriter(path, table.schema) as writer:
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            writer.write_table(table.slice(start, end - start), row_group_size=end - start)
+
+
+def _read_geoparquet(path, bbox, required, attrs):
+    """
+    Read the row groups of a GeoParquet file that intersect a bounding box.
+
+    Parameters
+    ----------
+    path : string
+        path to the file
+    bbox : tuple
+        if not None, only read row groups that intersect this bounding box,
+        as (north, south, east, west)
+    required : list
+        columns to read even if they are not in attrs
+    attrs : list
+        the attribute columns to read. if None, read every column
+
+    Returns
+    -------
+    df, meta : tuple
+        the DataFrame of rows read, and the file's extra metadata
+    """
+    parquet_file = pq.ParquetFile(path)
+    meta = json.loads(parquet_file.schema_arrow.metadata[b"osmnx"])
+    names = parquet_file.schema_arrow.names
+
+    columns = None
+    if attrs is not None:
+        columns = [col for col in dict.fromkeys(required + list(attrs)) if col in names]
+
+    row_groups = range(parquet_file.num_row_groups)
+    if bbox is not None:
+        north, south, east, west = bbox
+        row_groups = [
+            i
+            for i, (minx, miny, maxx, maxy) in enumerate(meta["row_groups"])
+            if minx <= east and maxx >= west and miny <= north and maxy >= south
+        ]
+
+    # read integer and boolean columns as nullable types, so missing values
+    # do not turn them into floats
+    table = parquet_file.read_row_groups(row_groups, columns=columns)
+    types = {pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}
+    df = table.to_pandas(types_mapper=types.get)
+
+    # turn list values back into lists, and single-element lists back into
+    # the scalar values they were saved from
+    for col in meta["list_columns"]:
+        if col in df.columns:
+            values = [None if v is None else v.tolist() for v in df[col]]
+            column = np.empty(len(values), dtype=object)
+            column[:] = [v[0] if v is not None and len(v) == 1 else v for v in values]
+            df[col] = column
+
+    return df, meta
+
+
+def _to_arrow_array(values):
+    """
+    Convert a typed column array to an arrow array.
+
+    Object columns containing lists become list arrays, with any scalar values
+    wrapped in single-element lists. Any other object columns are converted
+    to strings.
+
+    Parameters
+    ----------
+    values : numpy.ndarray or pandas.api.extensions.ExtensionArray
+        the column's values
+
+    Returns
+    -------
+    array, is_list : tuple
+        the arrow array, and whether it is a list array
+    """
+    if not (isinstance(values, np.ndarray) and values.dtype == object):
+        return pa.array(pd.Series(values), from_pandas=True), False
+
+    if any(isinstance(value, list) for value in values):
+        lists = [None if _is_missing(v) else v if isinstance(v, list) else [v] for v in values]
+        try:
+            return pa.array(lists), True
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # if the list elements' types are mixed, make them all strings
+            lists = [None if v is None else [str(element) for element in v] for v in lists]
+            return pa.array(lists, type=pa.list_(pa.string())), True
+
+    strings = [None if _is_missing(value) else str(value) for value in values]
+    return pa.array(strings, type=pa.string()), False
+
+
+def _get_grid_cells(x, y, grid_size):
+    """
+    Assign points to the cells of a square grid over their bounds.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        the points' x coordinates
+    y : numpy.ndarray
+        the points' y coordinates
+    grid_size : int
+        the number of rows and columns in the grid
+
+    Returns
+    -------
+    numpy.ndarray
+        the points' grid cell numbers, numbered row by row
+    """
+    if len(x) < 1:
+        return np.empty(0, dtype=np.int64)
+
+    cells = []
+    for values in (y, x):
+        extent = values.max() - values.min()
+        position = (values - values.min()) / (extent if extent > 0 else 1)
+        cells.append(np.clip(np.floor(position * grid_size), 0, grid_size - 1).astype(np.int64))
+    return cells[0] * grid_size + cells[1]
+
+
+def _fill_edge_coords(columns):
+    """
+    Get a columnar graph's packed edge coordinates, filling in any gaps.
+
+    Edges without packed coordinates are given the coordinates of the
+    straight line between their u and v nodes.
+
+    Parameters
+    ----------
+    columns : dict
+        the columnar graph, as returned by columnar.graph_to_columns
+
+    Returns
+    -------
+    coords, offsets : tuple
+        the filled packed coordinates and their offsets
+    """
+    coords = columns["coords"]
+    offsets = columns["offsets"]
+    counts = np.diff(offsets)
+    is_empty = counts == 0
+    if not is_empty.any():
+        return coords, offsets
+
+    new_counts = np.where(is_empty, 2, counts)
+    new_offsets = np.zeros(len(offsets), dtype=np.int64)
+    new_offsets[1:] = np.cumsum(new_counts)
+    new_coords = np.empty((new_offsets[-1], 2))
+
+    # copy each edge's packed coordinates to its new position
+    shift = np.repeat(new_offsets[:-1] - offsets[:-1], counts)
+    new_coords[np.arange(len(coords)) + shift] = coords
+
+    # fill the empty edges with their u and v nodes' coordinates
+    xy = columns["nodes"][["x", "y"]].to_numpy(dtype=float)
+    u_pos, v_pos = columnar.get_edge_endpoints(columns)
+    starts = new_offsets[:-1][is_empty]
+    new_coords[starts] = xy[u_pos[is_empty]]
+    new_coords[starts + 1] = xy[v_pos[is_empty]]
+    return new_coords, new_offsets
+
+
+def _points_to_wkb(x, y):
+    """
+    Encode points as little-endian WKB.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        the points' x coordinates
+    y : numpy.ndarray
+        the points' y coordinates
+
+    Returns
+    -------
+    list
+        the points' WKB bytes
+    """
+    records = np.empty(len(x), dtype=[("order", "u1"), ("type", "<u4"), ("x", "<f8"), ("y", "<f8")])
+    records["order"] = 1
+    records["type"] = 1
+    records["x"] = x
+    records["y"] = y
+    data = records.tobytes()
+    size = records.dtype.itemsize
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def _lines_to_wkb(coords, offsets):
+    """
+    Encode packed LineString coordinates as little-endian WKB.
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        array of shape (n, 2) of packed coordinates
+    offsets : numpy.ndarray
+        array of length m + 1 of each LineString's coordinates' offsets
+
+    Returns
+    -------
+    list
+        the LineStrings' WKB bytes
+    """
+    counts = np.diff(offsets)
+    wkb_offsets = np.zeros(len(offsets), dtype=np.int64)
+    wkb_offsets[1:] = np.cumsum(9 + 16 * counts)
+    data = np.empty(wkb_offsets[-1], dtype=np.uint8)
+
+    # write each LineString's byte order, geometry type, and number of points
+    headers = np.empty(len(counts), dtype=[("order", "u1"), ("type", "<u4"), ("n", "<u4")])
+    headers["order"] = 1
+    headers["type"] = 2
+    headers["n"] = counts
+    data[wkb_offsets[:-1, None] + np.arange(9)] = headers.view(np.uint8).reshape(-1, 9)
+
+    # then write each LineString's coordinates after its header
+    shift = np.repeat(wkb_offsets[:-1] + 9 - 16 * offsets[:-1], counts)
+    positions = 16 * np.arange(len(coords)) + shift
+    coord_bytes = np.ascontiguousarray(coords, dtype="<f8").view(np.uint8).reshape(-1, 16)
+    data[positions[:, None] + np.arange(16)] = coord_bytes
+
+    data = data.tobytes()
+    return [
+        data[start:end] for start, end in zip(wkb_offsets[:-1].tolist(), wkb_offsets[1:].tolist())
+    ]
+
+
+def _wkb_to_lines(geoms):
+    """
+    Decode WKB geometries into packed LineString coordinates.
+
+    Little-endian 2D LineStrings are decoded in bulk. Any other geometries
+    are loaded individually.
+
+    Parameters
+    ----------
+    geoms : list
+        the WKB bytes (or None)
+
+    Returns
+    -------
+    coords, offsets, others : tuple
+        the packed coordinates and their offsets, plus an object array of the
+        other geometries (None where a geometry was packed or missing), or
+        None if all the geometries were packed or missing
+    """
+    lengths = np.array([0 if geom is None else len(geom) for geom in geoms], dtype=np.int64)
+    data = np.frombuffer(b"".join(geom for geom in geoms if geom is not None), dtype=np.uint8)
+    starts = np.zeros(len(geoms), dtype=np.int64)
+    starts[1:] = np.cumsum(lengths)[:-1]
+
+    # read each geometry's byte order, geometry type, and number of points
+    headers = np.zeros((len(geoms), 9), dtype=np.uint8)
+    has_header = lengths >= 9
+    headers[has_header] = data[starts[has_header, None] + np.arange(9)]
+    geom_types = np.ascontiguousarray(headers[:, 1:5]).view("<u4").ravel()
+    counts = np.ascontiguousarray(headers[:, 5:9]).view("<u4").ravel().astype(np.int64)
+    is_line = has_header & (headers[:, 0] == 1) & (geom_types == 2) & (lengths == 9 + 16 * counts)
+    counts[~is_line] = 0
+
+    offsets = np.zeros(len(geoms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    shift = np.repeat(starts + 9 - 16 * offsets[:-1], counts)
+    positions = 16 * np.arange(offsets[-1]) + shift
+    coords = data[positions[:, None] + np.arange(16)].view("<f8").reshape(-1, 2)
+
+    others = None
+    is_other = (lengths > 0) & ~is_line
+    if is_other.any():
+        others = np.empty(len(geoms), dtype=object)
+        for i in np.flatnonzero(is_other):
+            others[i] = wkb.loads(geoms[i])
+    return coords, offsets, others
+
+
 def save_graph_xml(
     data,
     filepath=None,
@@ -345,9 +1645,11 @@ def save_graph_xml(
     """
     Save graph to disk as an OSM-formatted XML .osm file.
 
-    Note: for large networks this function can take a long time to run. Before
-    using this function, make sure you configured OSMnx as described in the
-    example below when you created the graph.
+    The file is written incrementally: nodes and ways are streamed to disk one
+    element at a time, and when merging edges, edges are grouped by way in a
+    single pass. Missing attribute and tag values are omitted. Before using
+    this function, make sure you configured OSMnx as described in the example
+    below when you created the graph.
 
     Example
     -------
@@ -416,94 +1718,95 @@ def save_graph_xml(
             "`all_oneway` setting set to True."
         )
 
-    try:
-        gdf_nodes, gdf_edges = data
-    except ValueError:
-        gdf_nodes, gdf_edges = utils_graph.graph_to_gdfs(
-            data, node_geometry=False, fill_edge_geometry=False
+    if isinstance(data, nx.MultiDiGraph):
+        # only pull out the attributes that will actually be written
+        node_cols = ["osmid", "x", "y"] + list(node_attrs) + list(node_tags)
+        edge_cols = ["uniqueid", "oneway"] + list(edge_attrs) + list(edge_tags)
+        if edge_tag_aggs is not None:
+            edge_cols += [tag for tag, _ in edge_tag_aggs]
+        df_nodes, df_edges = utils_graph.graph_to_dfs(
+            data,
+            node_attrs=list(dict.fromkeys(node_cols)),
+            edge_attrs=list(dict.fromkeys(edge_cols)),
         )
+    else:
+        df_nodes, df_edges = data
 
     # rename columns per osm specification
-    gdf_nodes.rename(columns={"osmid": "id", "x": "lon", "y": "lat"}, inplace=True)
-    if "id" in gdf_edges.columns:
-        gdf_edges = gdf_edges[[col for col in gdf_edges if col != "id"]]
-    if "uniqueid" in gdf_edges.columns:
-        gdf_edges = gdf_edges.rename(columns={"uniqueid": "id"})
+    df_nodes = df_nodes.rename(columns={"osmid": "id", "x": "lon", "y": "lat"})
+    if "id" not in df_nodes.columns:
+        df_nodes["id"] = df_nodes.index
+    if "id" in df_edges.columns:
+        df_edges = df_edges[[col for col in df_edges if col != "id"]]
+    if "uniqueid" in df_edges.columns:
+        df_edges = df_edges.rename(columns={"uniqueid": "id"})
     else:
-        gdf_edges = gdf_edges.reset_index().rename(columns={"index": "id"})
+        df_edges = df_edges.reset_index(drop=True)
+        df_edges["id"] = df_edges.index
 
     # add default values for required attributes
-    for table in [gdf_nodes, gdf_edges]:
+    for table in [df_nodes, df_edges]:
         table["uid"] = "1"
         table["user"] = "osmnx"
         table["version"] = "1"
         table["changeset"] = "1"
         table["timestamp"] = "2017-01-01T00:00:00Z"
 
-    # convert all datatypes to str
-    gdf_nodes = gdf_nodes.applymap(str)
-    gdf_edges = gdf_edges.applymap(str)
-
-    # misc. string replacements to meet OSM XML spec
-    if "oneway" in gdf_edges.columns:
-
-        # fill blank oneway tags with default (False)
-        gdf_edges.loc[pd.isnull(gdf_edges["oneway"]), "oneway"] = oneway
-        gdf_edges.loc[:, "oneway"] = gdf_edges["oneway"].astype(str)
-        gdf_edges.loc[:, "oneway"] = (
-            gdf_edges["oneway"].str.replace("False", "no").replace("True", "yes")
-        )
-
-    # initialize XML tree with an OSM root element then append nodes/edges
-    root = etree.Element("osm", attrib={"version": "1", "generator": "OSMnx"})
-    root = _append_nodes_xml_tree(root, gdf_nodes, node_attrs, node_tags)
-    root = _append_edges_xml_tree(
-        root, gdf_edges, edge_attrs, edge_tags, edge_tag_aggs, merge_edges
-    )
-
-    # write to disk
-    etree.ElementTree(root).write(filepath)
+    # fill blank oneway tags with default then convert to OSM yes/no values
+    if "oneway" in df_edges.columns:
+        oneway_values = df_edges["oneway"].astype(object)
+        oneway_values = oneway_values.where(pd.notnull(oneway_values), oneway).astype(str)
+        df_edges["oneway"] = oneway_values.replace({"False": "no", "True": "yes"})
+
+    # stream the OSM root element, then the nodes, then the ways to disk
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write('<osm version="1" generator="OSMnx">\n')
+        _write_nodes_xml(f, df_nodes, node_attrs, node_tags)
+        _write_edges_xml(f, df_edges, edge_attrs, edge_tags, edge_tag_aggs, merge_edges)
+        f.write("</osm>\n")
     utils.log(f'Saved graph as .osm file at "{filepath}"')
 
 
-def _append_nodes_xml_tree(root, gdf_nodes, node_attrs, node_tags):
+def _write_nodes_xml(f, df_nodes, node_attrs, node_tags):
     """
-    Append nodes to an XML tree.
+    Write nodes to an OSM XML file as node elements.
 
     Parameters
     ----------
-    root : ElementTree.Element
-        xml tree
-    gdf_nodes : geopandas.GeoDataFrame
-        GeoDataFrame of graph nodes
+    f : file object
+        the text file handle to write to
+    df_nodes : pandas.DataFrame
+        DataFrame of graph nodes
     node_attrs : list
-        osm way attributes to include in output OSM XML
+        osm node attributes to include in output OSM XML
     node_tags : list
-        osm way tags to include in output OSM XML
+        osm node tags to include in output OSM XML
 
     Returns
     -------
-    root : ElementTree.Element
-        xml tree with nodes appended
+    None
     """
-    for _, row in gdf_nodes.iterrows():
-        node = etree.SubElement(root, "node", attrib=row[node_attrs].dropna().to_dict())
-        for tag in node_tags:
-            if tag in gdf_nodes.columns:
-                etree.SubElement(node, "tag", attrib={"k": tag, "v": row[tag]})
-    return root
+    attrs = [attr for attr in node_attrs if attr in df_nodes.columns]
+    tags = [tag for tag in node_tags if tag in df_nodes.columns]
+    values = {col: _escape_xml_column(df_nodes[col]) for col in set(attrs + tags)}
+
+    for i in range(len(df_nodes)):
+        attr_values = [(attr, values[attr][i]) for attr in attrs]
+        tag_values = [(tag, values[tag][i]) for tag in tags]
+        f.write(_osm_xml_element("node", attr_values, [], tag_values))
 
 
-def _append_edges_xml_tree(root, gdf_edges, edge_attrs, edge_tags, edge_tag_aggs, merge_edges):
+def _write_edges_xml(f, df_edges, edge_attrs, edge_tags, edge_tag_aggs, merge_edges):
     """
-    Append edges to an XML tree.
+    Write edges to an OSM XML file as way elements.
 
     Parameters
     ----------
-    root : ElementTree.Element
-        xml tree
-    gdf_edges : geopandas.GeoDataFrame
-        GeoDataFrame of graph edges
+    f : file object
+        the text file handle to write to
+    df_edges : pandas.DataFrame
+        DataFrame of graph edges
     edge_attrs : list
         osm way attributes to include in output OSM XML
     edge_tags : list
@@ -525,41 +1828,46 @@ def _append_edges_xml_tree(root, gdf_edges, edge_attrs, edge_tags, edge_tag_aggs
 
     Returns
     -------
-    root : ElementTree.Element
-        xml tree with edges appended
+    None
     """
+    attrs = [attr for attr in edge_attrs if attr in df_edges.columns]
+    if merge_edges and edge_tag_aggs is not None:
+        agg_tags = [tag for tag, _ in edge_tag_aggs]
+        tags = [tag for tag in edge_tags if tag in df_edges.columns and tag not in agg_tags]
+    else:
+        tags = [tag for tag in edge_tags if tag in df_edges.columns]
+    values = {col: _escape_xml_column(df_edges[col]) for col in set(attrs + tags + ["u", "v"])}
+    u = values["u"]
+    v = values["v"]
+
     if merge_edges:
 
-        for e in gdf_edges["id"].unique():
-            all_way_edges = gdf_edges[gdf_edges["id"] == e]
-            first = all_way_edges.iloc[0]
-            edge = etree.SubElement(root, "way", attrib=first[edge_attrs].dropna().to_dict())
+        # group the edges by way ID once, in order of each way's first
+        # appearance, then write each way using its first edge's attributes
+        codes, _ = pd.factorize(df_edges["id"])
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        starts = np.concatenate(([0], bounds)).tolist()
+        ends = np.concatenate((bounds, [len(order)])).tolist()
+        order = order.tolist()
+
+        # aggregate each tag over every way's edges in a single groupby
+        aggregated = []
+        if edge_tag_aggs is not None:
+            for tag, agg in edge_tag_aggs:
+                if tag in df_edges.columns:
+                    agg_values = df_edges[tag].groupby(codes).agg(agg)
+                    aggregated.append((tag, _escape_xml_column(agg_values)))
+
+        for way, (start, end) in enumerate(zip(starts, ends)):
+            first = order[start]
+            positions = order[start:end]
+            refs = _order_way_nodes([u[i] for i in positions], [v[i] for i in positions])
+            attr_values = [(attr, values[attr][first]) for attr in attrs]
+            tag_values = [(tag, values[tag][first]) for tag in tags]
+            tag_values.extend((tag, agg_values[way]) for tag, agg_values in aggregated)
+            f.write(_osm_xml_element("way", attr_values, refs, tag_values))
 
-            if len(all_way_edges) == 1:
-                etree.SubElement(edge, "nd", attrib={"ref": first["u"]})
-                etree.SubElement(edge, "nd", attrib={"ref": first["v"]})
-            else:
-                # topological sort
-                ordered_nodes = _get_unique_nodes_ordered_from_way(all_way_edges)
-                for node in ordered_nodes:
-                    etree.SubElement(edge, "nd", attrib={"ref": node})
-
-            if edge_tag_aggs is None:
-                for tag in edge_tags:
-                    if tag in all_way_edges.columns:
-                        etree.SubElement(edge, "tag", attrib={"k": tag, "v": first[tag]})
-            else:
-                for tag in edge_tags:
-                    if (tag in all_way_edges.columns) and (
-                        tag not in [t for t, agg in edge_tag_aggs]
-                    ):
-                        etree.SubElement(edge, "tag", attrib={"k": tag, "v": first[tag]})
-
-                for tag, agg in edge_tag_aggs:
-                    if tag in all_way_edges.columns:
-                        etree.SubElement(
-                            edge, "tag", attrib={"k": tag, "v": all_way_edges[tag].aggregate(agg)}
-                        )
     else:
         # NOTE: this will generate separate OSM ways for each network edge,
         # even if the edges are all part of the same original OSM way. As
@@ -567,15 +1875,84 @@ def _append_edges_xml_tree(root, gdf_edges, edge_attrs, edge_tags, edge_tag_aggs
         # many ways with the same OSM id. This does not conform to the
         # OSM XML schema standard, however, the data will still comprise a
         # valid network and will be readable by *most* OSM tools.
-        for _, row in gdf_edges.iterrows():
-            edge = etree.SubElement(root, "way", attrib=row[edge_attrs].dropna().to_dict())
-            etree.SubElement(edge, "nd", attrib={"ref": row["u"]})
-            etree.SubElement(edge, "nd", attrib={"ref": row["v"]})
-            for tag in edge_tags:
-                if tag in gdf_edges.columns:
-                    etree.SubElement(edge, "tag", attrib={"k": tag, "v": row[tag]})
+        for i in range(len(df_edges)):
+            attr_values = [(attr, values[attr][i]) for attr in attrs]
+            tag_values = [(tag, values[tag][i]) for tag in tags]
+            f.write(_osm_xml_element("way", attr_values, [u[i], v[i]], tag_values))
+
+
+# characters to replace with entities in XML attribute values
+_XML_ENTITIES = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "\n": "&#10;",
+        "\r": "&#13;",
+        "\t": "&#9;",
+    }
+)
+
+
+def _osm_xml_element(name, attr_values, refs, tag_values):
+    """
+    Make an OSM XML node or way element, skipping any missing values.
+
+    Parameters
+    ----------
+    name : string
+        the element name, either "node" or "way"
+    attr_values : list
+        list of (attribute, value) tuples, where values are escaped strings
+        or None if missing
+    refs : list
+        IDs of the way's nodes, as escaped strings, to write as nd elements
+    tag_values : list
+        list of (tag, value) tuples, where values are escaped strings or None
+        if missing, to write as tag elements
+
+    Returns
+    -------
+    string
+    """
+    attrs = "".join(f' {attr}="{value}"' for attr, value in attr_values if value is not None)
+    children = [f'<nd ref="{ref}" />' for ref in refs]
+    children.extend(
+        f'<tag k="{tag}" v="{value}" />' for tag, value in tag_values if value is not None
+    )
+    if len(children) > 0:
+        return f"<{name}{attrs}>{''.join(children)}</{name}>\n"
+    else:
+        return f"<{name}{attrs} />\n"
+
+
+def _escape_xml_column(values):
+    """
+    Convert a column's values to strings escaped for use as XML attributes.
+
+    Numeric columns need no escaping, and string columns are escaped once per
+    distinct value rather than once per row.
 
-    return root
+    Parameters
+    ----------
+    values : pandas.Series
+        the column's values
+
+    Returns
+    -------
+    list
+        the escaped strings, or None where values are missing
+    """
+    is_missing = pd.isnull(values).to_numpy()
+    strings = values.astype(object).astype(str).to_numpy(dtype=object)
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        codes, uniques = pd.factorize(strings)
+        escaped = np.empty(len(uniques), dtype=object)
+        escaped[:] = [value.translate(_XML_ENTITIES) for value in uniques]
+        strings = escaped[codes]
+    strings[is_missing] = None
+    return strings.tolist()
 
 
 def _get_unique_nodes_ordered_from_way(df_way_edges):
@@ -603,16 +1980,56 @@ def _get_unique_nodes_ordered_from_way(df_way_edges):
         kind of disconnected structure of nodes within a given way, but
         it is not explicitly forbidden in the OSM XML design schema.
     """
+    return _order_way_nodes(df_way_edges["u"].tolist(), df_way_edges["v"].tolist())
+
+
+def _order_way_nodes(u, v):
+    """
+    Recover original node order from the u and v nodes of a single OSM way.
+
+    Most ways' edges form a single chain (or a closed ring, in which case the
+    first node is repeated at the end), which is just walked from its head
+    node. Otherwise, fall back to topologically sorting the largest weakly
+    connected component of the way's edges.
+
+    Parameters
+    ----------
+    u : list
+        the way's edges' origin nodes
+    v : list
+        the way's edges' destination nodes
+
+    Returns
+    -------
+    unique_ordered_nodes : list
+        An ordered list of node IDs.
+    """
+    if len(u) == 1:
+        return [u[0], v[0]]
+
+    # walk the chain if every node has at most one successor and there is a
+    # single head node (or none, if the way is a closed ring)
+    successors = dict(zip(u, v))
+    heads = set(u).difference(v)
+    if len(successors) == len(u) and len(heads) <= 1:
+        node = heads.pop() if len(heads) == 1 else u[0]
+        ordered_nodes = [node]
+        while node in successors and len(ordered_nodes) <= len(u):
+            node = successors[node]
+            ordered_nodes.append(node)
+        if len(ordered_nodes) == len(u) + 1:
+            return ordered_nodes
+
     G = nx.MultiDiGraph()
-    all_nodes = list(df_way_edges["u"].values) + list(df_way_edges["v"].values)
+    all_nodes = u + v
 
     G.add_nodes_from(all_nodes)
-    G.add_edges_from(df_way_edges[["u", "v"]].values)
+    G.add_edges_from(zip(u, v))
 
     # copy nodes into new graph
     H = utils_graph.get_largest_component(G, strongly=False)
     unique_ordered_nodes = list(nx.topological_sort(H))
-    num_unique_nodes = len(np.unique(all_nodes))
+    num_unique_nodes = len(set(all_nodes))
 
     if len(unique_ordered_nodes) < num_unique_nodes:
         utils.log(f"Recovered order for {len(unique_ordered_nodes)} of {num_unique_nodes} nodes")
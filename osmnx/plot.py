@@ -12,6 +12,7 @@ from matplotlib.collections import PatchCollection
 from shapely.geometry import MultiPolygon
 from shapely.geometry import Polygon
 
+from . import columnar
 from . import graph
 from . import settings
 from . import simplification
@@ -325,8 +326,9 @@ def plot_graph(
 
     Parameters
     ----------
-    G : networkx.MultiDiGraph
-        input graph
+    G : networkx.MultiDiGraph or dict
+        input graph, or its columnar representation as returned by
+        columnar.graph_to_columns
     bbox : tuple
         bounding box as north,south,east,west - if None will calculate from
         spatial extents of data. if passing a bbox, you probably also want to
@@ -387,14 +389,26 @@ def plot_graph(
         matplotlib figure, axis
     """
     utils.log("Begin plotting the graph...")
-    node_Xs = [float(x) for _, x in G.nodes(data="x")]
-    node_Ys = [float(y) for _, y in G.nodes(data="y")]
+    if isinstance(G, dict):
+        # a columnar graph's coordinates are read straight from its columns
+        nodes = G["nodes"].index.tolist()
+        node_Xs = G["nodes"]["x"].to_numpy(dtype=float).tolist()
+        node_Ys = G["nodes"]["y"].to_numpy(dtype=float).tolist()
+        lines = columnar.get_edge_lines(G, use_geom=use_geom)
+        crs = G["graph"]["crs"]
+        get_bounds = columnar.get_bounds
+    else:
+        nodes = list(G.nodes)
+        node_Xs = [float(x) for _, x in G.nodes(data="x")]
+        node_Ys = [float(y) for _, y in G.nodes(data="y")]
+        lines = _graph_to_lines(G, use_geom=use_geom)
+        crs = G.graph["crs"]
+        get_bounds = utils_graph.get_graph_bounds
 
     # get north, south, east, west values either from bbox parameter or from the
-    # spatial extent of the edges' geometries
+    # spatial extent of the nodes and edges' geometries
     if bbox is None:
-        edges = utils_graph.graph_to_gdfs(G, nodes=False, fill_edge_geometry=True)
-        west, south, east, north = edges.total_bounds
+        north, south, east, west = get_bounds(G)
     else:
         north, south, east, west = bbox
 
@@ -408,25 +422,7 @@ def plot_graph(
     fig, ax = plt.subplots(figsize=(fig_width, fig_height), facecolor=bgcolor)
     ax.set_facecolor(bgcolor)
 
-    # draw the edges as lines from node to node
-    lines = []
-    for u, v, data in G.edges(keys=False, data=True):
-        if "geometry" in data and use_geom:
-            # if it has a geometry attribute (a list of line segments), add them
-            # to the list of lines to plot
-            xs, ys = data["geometry"].xy
-            lines.append(list(zip(xs, ys)))
-        else:
-            # if it doesn't have a geometry attribute, the edge is a straight
-            # line from node to node
-            x1 = G.nodes[u]["x"]
-            y1 = G.nodes[u]["y"]
-            x2 = G.nodes[v]["x"]
-            y2 = G.nodes[v]["y"]
-            line = [(x1, y1), (x2, y2)]
-            lines.append(line)
-
-    # add the lines to the axis as a linecollection
+    # add the edges' lines to the axis as a linecollection
     lc = LineCollection(
         lines, colors=edge_color, linewidths=edge_linewidth, alpha=edge_alpha, zorder=2
     )
@@ -473,21 +469,57 @@ def plot_graph(
         fig.canvas.draw()
     else:
         # if the graph is not projected, conform the aspect ratio to not stretch the plot
-        if G.graph["crs"] == settings.default_crs:
+        if crs == settings.default_crs:
             coslat = np.cos((min(node_Ys) + max(node_Ys)) / 2.0 / 180.0 * np.pi)
             ax.set_aspect(1.0 / coslat)
             fig.canvas.draw()
 
     # annotate the axis with node IDs if annotate=True
     if annotate:
-        for node, data in G.nodes(data=True):
-            ax.annotate(node, xy=(data["x"], data["y"]))
+        for node, x, y in zip(nodes, node_Xs, node_Ys):
+            ax.annotate(node, xy=(x, y))
 
     # save and show the figure as specified
     fig, ax = _save_and_show(fig, ax, save, show, close, filename, file_format, dpi, axis_off)
     return fig, ax
 
 
+def _graph_to_lines(G, use_geom=True):
+    """
+    Get each edge's line coordinates to plot them.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    use_geom : bool
+        if True, use the spatial geometry attribute of the edges where they
+        exist, otherwise draw every edge as a straight line from node to node
+
+    Returns
+    -------
+    lines : list
+        list of lists of (x, y) tuples, one per edge
+    """
+    lines = []
+    for u, v, data in G.edges(keys=False, data=True):
+        if "geometry" in data and use_geom:
+            # if it has a geometry attribute (a list of line segments), add them
+            # to the list of lines to plot
+            xs, ys = data["geometry"].xy
+            lines.append(list(zip(xs, ys)))
+        else:
+            # if it doesn't have a geometry attribute, the edge is a straight
+            # line from node to node
+            x1 = G.nodes[u]["x"]
+            y1 = G.nodes[u]["y"]
+            x2 = G.nodes[v]["x"]
+            y2 = G.nodes[v]["y"]
+            line = [(x1, y1), (x2, y2)]
+            lines.append(line)
+    return lines
+
+
 def _node_list_to_coordinate_lines(G, route, use_geom=True):
     """
     Make list of lines that follow the route defined by the list of nodes.
@@ -981,9 +1013,9 @@ def plot_figure_ground(
     # if G was passed-in, use this graph in the plot, centered on the centroid
     # of its nodes
     if G is not None:
-        gdf_nodes = utils_graph.graph_to_gdfs(G, edges=False, node_geometry=True)
-        lnglat_point = gdf_nodes.unary_union.centroid.coords[0]
-        point = tuple(reversed(lnglat_point))
+        df_nodes = utils_graph.graph_to_dfs(G, edges=False, node_attrs=["x", "y"])
+        lng, lat = np.unique(df_nodes[["x", "y"]].values, axis=0).mean(axis=0)
+        point = (lat, lng)
 
     # otherwise, get the network by either address or point, whichever was
     # passed-in, using a distance multiplier to make sure we get more than
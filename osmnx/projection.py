@@ -1,14 +1,28 @@
 """Project spatial geometries and street networks."""
 
 import math
+import threading
+import time
+from functools import lru_cache
 
-import geopandas as gpd
+import numpy as np
 from pyproj import CRS
+from pyproj import Transformer
+from shapely.geometry import LineString
+from shapely.geometry import Point
+from shapely.ops import transform as shapely_transform
 
 from . import settings
 from . import simplification
 from . import utils
-from . import utils_graph
+
+# maximum number of CRS and transformer objects to keep in the projection
+# caches, so repeated projections between the same CRSs reuse them
+_CACHE_SIZE = 64
+
+# pyproj CRS and Transformer objects are not thread-safe, so each thread
+# keeps its own caches of them
+_local = threading.local()
 
 
 def project_geometry(geometry, crs=None, to_crs=None, to_latlong=False):
@@ -36,13 +50,22 @@ def project_geometry(geometry, crs=None, to_crs=None, to_latlong=False):
     geometry_proj, crs : tuple
         the projected geometry and its new CRS
     """
+    start_time = time.time()
     if crs is None:
         crs = settings.default_crs
 
-    gdf = gpd.GeoDataFrame(geometry=[geometry], crs=crs)
-    gdf_proj = project_gdf(gdf, to_crs=to_crs, to_latlong=to_latlong)
-    geometry_proj = gdf_proj["geometry"].iloc[0]
-    return geometry_proj, gdf_proj.crs
+    if to_latlong:
+        to_crs = settings.default_crs
+    elif to_crs is None:
+        if _get_crs(crs).is_projected:
+            raise ValueError("Geometry must be unprojected to calculate UTM zone")
+        to_crs = _get_utm_crs(geometry.centroid.x)
+
+    transformer = _get_transformer(crs, to_crs)
+    geometry_proj = _transform_geometries([geometry], transformer)[0]
+    crs_proj = _get_crs(to_crs)
+    utils.log(f"Projected geometry to {crs_proj} in {time.time() - start_time:,.4f} seconds")
+    return geometry_proj, crs_proj
 
 
 def project_gdf(gdf, to_crs=None, to_latlong=False):
@@ -73,31 +96,30 @@ def project_gdf(gdf, to_crs=None, to_latlong=False):
     if gdf.crs is None or len(gdf) < 1:
         raise ValueError("GeoDataFrame must have a valid CRS and cannot be empty")
 
+    start_time = time.time()
+
     # if to_latlong is True, project the gdf to latlong
     if to_latlong:
-        gdf_proj = gdf.to_crs(settings.default_crs)
-        utils.log(f"Projected GeoDataFrame to {settings.default_crs}")
-
-    # else if to_crs was passed-in, project gdf to this CRS
-    elif to_crs is not None:
-        gdf_proj = gdf.to_crs(to_crs)
-        utils.log(f"Projected GeoDataFrame to {to_crs}")
+        to_crs = settings.default_crs
 
-    # otherwise, automatically project the gdf to UTM
-    else:
-        if CRS.from_user_input(gdf.crs).is_projected:
+    # otherwise, if no to_crs was passed-in, automatically project to UTM
+    elif to_crs is None:
+        if _get_crs(gdf.crs).is_projected:
             raise ValueError("Geometry must be unprojected to calculate UTM zone")
 
         # calculate longitude of centroid of union of all geometries in gdf
         avg_lng = gdf["geometry"].unary_union.centroid.x
 
         # calculate UTM zone from avg longitude to define CRS to project to
-        utm_zone = int(math.floor((avg_lng + 180) / 6.0) + 1)
-        utm_crs = f"+proj=utm +zone={utm_zone} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
+        to_crs = _get_utm_crs(avg_lng)
 
-        # project the GeoDataFrame to the UTM CRS
-        gdf_proj = gdf.to_crs(utm_crs)
-        utils.log(f"Projected GeoDataFrame to {gdf_proj.crs}")
+    # project the GeoDataFrame's geometries with the cached transformer
+    transformer = _get_transformer(gdf.crs, to_crs)
+    gdf_proj = gdf.copy()
+    gdf_proj[gdf.geometry.name] = _transform_geometries(gdf.geometry, transformer)
+    gdf_proj.crs = _get_crs(to_crs)
+    elapsed = time.time() - start_time
+    utils.log(f"Projected GeoDataFrame to {gdf_proj.crs} in {elapsed:,.4f} seconds")
 
     return gdf_proj
 
@@ -110,6 +132,12 @@ def project_graph(G, to_crs=None):
     which the graph's centroid lies. Otherwise, project the graph to the CRS
     defined by to_crs.
 
+    Node coordinates and edge geometries are transformed in bulk as arrays
+    and written back to a copy of the graph, rather than round-tripping
+    through node and edge GeoDataFrames. If the graph has been simplified,
+    edges without geometry are given straight-line geometries between their
+    projected nodes.
+
     Parameters
     ----------
     G : networkx.MultiDiGraph
@@ -123,38 +151,258 @@ def project_graph(G, to_crs=None):
     G_proj : networkx.MultiDiGraph
         the projected graph
     """
+    if len(G) < 1:
+        raise ValueError("Graph must have at least one node to be projected")
+
+    start_time = time.time()
+    crs = G.graph["crs"]
+    G_proj = G.copy()
+
     # STEP 1: PROJECT THE NODES
-    gdf_nodes = utils_graph.graph_to_gdfs(G, edges=False)
+    nodes = list(G_proj.nodes(data=True))
+    x = np.array([d["x"] for _, d in nodes], dtype=float)
+    y = np.array([d["y"] for _, d in nodes], dtype=float)
 
-    # create new lat/lng columns to preserve lat/lng for later reference if
-    # cols do not already exist (ie, don't overwrite in later re-projections)
-    if "lon" not in gdf_nodes.columns or "lat" not in gdf_nodes.columns:
-        gdf_nodes["lon"] = gdf_nodes["x"]
-        gdf_nodes["lat"] = gdf_nodes["y"]
+    # if to_crs is None, automatically project the graph to UTM using the
+    # longitude of the centroid of the graph's (unique) node points
+    if to_crs is None:
+        if _get_crs(crs).is_projected:
+            raise ValueError("Geometry must be unprojected to calculate UTM zone")
+        avg_lng = np.unique(np.column_stack((x, y)), axis=0)[:, 0].mean()
+        to_crs = _get_utm_crs(avg_lng)
+    to_crs = _get_crs(to_crs)
 
-    # project the nodes GeoDataFrame and extract the projected x/y values
-    gdf_nodes_proj = project_gdf(gdf_nodes, to_crs=to_crs)
-    gdf_nodes_proj["x"] = gdf_nodes_proj["geometry"].x
-    gdf_nodes_proj["y"] = gdf_nodes_proj["geometry"].y
-    gdf_nodes_proj = gdf_nodes_proj.drop(columns=["geometry"])
+    # transform all the node coordinates in a single call, then write the
+    # projected x/y values back to the nodes. create new lat/lng attributes
+    # to preserve lat/lng for later reference if they do not already exist
+    # (ie, don't overwrite in later re-projections)
+    transformer = _get_transformer(crs, to_crs)
+    x_proj, y_proj = transformer.transform(x, y)
+    for (_, data), x_, y_ in zip(nodes, x_proj.tolist(), y_proj.tolist()):
+        if "lon" not in data or "lat" not in data:
+            data["lon"] = data["x"]
+            data["lat"] = data["y"]
+        data["x"] = x_
+        data["y"] = y_
 
     # STEP 2: PROJECT THE EDGES
+    # unsimplified edges have no geometry attributes so you don't have to
+    # project them: the nodes contain all the spatial data in the graph
+    edges = [data for _, _, data in G_proj.edges(data=True) if "geometry" in data]
+    if len(edges) > 0:
+        geoms = [data["geometry"] for data in edges]
+        for data, geom in zip(edges, _transform_geometries(geoms, transformer)):
+            data["geometry"] = geom
+
+    # if the graph has been simplified, fill in straight-line geometries for
+    # the edges that lack them, from the projected node coordinates
     if simplification._is_simplified(G):
-        # if graph has previously been simplified, project the edge geometries
-        gdf_edges = utils_graph.graph_to_gdfs(G, nodes=False, fill_edge_geometry=True)
-        gdf_edges_proj = project_gdf(gdf_edges, to_crs=gdf_nodes_proj.crs)
-    else:
-        # if not, you don't have to project these edges because the nodes
-        # contain all the spatial data in the graph (unsimplified edges have
-        # no geometry attributes)
-        gdf_edges_proj = utils_graph.graph_to_gdfs(G, nodes=False, fill_edge_geometry=False).drop(
-            columns=["geometry"]
-        )
-
-    # STEP 3: REBUILD GRAPH
-    # turn projected node/edge gdfs into a graph and update its CRS attribute
-    G_proj = utils_graph.graph_from_gdfs(gdf_nodes_proj, gdf_edges_proj, G.graph)
-    G_proj.graph["crs"] = gdf_nodes_proj.crs
-
-    utils.log(f"Finished projecting graph with {len(G)} nodes and {len(G.edges())} edges")
+        positions = {node: i for i, (node, _) in enumerate(nodes)}
+        edges = [(u, v, data) for u, v, data in G_proj.edges(data=True) if "geometry" not in data]
+        if len(edges) > 0:
+            u_pos = np.array([positions[u] for u, _, _ in edges])
+            v_pos = np.array([positions[v] for _, v, _ in edges])
+            xy = np.column_stack((x_proj, y_proj))
+            for (_, _, data), u_xy, v_xy in zip(edges, xy[u_pos], xy[v_pos]):
+                data["geometry"] = LineString((u_xy, v_xy))
+
+    # STEP 3: UPDATE THE GRAPH'S CRS ATTRIBUTE
+    G_proj.graph["crs"] = to_crs
+
+    elapsed = time.time() - start_time
+    utils.log(
+        f"Finished projecting graph with {len(G)} nodes and {len(G.edges())} edges "
+        f"in {elapsed:,.4f} seconds"
+    )
     return G_proj
+
+
+def _get_utm_crs(lng):
+    """
+    Get the UTM CRS for the UTM zone in which a longitude lies.
+
+    Parameters
+    ----------
+    lng : float
+        the longitude
+
+    Returns
+    -------
+    utm_crs : string
+        proj4 string of the UTM CRS
+    """
+    utm_zone = int(math.floor((lng + 180) / 6.0) + 1)
+    return f"+proj=utm +zone={utm_zone} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
+
+
+def _hashable_crs(crs):
+    """
+    Convert a CRS definition to a hashable value to use as a cache key.
+
+    Parameters
+    ----------
+    crs : dict or string or pyproj.CRS
+        the CRS definition
+
+    Returns
+    -------
+    crs : string or pyproj.CRS
+        the CRS definition, converted to a pyproj.CRS if it was a dict
+    """
+    if isinstance(crs, dict):
+        return CRS.from_user_input(crs)
+    else:
+        return crs
+
+
+def _get_crs(crs):
+    """
+    Get a (cached) pyproj.CRS object from a CRS definition.
+
+    The cache is kept per thread, because pyproj objects are not thread-safe.
+
+    Parameters
+    ----------
+    crs : dict or string or pyproj.CRS
+        the CRS definition
+
+    Returns
+    -------
+    pyproj.CRS
+    """
+    return _get_thread_cache("build_crs", _build_crs)(_hashable_crs(crs))
+
+
+def _get_thread_cache(name, func):
+    """
+    Get the current thread's least-recently-used cached version of a function.
+
+    Parameters
+    ----------
+    name : string
+        name of the cache in the thread-local storage
+    func : function
+        the function to cache
+
+    Returns
+    -------
+    function
+        the cached function, with a `cache_info()` method to inspect it
+    """
+    cached_func = getattr(_local, name, None)
+    if cached_func is None:
+        cached_func = lru_cache(maxsize=_CACHE_SIZE)(func)
+        setattr(_local, name, cached_func)
+    return cached_func
+
+
+def _build_crs(crs):
+    """
+    Build a pyproj.CRS object from a CRS definition.
+
+    Parameters
+    ----------
+    crs : string or pyproj.CRS
+        the hashable CRS definition
+
+    Returns
+    -------
+    pyproj.CRS
+    """
+    return CRS.from_user_input(crs)
+
+
+def _get_transformer(crs, to_crs):
+    """
+    Get a (cached) transformer from one CRS to another.
+
+    Transformers are kept in a bounded least-recently-used cache keyed by
+    (source CRS, target CRS), so repeatedly projecting between the same CRSs
+    (e.g., when buffering and subdividing a query polygon) does not pay the
+    transformer setup cost each time. pyproj transformers are not thread-safe,
+    so each thread has its own cache and never shares transformers with other
+    threads. The current thread's cache hits and misses can be inspected via
+    `_get_thread_cache("build_transformer", _build_transformer).cache_info()`.
+
+    Parameters
+    ----------
+    crs : dict or string or pyproj.CRS
+        the source CRS
+    to_crs : dict or string or pyproj.CRS
+        the target CRS
+
+    Returns
+    -------
+    pyproj.Transformer
+        transformer that takes and returns coordinates in x, y order
+    """
+    build_transformer = _get_thread_cache("build_transformer", _build_transformer)
+    return build_transformer(_get_crs(crs), _get_crs(to_crs))
+
+
+def _build_transformer(crs, to_crs):
+    """
+    Build a transformer from one CRS to another.
+
+    Parameters
+    ----------
+    crs : pyproj.CRS
+        the source CRS
+    to_crs : pyproj.CRS
+        the target CRS
+
+    Returns
+    -------
+    pyproj.Transformer
+    """
+    start_time = time.time()
+    transformer = Transformer.from_crs(crs, to_crs, always_xy=True)
+    elapsed = time.time() - start_time
+    utils.log(f"Created transformer from {crs} to {to_crs} in {elapsed:,.4f} seconds")
+    return transformer
+
+
+def _transform_geometries(geoms, transformer):
+    """
+    Transform a list of geometries' coordinates in a single bulk operation.
+
+    All the Points' and LineStrings' coordinates are packed into a single
+    array (with offsets marking where each geometry begins), transformed at
+    once, then split back apart into new geometries. Any other geometries
+    (e.g., Polygons) are transformed individually, and nulls are retained.
+
+    Parameters
+    ----------
+    geoms : list-like
+        shapely geometries
+    transformer : pyproj.Transformer
+        the transformer to apply to the geometries' coordinates
+
+    Returns
+    -------
+    geoms_proj : list
+        list of transformed shapely geometries
+    """
+    geoms = list(geoms)
+    is_packed = [isinstance(g, (Point, LineString)) and not g.is_empty for g in geoms]
+    coords = [np.asarray(g.coords)[:, :2] for g, p in zip(geoms, is_packed) if p]
+
+    packed_proj = []
+    if len(coords) > 0:
+        offsets = np.cumsum([len(c) for c in coords])[:-1]
+        xy = np.concatenate(coords)
+        x_proj, y_proj = transformer.transform(xy[:, 0], xy[:, 1])
+        xy_proj = np.column_stack((x_proj, y_proj))
+        packed_proj = np.split(xy_proj, offsets)
+
+    packed_proj = iter(packed_proj)
+    geoms_proj = []
+    for geom, packed in zip(geoms, is_packed):
+        if packed:
+            c = next(packed_proj)
+            geoms_proj.append(Point(c[0]) if isinstance(geom, Point) else LineString(c))
+        elif geom is None:
+            geoms_proj.append(None)
+        else:
+            geoms_proj.append(shapely_transform(transformer.transform, geom))
+    return geoms_proj
@@ -1,11 +1,14 @@
 """Calculate graph edge speeds and travel times."""
 
-import re
+from heapq import heappop
+from heapq import heappush
+from itertools import count
 
 import networkx as nx
 import numpy as np
 import pandas as pd
 
+from . import utils
 from . import utils_graph
 
 
@@ -49,40 +52,65 @@ def add_edge_speeds(G, hwy_speeds=None, fallback=None):
     G : networkx.MultiDiGraph
         graph with speed attributes on all edges
     """
+    edges = utils_graph.graph_to_dfs(G, nodes=False, edge_attrs=["highway", "maxspeed"])
+    if len(edges) < 1:
+        # a graph without edges has no speeds to add
+        return G
+    speed_kph = _impute_edge_speeds(edges, hwy_speeds, fallback)
+
+    # add speed kph attribute to graph edges
+    edges = zip(edges["u"], edges["v"], edges["key"])
+    nx.set_edge_attributes(G, values=dict(zip(edges, speed_kph.tolist())), name="speed_kph")
+
+    return G
+
+
+def _impute_edge_speeds(edges, hwy_speeds=None, fallback=None):
+    """
+    Impute edges' speeds (km per hour) from their highway types and maxspeeds.
+
+    See add_edge_speeds for details of the imputation.
+
+    Parameters
+    ----------
+    edges : pandas.DataFrame
+        edges table with a `highway` column and, optionally, a `maxspeed`
+        column
+    hwy_speeds : dict
+        dict keys = OSM highway types and values = typical speeds (km per
+        hour) to assign to edges of that highway type for any edges missing
+        speed data
+    fallback : numeric
+        default speed value (km per hour) to assign to edges whose highway
+        type did not appear in `hwy_speeds` and had no preexisting speed
+        values on any edge
+
+    Returns
+    -------
+    speed_kph : pandas.Series
+        the edges' speeds, indexed like edges
+    """
     if fallback is None:
         fallback = np.nan
 
-    edges = utils_graph.graph_to_gdfs(G, nodes=False, fill_edge_geometry=False)
-
     # collapse any highway lists (can happen during graph simplification)
     # into string values simply by keeping just the first element of the list
-    edges["highway"] = edges["highway"].map(lambda x: x[0] if isinstance(x, list) else x)
+    highway = edges["highway"].astype(object).map(lambda x: x[0] if isinstance(x, list) else x)
 
     if "maxspeed" in edges.columns:
-        # collapse any maxspeed lists (can happen during graph simplification)
-        # into a single value
-        edges["maxspeed"] = edges["maxspeed"].map(_collapse_multiple_maxspeed_values)
-
         # create speed_kph by cleaning maxspeed strings and converting mph to
         # kph if necessary
-        edges["speed_kph"] = edges["maxspeed"].astype(str).map(_clean_maxspeed).astype(float)
+        speed_kph = _clean_maxspeeds(edges["maxspeed"])
     else:
         # if no edges in graph had a maxspeed attribute
-        edges["speed_kph"] = None
+        speed_kph = pd.Series(np.nan, index=edges.index)
 
-    # if user provided hwy_speeds, use them as default values, otherwise
-    # initialize an empty series to populate with values
-    if hwy_speeds is None:
-        hwy_speed_avg = pd.Series(dtype=float)
-    else:
-        hwy_speed_avg = pd.Series(hwy_speeds).dropna()
-
-    # for each highway type that caller did not provide in hwy_speeds, impute
-    # speed of type by taking the mean of the preexisting speed values of that
-    # highway type
-    for hwy, group in edges.groupby("highway"):
-        if hwy not in hwy_speed_avg:
-            hwy_speed_avg.loc[hwy] = group["speed_kph"].mean()
+    # impute speed of each highway type by taking the mean of the preexisting
+    # speed values of that highway type, unless caller provided it in
+    # hwy_speeds
+    hwy_speed_avg = speed_kph.groupby(highway).mean()
+    if hwy_speeds is not None:
+        hwy_speed_avg = pd.Series(hwy_speeds, dtype=float).dropna().combine_first(hwy_speed_avg)
 
     # if any highway types had no preexisting speed values, impute their speed
     # with fallback value provided by caller. if fallback=np.nan, impute speed
@@ -91,9 +119,7 @@ def add_edge_speeds(G, hwy_speeds=None, fallback=None):
 
     # for each edge missing speed data, assign it the imputed value for its
     # highway type
-    speed_kph = (
-        edges[["highway", "speed_kph"]].set_index("highway").iloc[:, 0].fillna(hwy_speed_avg)
-    )
+    speed_kph = speed_kph.fillna(highway.map(hwy_speed_avg))
 
     # all speeds will be null if edges had no preexisting maxspeed data and
     # caller did not pass in hwy_speeds or fallback arguments
@@ -106,12 +132,7 @@ def add_edge_speeds(G, hwy_speeds=None, fallback=None):
             )
         )
 
-    # add speed kph attribute to graph edges
-    edges["speed_kph"] = speed_kph.values
-    edge_speed_kph = edges[["u", "v", "key", "speed_kph"]].set_index(["u", "v", "key"]).iloc[:, 0]
-    nx.set_edge_attributes(G, values=edge_speed_kph, name="speed_kph")
-
-    return G
+    return speed_kph
 
 
 def add_edge_travel_times(G):
@@ -133,7 +154,10 @@ def add_edge_travel_times(G):
     G : networkx.MultiDiGraph
         graph with travel time attributes on all edges
     """
-    edges = utils_graph.graph_to_gdfs(G, nodes=False)
+    edges = utils_graph.graph_to_dfs(G, nodes=False, edge_attrs=["length", "speed_kph"])
+    if len(edges) < 1:
+        # a graph without edges has no travel times to add
+        return G
 
     # verify edge length and speed_kph attributes exist and contain no nulls
     if not ("length" in edges.columns and "speed_kph" in edges.columns):
@@ -157,60 +181,208 @@ def add_edge_travel_times(G):
     return G
 
 
-def _clean_maxspeed(value, convert_mph=True):
+def add_edge_speed_profiles(
+    G, hwy_factors=None, edge_speeds=None, bucket_seconds=3600, n_buckets=24
+):
     """
-    Clean a maxspeed string and convert mph to kph if necessary.
+    Add time-dependent speed profiles (km per hour) to graph edges.
+
+    Splits the day (or any other cycle of n_buckets * bucket_seconds seconds)
+    into time buckets, and gives each edge a speed in each bucket. Rather than
+    a separate attribute per bucket, the profiles are stored compactly as a
+    single float32 matrix in `G.graph["speed_profiles"]`, with one row per
+    edge and one column per bucket, and each edge's `speed_profile` attribute
+    is its row in the matrix. The bucket duration is stored in
+    `G.graph["speed_profile_bucket_seconds"]`. The io module's savers write
+    the matrix as a binary array, so the profiles survive saving and loading
+    the graph. Use `shortest_path_time_dependent` to route on the profiles at
+    any departure time.
+
+    By default, an edge's speed in every bucket is its free-flow `speed_kph`
+    attribute (run `add_edge_speeds` first to generate it), multiplied by the
+    factors in `hwy_factors` for its highway type. Zero or null speeds close
+    the edge during that bucket, and null speeds are stored as zero.
 
     Parameters
     ----------
-    value : string
-        an OSM way maxspeed value
-    convert_mph : bool
-        if True, convert mph to kph
+    G : networkx.MultiDiGraph
+        input graph
+    hwy_factors : dict
+        dict keys = OSM highway types and values = sequences of n_buckets
+        factors by which to multiply the free-flow speeds of edges of that
+        highway type in each bucket
+    edge_speeds : pandas.DataFrame
+        speeds (km per hour) of individual edges in each bucket, indexed by
+        (u, v, key) with n_buckets columns, overriding their profiles
+    bucket_seconds : int
+        the duration of each time bucket in seconds
+    n_buckets : int
+        the number of time buckets in the cycle
 
     Returns
     -------
-    value_clean : string
+    G : networkx.MultiDiGraph
+        graph with speed profiles
     """
-    MPH_TO_KPH = 1.60934
-    pattern = re.compile(r"[^\d\.,;]")
+    edges = utils_graph.graph_to_dfs(G, nodes=False, edge_attrs=["highway", "speed_kph"])
+    if "speed_kph" not in edges.columns:
+        raise KeyError("all edges must have `speed_kph` attributes.")
+
+    # look up each edge's factors by its highway type, defaulting to 1
+    factors = np.ones((1, n_buckets))
+    codes = np.full(len(edges), -1)
+    if hwy_factors is not None and "highway" in edges.columns:
+        hwy = edges["highway"].map(lambda x: x[0] if isinstance(x, list) else x)
+        codes = pd.Index(hwy_factors.keys()).get_indexer(hwy)
+        factors = np.vstack([np.array(list(hwy_factors.values()), dtype=float), factors])
+        if factors.shape[1] != n_buckets:
+            raise ValueError(f"hwy_factors must have {n_buckets} values per highway type")
+
+    speed_kph = edges["speed_kph"].to_numpy(dtype=float)
+    speeds = speed_kph[:, np.newaxis] * factors[codes]
+
+    if edge_speeds is not None:
+        index = pd.MultiIndex.from_arrays([edges["u"], edges["v"], edges["key"]])
+        positions = index.get_indexer(edge_speeds.index)
+        if (positions == -1).any():
+            raise ValueError("edge_speeds must only contain edges in the graph")
+        speeds[positions] = edge_speeds.to_numpy(dtype=float)
+
+    G.graph["speed_profiles"] = np.nan_to_num(speeds, nan=0).astype(np.float32)
+    G.graph["speed_profile_bucket_seconds"] = bucket_seconds
+    edges = zip(edges["u"], edges["v"], edges["key"])
+    nx.set_edge_attributes(G, values=dict(zip(edges, range(len(speeds)))), name="speed_profile")
+
+    utils.log(f"Added speed profiles with {n_buckets} time buckets to graph")
+    return G
+
+
+def shortest_path_time_dependent(G, orig, dest, departure_time, return_time=False):
+    """
+    Find the fastest path between two nodes for a departure time.
 
-    try:
-        # strip out everything but numbers, periods, commas, semicolons
-        value_clean = float(re.sub(pattern, "", value).replace(",", "."))
-        if convert_mph and "mph" in value.lower():
-            value_clean = value_clean * MPH_TO_KPH
-        return value_clean
+    Uses a time-dependent Dijkstra search on the speed profiles added by
+    `add_edge_speed_profiles`: an edge's travel time is its `length` divided
+    by its speed in the time bucket in which it is entered. Departure times
+    past the end of the profiles' cycle wrap around to its start, so a
+    departure time of 1 day + 8 hours uses the same buckets as 8 hours.
 
-    except ValueError:
-        return None
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph, with speed profiles
+    orig : int
+        origin node ID
+    dest : int
+        destination node ID
+    departure_time : float
+        the departure time from the origin node, in seconds since the start
+        of the profiles' cycle
+    return_time : bool
+        optionally also return the travel time in seconds
 
+    Returns
+    -------
+    route or tuple
+        list of node IDs making up the path, or tuple of (route, travel time)
+        if return_time is True
+    """
+    if "speed_profiles" not in G.graph:
+        raise ValueError("graph must have speed profiles: run add_edge_speed_profiles first")
+    speeds = G.graph["speed_profiles"]
+    bucket_seconds = float(G.graph["speed_profile_bucket_seconds"])
+    n_buckets = speeds.shape[1]
+
+    # the heap holds (arrival time, tiebreaker, node) so node IDs are never
+    # compared
+    arrivals = {orig: departure_time}
+    predecessors = {orig: None}
+    visited = set()
+    tiebreaker = count()
+    heap = [(departure_time, next(tiebreaker), orig)]
+    while heap:
+        time, _, u = heappop(heap)
+        if u in visited:
+            continue
+        visited.add(u)
+        if u == dest:
+            break
+
+        bucket = int(time // bucket_seconds) % n_buckets
+        for v, keydict in G.succ[u].items():
+            # travel time along the fastest of any parallel edges, in km per
+            # hour converted to meters per second
+            travel_time = np.inf
+            for k, data in keydict.items():
+                if "speed_profile" not in data:
+                    raise ValueError(
+                        f"edge {(u, v, k)} has no speed profile: "
+                        "run add_edge_speed_profiles after changing the graph's edges"
+                    )
+                speed = speeds.item(data["speed_profile"], bucket)
+                if speed > 0:
+                    travel_time = min(travel_time, data["length"] / speed * 3.6)
+            if time + travel_time < arrivals.get(v, np.inf):
+                arrivals[v] = time + travel_time
+                predecessors[v] = u
+                heappush(heap, (time + travel_time, next(tiebreaker), v))
+
+    if dest not in visited:
+        raise nx.NetworkXNoPath(f"No path between {orig} and {dest}.")
+
+    # walk back through the predecessors from the destination
+    route = [dest]
+    while predecessors[route[-1]] is not None:
+        route.append(predecessors[route[-1]])
+    route.reverse()
+
+    if return_time:
+        return route, arrivals[dest] - departure_time
+    else:
+        return route
 
-def _collapse_multiple_maxspeed_values(value):
+
+def _clean_maxspeeds(maxspeeds, convert_mph=True):
     """
-    Collapse a list of maxspeed values into its mean value.
+    Clean maxspeed values and convert mph to kph if necessary.
+
+    Each distinct value is parsed just once, with vectorized string
+    operations, as a graph has far fewer distinct maxspeed values than edges.
+    Lists of maxspeed values (which can result from graph simplification) are
+    collapsed into the integer part of their values' mean.
 
     Parameters
     ----------
-    value : list or string
-        an OSM way maxspeed value, or a list of them
+    maxspeeds : pandas.Series
+        OSM way maxspeed values, or lists of them
+    convert_mph : bool
+        if True, convert mph to kph
 
     Returns
     -------
-    mean_value : int
-        an integer representation of the mean value in the list, converted
-        to kph if original value was in mph.
+    speeds : pandas.Series
+        the cleaned speeds as floats, null where a value could not be parsed
     """
-    # if this isn't a list, just return it right back to the caller
-    if not isinstance(value, list):
-        return value
+    MPH_TO_KPH = 1.60934
 
-    else:
-        try:
-            # clean each value in list and convert to kph if it is mph then
-            # return mean value
-            values = [_clean_maxspeed(x) for x in value]
-            mean_value = int(pd.Series(values).dropna().mean())
-            return mean_value
-        except ValueError:
-            return None
+    # lists are not hashable, so key the distinct values by tuples instead
+    keys = maxspeeds.map(lambda x: tuple(x) if isinstance(x, list) else x)
+    codes, uniques = pd.factorize(keys)
+    uniques = pd.Series(uniques, dtype=object)
+
+    # strip out everything but numbers, periods, commas, semicolons from each
+    # value, or each element of each list of values
+    values = uniques.explode().astype(str)
+    cleaned = values.str.replace(r"[^\d\.,;]", "", regex=True).str.replace(",", ".", regex=False)
+    speeds = pd.to_numeric(cleaned, errors="coerce").astype(float)
+    if convert_mph:
+        speeds[values.str.contains("mph", case=False, regex=False)] *= MPH_TO_KPH
+
+    # collapse each list's speeds into the integer part of their mean
+    speeds = speeds.groupby(level=0).mean()
+    is_list = uniques.map(lambda x: isinstance(x, tuple))
+    speeds[is_list] = np.trunc(speeds[is_list])
+
+    # null values have code -1, so take the appended null speed
+    speeds = np.append(speeds.to_numpy(), np.nan)[codes]
+    return pd.Series(speeds, index=maxspeeds.index)
@@ -1,10 +1,28 @@
 """Calculate graph-theoretic network measures."""
 
+import copy
+import hashlib
+import json
+import logging as lg
+import multiprocessing as mp
+import os
+import time
+import types
+import weakref
+
+import geopandas as gpd
 import networkx as nx
 import numpy as np
 import pandas as pd
+from shapely.geometry import Polygon
 
+from . import boundaries
+from . import centrality
 from . import distance
+from . import downloader
+from . import graph
+from . import projection
+from . import settings
 from . import simplification
 from . import utils
 from . import utils_graph
@@ -80,15 +98,15 @@ def basic_stats(G, area=None, clean_intersects=False, tolerance=15, circuity_dis
           - clean_intersection_density_km = clean_intersection_count divided by
                 area in square kilometers
     """
-    sq_m_in_sq_km = 1e6  # there are 1 million sq meters in 1 sq km
-    G_undirected = None
-
-    # calculate the number of nodes, n, and the number of edges, m, in the graph
-    n = len(list(G.nodes()))
-    m = len(list(G.edges()))
-
-    # calculate the average degree of the graph
-    k_avg = 2 * m / n
+    # get the node coordinates, then each edge's endpoints' positions in the
+    # node arrays, key, and length, in a single pass over the edges
+    nodes, xs, ys = zip(*((node, d["x"], d["y"]) for node, d in G.nodes(data=True)))
+    positions = {node: i for i, node in enumerate(nodes)}
+    edges = [(positions[u], positions[v], k, d) for u, v, k, d in G.edges(keys=True, data="length")]
+    u_pos, v_pos, keys, lengths = zip(*edges)
+    u_pos = np.array(u_pos)
+    v_pos = np.array(v_pos)
+    lengths = np.array(lengths, dtype=float)
 
     if "streets_per_node" in G.graph:
         # get the degrees saved as a graph attribute (from an undirected
@@ -103,47 +121,121 @@ def basic_stats(G, area=None, clean_intersects=False, tolerance=15, circuity_dis
 
     # count number of intersections in graph, as nodes with >1 street emanating
     # from them
-    node_ids = set(G.nodes())
-    intersection_count = len(
-        [True for node, count in streets_per_node.items() if (count > 1) and (node in node_ids)]
+    intersection_count = sum(
+        1 for node, count in streets_per_node.items() if count > 1 and node in positions
+    )
+    streets_per_node_values = np.array(list(streets_per_node.values()), dtype=np.int64)
+
+    # calculate clean intersection counts
+    if clean_intersects:
+        clean_intersection_points = simplification.consolidate_intersections(
+            G, tolerance=tolerance, rebuild_graph=False, dead_ends=False
+        )
+        clean_intersection_count = len(clean_intersection_points)
+    else:
+        clean_intersection_count = None
+
+    return _basic_stats_from_arrays(
+        np.array(xs, dtype=float),
+        np.array(ys, dtype=float),
+        u_pos,
+        v_pos,
+        keys,
+        lengths,
+        intersection_count,
+        streets_per_node_values,
+        area,
+        circuity_dist,
+        clean_intersection_count,
     )
 
+
+def _basic_stats_from_arrays(
+    x,
+    y,
+    u_pos,
+    v_pos,
+    keys,
+    lengths,
+    intersection_count,
+    streets_per_node_values,
+    area,
+    circuity_dist,
+    clean_intersection_count,
+):
+    """
+    Calculate basic stats from arrays of a graph's nodes and edges.
+
+    See basic_stats for the stats' definitions.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        the nodes' x coordinates
+    y : numpy.ndarray
+        the nodes' y coordinates
+    u_pos : numpy.ndarray
+        each edge's u node's position in the node arrays
+    v_pos : numpy.ndarray
+        each edge's v node's position in the node arrays
+    keys : list-like
+        each edge's key
+    lengths : numpy.ndarray
+        each edge's length
+    intersection_count : int
+        number of nodes with more than one street emanating from them
+    streets_per_node_values : numpy.ndarray
+        number of streets emanating from each node
+    area : numeric
+        the land area of this study site, in square meters, or None
+    circuity_dist : string
+        'gc' or 'euclidean', how to calculate straight-line distances for
+        circuity measurement
+    clean_intersection_count : int
+        number of intersections, merging complex ones into single points, or
+        None if not calculated
+
+    Returns
+    -------
+    stats : dict
+    """
+    sq_m_in_sq_km = 1e6  # there are 1 million sq meters in 1 sq km
+
+    # calculate the number of nodes, n, and the number of edges, m, in the graph
+    n = len(x)
+    m = len(u_pos)
+
+    # calculate the average degree of the graph
+    k_avg = 2 * m / n
+
     # calculate the average number of streets (unidirected edges) incident to
     # each node
-    streets_per_node_avg = sum(streets_per_node.values()) / n
+    streets_per_node_avg = streets_per_node_values.sum() / n
 
     # create a dict where key = number of streets (unidirected edges) incident
     # to each node, and value = how many nodes are of this number in the graph
-    streets_per_node_counts = {
-        num: list(streets_per_node.values()).count(num)
-        for num in range(max(streets_per_node.values()) + 1)
-    }
+    streets_per_node_counts = dict(enumerate(np.bincount(streets_per_node_values).tolist()))
 
     # degree proportions: dict where key = each degree and value = what
     # proportion of nodes are of this degree in the graph
     streets_per_node_proportion = {num: count / n for num, count in streets_per_node_counts.items()}
 
     # calculate the total and average edge lengths
-    edge_length_total = sum([d["length"] for u, v, d in G.edges(data=True)])
+    edge_length_total = lengths.sum()
     edge_length_avg = edge_length_total / m
 
     # calculate the total and average street segment lengths (so, edges without
-    # double-counting two-way streets)
-    if G_undirected is None:
-        G_undirected = G.to_undirected(reciprocal=False)
-    street_length_total = sum([d["length"] for u, v, d in G_undirected.edges(data=True)])
-    street_segments_count = len(list(G_undirected.edges(keys=True)))
+    # double-counting two-way streets). an undirected representation of the
+    # graph has one edge per pair of nodes and key, with the data of the last
+    # directed edge between them, so find those without creating it
+    node_pairs = pd.DataFrame(
+        {"a": np.minimum(u_pos, v_pos), "b": np.maximum(u_pos, v_pos), "key": keys}
+    )
+    is_street = ~node_pairs.duplicated(keep="last").to_numpy()
+    street_length_total = lengths[is_street].sum()
+    street_segments_count = int(is_street.sum())
     street_length_avg = street_length_total / street_segments_count
 
-    # calculate clean intersection counts
-    if clean_intersects:
-        clean_intersection_points = simplification.consolidate_intersections(
-            G, tolerance=tolerance, rebuild_graph=False, dead_ends=False
-        )
-        clean_intersection_count = len(clean_intersection_points)
-    else:
-        clean_intersection_count = None
-
     # we can calculate density metrics only if area is not null
     if area is not None:
         area_km = area / sq_m_in_sq_km
@@ -161,7 +253,7 @@ def basic_stats(G, area=None, clean_intersects=False, tolerance=15, circuity_dis
         # calculate street density as linear meters per sq km
         street_density_km = street_length_total / area_km
 
-        if clean_intersects:
+        if clean_intersection_count is not None:
             clean_intersection_density_km = clean_intersection_count / area_km
         else:
             clean_intersection_density_km = None
@@ -174,39 +266,26 @@ def basic_stats(G, area=None, clean_intersects=False, tolerance=15, circuity_dis
         clean_intersection_density_km = None
 
     # average circuity: sum of edge lengths divided by sum of straight-line
-    # distance between edge endpoints. first load all the edges origin and
-    # destination coordinates as a dataframe, then calculate the straight-line
-    # distance
-    coords = np.array(
-        [
-            [G.nodes[u]["y"], G.nodes[u]["x"], G.nodes[v]["y"], G.nodes[v]["x"]]
-            for u, v, k in G.edges(keys=True)
-        ]
-    )
-    df_coords = pd.DataFrame(coords, columns=["u_y", "u_x", "v_y", "v_x"])
+    # distance between edge endpoints
     if circuity_dist == "gc":
-        gc_distances = distance.great_circle_vec(
-            lat1=df_coords["u_y"],
-            lng1=df_coords["u_x"],
-            lat2=df_coords["v_y"],
-            lng2=df_coords["v_x"],
+        straight_distances = distance.great_circle_vec(
+            lat1=y[u_pos], lng1=x[u_pos], lat2=y[v_pos], lng2=x[v_pos]
         )
     elif circuity_dist == "euclidean":
-        gc_distances = distance.euclidean_dist_vec(
-            y1=df_coords["u_y"], x1=df_coords["u_x"], y2=df_coords["v_y"], x2=df_coords["v_x"]
+        straight_distances = distance.euclidean_dist_vec(
+            y1=y[u_pos], x1=x[u_pos], y2=y[v_pos], x2=x[v_pos]
         )
     else:
         raise ValueError('circuity_dist must be "gc" or "euclidean"')
 
-    gc_distances = gc_distances.fillna(value=0)
-    try:
-        circuity_avg = edge_length_total / gc_distances.sum()
-    except ZeroDivisionError:
+    straight_distance_total = np.nan_to_num(straight_distances).sum()
+    if straight_distance_total > 0:
+        circuity_avg = edge_length_total / straight_distance_total
+    else:
         circuity_avg = np.nan
 
     # percent of edges that are self-loops, ie both endpoints are the same node
-    self_loops = [True for u, v, k in G.edges(keys=True) if u == v]
-    self_loops_count = len(self_loops)
+    self_loops_count = int((u_pos == v_pos).sum())
     self_loop_proportion = self_loops_count / m
 
     # assemble the results
@@ -237,7 +316,705 @@ def basic_stats(G, area=None, clean_intersects=False, tolerance=15, circuity_dis
     return stats
 
 
-def extended_stats(G, connectivity=False, anc=False, ecc=False, bc=False, cc=False):
+def basic_stats_batch(
+    places,
+    filepath=None,
+    cpus=1,
+    network_type="all_private",
+    simplify=True,
+    retain_all=False,
+    custom_filter=None,
+):
+    """
+    Calculate basic stats for the street networks of many places.
+
+    Downloads and builds each place's graph, then calculates its basic_stats
+    with the area of its boundary polygon, in parallel across `cpus`
+    processes. The processes take turns pausing before API requests so they
+    respect the APIs' rate limits, and share the current settings, including
+    the response cache if settings.use_cache is True. If `filepath` is not
+    None, each place's stats are saved to this checkpoint file when they
+    complete, and places already in the file are skipped, so an interrupted
+    run can be resumed by calling this function again with the same
+    arguments. Places are identified in the file by their query, or by a hash
+    of their polygon, along with the network_type, simplify, retain_all, and
+    custom_filter arguments, and stats saved with different arguments are
+    ignored.
+
+    Parameters
+    ----------
+    places : list or geopandas.GeoDataFrame
+        list of place query strings or structured query dicts to geocode, or
+        of shapely Polygons or MultiPolygons in lat-lng, or a GeoDataFrame of
+        boundaries, such as from gdf_from_places
+    filepath : string
+        path to a JSON lines checkpoint file of completed places' stats, if
+        None, don't checkpoint
+    cpus : int
+        how many processes to get places' stats with, in parallel. if None,
+        use all available CPUs
+    network_type : string
+        what type of street network to get if custom_filter is None. One of
+        'walk', 'bike', 'drive', 'drive_service', 'all', or 'all_private'.
+    simplify : bool
+        if True, simplify the graph topology
+    retain_all : bool
+        if True, return the entire graph even if it is not connected.
+        otherwise, retain only the largest weakly connected component.
+    custom_filter : string
+        a custom network filter to be used instead of the network_type presets
+
+    Returns
+    -------
+    stats : pandas.DataFrame
+        one row per place, indexed by the GeoDataFrame's index, the query
+        string, or otherwise the place's position in the list. dict stats are
+        flattened into one column per key, such as streets_per_node_counts_3.
+        places that failed have null stats and their exception message in the
+        error column
+    """
+    if isinstance(places, gpd.GeoDataFrame):
+        keys = list(places.index)
+        places = list(places["geometry"])
+    else:
+        keys = [place if isinstance(place, str) else i for i, place in enumerate(places)]
+    place_ids = [_get_place_id(place) for place in places]
+    params = {
+        "network_type": network_type,
+        "simplify": simplify,
+        "retain_all": retain_all,
+        "custom_filter": custom_filter,
+    }
+    if cpus is None:
+        cpus = os.cpu_count()
+
+    # load the stats of places completed by a previous run with the same
+    # params
+    completed = {}
+    if filepath is not None and os.path.exists(filepath):
+        with open(filepath, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # pragma: no cover
+                    # the last line may be incomplete if a run was interrupted
+                    continue
+                if record.get("params") == params:
+                    completed[record["id"]] = record["stats"]
+    args = [
+        (place_id, place, network_type, simplify, retain_all, custom_filter)
+        for place_id, place in dict(zip(place_ids, places)).items()
+        if place_id not in completed
+    ]
+    utils.log(f"Getting stats for {len(args)} places, {len(completed)} already completed")
+
+    # get each place's stats, in parallel if cpus > 1, checkpointing each as it
+    # completes
+    errors = {}
+    folder = None if filepath is None else os.path.dirname(filepath)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    f = None if filepath is None else open(filepath, "a")
+    try:
+        if cpus > 1 and len(args) > 1:
+            # share one request lock and the current settings with the workers
+            initargs = (mp.Lock(), _get_settings())
+            with mp.Pool(min(cpus, len(args)), _init_batch_worker, initargs) as pool:
+                for place_id, row, error in pool.imap_unordered(_get_place_stats_star, args):
+                    _checkpoint(completed, errors, f, place_id, params, row, error)
+        else:
+            for arg in args:
+                place_id, row, error = _get_place_stats(*arg)
+                _checkpoint(completed, errors, f, place_id, params, row, error)
+    finally:
+        if f is not None:
+            f.close()
+
+    # assemble a DataFrame of every place's stats, in their original order
+    rows = [completed.get(place_id, {}) for place_id in place_ids]
+    df = pd.DataFrame(rows, index=keys)
+    df.index.name = "place"
+    df["error"] = [errors.get(place_id) for place_id in place_ids]
+    utils.log(f"Got stats for {len(completed)} places, {len(errors)} failed")
+    return df
+
+
+def _get_place_id(place):
+    """
+    Get a stable identifier of a place, to key its stats in a checkpoint file.
+
+    Parameters
+    ----------
+    place : string or dict or shapely.geometry.Polygon
+        the place's query or its boundary polygon in lat-lng
+
+    Returns
+    -------
+    place_id : string
+        the query string, the structured query dict as sorted JSON, or the
+        SHA-256 hash of the polygon's WKB
+    """
+    if isinstance(place, str):
+        return place
+    elif isinstance(place, dict):
+        return json.dumps(place, sort_keys=True)
+    else:
+        return hashlib.sha256(place.wkb).hexdigest()
+
+
+def _checkpoint(completed, errors, f, place_id, params, row, error):
+    """
+    Record a place's stats or error, and save its stats to a checkpoint file.
+
+    Parameters
+    ----------
+    completed : dict
+        completed places' stats, keyed by place ID
+    errors : dict
+        failed places' exception messages, keyed by place ID
+    f : file
+        open checkpoint file to append to, or None
+    place_id : string
+        the place's ID, from _get_place_id
+    params : dict
+        the network_type, simplify, retain_all, and custom_filter arguments
+        the stats were calculated with
+    row : dict
+        the place's stats, or None if it failed
+    error : string
+        the place's exception message, or None if it succeeded
+
+    Returns
+    -------
+    None
+    """
+    if error is not None:
+        errors[place_id] = error
+        utils.log(f"Failed to get stats for place {place_id}: {error}", level=lg.WARNING)
+    else:
+        completed[place_id] = row
+        if f is not None:
+            record = {"id": place_id, "params": params, "stats": row}
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+
+
+def _get_settings():
+    """
+    Get the current settings' values, to pass to worker processes.
+
+    Returns
+    -------
+    values : dict
+        settings names and values
+    """
+    return {
+        name: value
+        for name, value in vars(settings).items()
+        if not name.startswith("_") and not isinstance(value, types.ModuleType)
+    }
+
+
+def _init_batch_worker(request_lock, settings_values):
+    """
+    Set up a worker process to get places' stats.
+
+    Parameters
+    ----------
+    request_lock : multiprocessing.Lock
+        lock shared by the workers to take turns pausing before API requests
+    settings_values : dict
+        settings names and values to use in this worker
+
+    Returns
+    -------
+    None
+    """
+    downloader._request_lock = request_lock
+    for name, value in settings_values.items():
+        setattr(settings, name, value)
+
+
+def _get_place_stats_star(args):
+    """
+    Unpack arguments for _get_place_stats, for Pool.imap_unordered.
+
+    Parameters
+    ----------
+    args : tuple
+        arguments to _get_place_stats
+
+    Returns
+    -------
+    place_id, row, error : tuple
+        see _get_place_stats
+    """
+    return _get_place_stats(*args)
+
+
+def _get_place_stats(place_id, place, network_type, simplify, retain_all, custom_filter):
+    """
+    Download and build a place's graph then calculate its basic stats.
+
+    Parameters
+    ----------
+    place_id : string
+        the place's ID, returned as is
+    place : string or dict or shapely.geometry.Polygon
+        the place's query or its boundary polygon in lat-lng
+    network_type : string
+        what type of street network to get if custom_filter is None
+    simplify : bool
+        if True, simplify the graph topology
+    retain_all : bool
+        if True, return the entire graph even if it is not connected
+    custom_filter : string
+        a custom network filter to be used instead of the network_type presets
+
+    Returns
+    -------
+    place_id, row, error : tuple
+        the place's ID, its flattened stats or None if it failed, and the
+        exception message if it failed or otherwise None
+    """
+    try:
+        if isinstance(place, (str, dict)):
+            polygon = boundaries.gdf_from_place(place)["geometry"].iloc[0]
+        else:
+            polygon = place
+        G = graph.graph_from_polygon(
+            polygon,
+            network_type=network_type,
+            simplify=simplify,
+            retain_all=retain_all,
+            custom_filter=custom_filter,
+        )
+        area = projection.project_geometry(polygon)[0].area
+        stats = basic_stats(G, area=area)
+    except Exception as e:
+        return place_id, None, f"{type(e).__name__}: {e}"
+
+    # flatten dict stats into one value per key, as builtin types
+    row = {}
+    for name, value in stats.items():
+        if isinstance(value, dict):
+            for k, v in value.items():
+                row[f"{name}_{k}"] = _to_builtin(v)
+        else:
+            row[name] = _to_builtin(value)
+    return place_id, row, None
+
+
+def _to_builtin(value):
+    """
+    Convert a numpy scalar to the equivalent builtin Python type.
+
+    Parameters
+    ----------
+    value : object
+        value to convert
+
+    Returns
+    -------
+    value : object
+        the builtin value, or the value as is if it is not a numpy scalar
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def gridded_stats(G, cell_size, shape="square", num_bins=36):
+    """
+    Calculate street network indicators in each cell of a grid over a graph.
+
+    Assigns each node to the grid cell containing it and each edge to the cell
+    containing its midpoint, then aggregates the indicators of all cells at
+    once, without building a subgraph for each cell. The grid is anchored at
+    the CRS origin, so grids of graphs in the same CRS line up. The graph must
+    be projected, in meters.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph, projected
+    cell_size : float
+        width of square cells, or distance between the centers of adjacent
+        hexagonal cells, in meters
+    shape : string
+        {"square", "hex"} shape of the grid's cells. hexagons are pointy-topped
+    num_bins : int
+        number of bins to divide street bearings into for orientation entropy
+
+    Returns
+    -------
+    cells : geopandas.GeoDataFrame
+        one row per cell containing any nodes or edges, indexed by the cell's
+        col and row in the grid (its axial coordinates for hexagonal cells),
+        with columns:
+
+          - node_count = number of nodes in the cell
+          - intersection_count = number of nodes with more than one street
+            emanating from them
+          - street_length_total = sum of street segment lengths, where street
+            segments are edges without double-counting two-way streets
+          - street_segments_count = number of street segments
+          - intersection_density_km = intersection_count per square km
+          - street_density_km = street_length_total per square km
+          - circuity_avg = sum of edge lengths divided by the sum of the
+            straight-line distances between their endpoints
+          - orientation_entropy = entropy of the distribution of street
+            bearings, in both directions, across num_bins bins
+          - geometry = the cell's polygon
+    """
+    if not projection._get_crs(G.graph["crs"]).is_projected:
+        raise ValueError("Graph must be projected to calculate gridded stats")
+    if shape not in {"square", "hex"}:
+        raise ValueError('shape must be "square" or "hex"')
+
+    # get the node coordinates, then each edge's endpoints' positions in the
+    # node arrays, key, and length. the graph may have no edges or nodes
+    nodes = list(G.nodes)
+    positions = {node: i for i, node in enumerate(nodes)}
+    x = np.array([d["x"] for _, d in G.nodes(data=True)], dtype=float)
+    y = np.array([d["y"] for _, d in G.nodes(data=True)], dtype=float)
+    edges = list(G.edges(keys=True, data="length"))
+    u_pos = np.array([positions[u] for u, _, _, _ in edges], dtype=np.int64)
+    v_pos = np.array([positions[v] for _, v, _, _ in edges], dtype=np.int64)
+    keys = [k for _, _, k, _ in edges]
+    lengths = np.array([d for _, _, _, d in edges], dtype=float)
+
+    # assign nodes to the cells containing them and edges to the cells
+    # containing their midpoints, then number the cells containing any of them
+    node_cols, node_rows = _get_grid_cells(x, y, cell_size, shape)
+    edge_cols, edge_rows = _get_grid_cells(
+        (x[u_pos] + x[v_pos]) / 2, (y[u_pos] + y[v_pos]) / 2, cell_size, shape
+    )
+    cols = np.concatenate([node_cols, edge_cols])
+    rows = np.concatenate([node_rows, edge_rows])
+    col_min, row_min, row_max = (cols.min(), rows.min(), rows.max()) if len(cols) > 0 else (0, 0, 0)
+    ids = (cols - col_min) * (row_max - row_min + 1) + (rows - row_min)
+    ids, first, cells = np.unique(ids, return_index=True, return_inverse=True)
+    cols = cols[first]
+    rows = rows[first]
+    node_cells = cells[: len(nodes)]
+    edge_cells = cells[len(nodes) :]
+    n_cells = len(ids)
+
+    if "streets_per_node" in G.graph:
+        streets_per_node = G.graph["streets_per_node"]
+    else:
+        streets_per_node = utils_graph.count_streets_per_node(G)
+    is_intersection = np.array([streets_per_node.get(node, 0) > 1 for node in nodes], dtype=bool)
+
+    # street segments are edges without double-counting two-way streets, as in
+    # basic_stats
+    node_pairs = pd.DataFrame(
+        {"a": np.minimum(u_pos, v_pos), "b": np.maximum(u_pos, v_pos), "key": keys}
+    )
+    is_street = ~node_pairs.duplicated(keep="last").to_numpy()
+    street_cells = edge_cells[is_street]
+
+    # sum each indicator's values in each cell
+    area_km = cell_size ** 2 * (1 if shape == "square" else np.sqrt(3) / 2) / 1e6
+    node_count = np.bincount(node_cells, minlength=n_cells)
+    intersection_count = np.bincount(node_cells, weights=is_intersection, minlength=n_cells)
+    street_length_total = np.bincount(street_cells, weights=lengths[is_street], minlength=n_cells)
+    street_segments_count = np.bincount(street_cells, minlength=n_cells)
+
+    # circuity: sum of edge lengths divided by sum of straight-line distances
+    # between edge endpoints
+    straight_distances = distance.euclidean_dist_vec(
+        y1=y[u_pos], x1=x[u_pos], y2=y[v_pos], x2=x[v_pos]
+    )
+    edge_length_total = np.bincount(edge_cells, weights=lengths, minlength=n_cells)
+    straight_distance_total = np.bincount(edge_cells, weights=straight_distances, minlength=n_cells)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        circuity_avg = np.where(
+            straight_distance_total > 0, edge_length_total / straight_distance_total, np.nan
+        )
+
+    # orientation entropy: histogram each cell's street bearings, in both
+    # directions, into bins centered on north, then calculate the entropy
+    is_oriented = is_street & (u_pos != v_pos)
+    du = x[v_pos[is_oriented]] - x[u_pos[is_oriented]]
+    dv = y[v_pos[is_oriented]] - y[u_pos[is_oriented]]
+    bearings = np.degrees(np.arctan2(du, dv))
+    bearings = np.concatenate([bearings, bearings + 180]) % 360
+    bin_width = 360 / num_bins
+    bins = np.floor(((bearings + bin_width / 2) % 360) / bin_width).astype(np.int64)
+    bearing_cells = np.tile(edge_cells[is_oriented], 2)
+    counts = np.bincount(bearing_cells * num_bins + bins, minlength=n_cells * num_bins)
+    counts = counts.reshape(n_cells, num_bins)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        proportions = counts / counts.sum(axis=1, keepdims=True)
+        orientation_entropy = -np.where(counts > 0, proportions * np.log(proportions), 0).sum(
+            axis=1
+        )
+    orientation_entropy[counts.sum(axis=1) == 0] = np.nan
+
+    index = pd.MultiIndex.from_arrays([cols, rows], names=["col", "row"])
+    geometry = _get_cell_polygons(cols, rows, cell_size, shape)
+    data = {
+        "node_count": node_count,
+        "intersection_count": intersection_count.astype(np.int64),
+        "street_length_total": street_length_total,
+        "street_segments_count": street_segments_count,
+        "intersection_density_km": intersection_count / area_km,
+        "street_density_km": street_length_total / area_km,
+        "circuity_avg": circuity_avg,
+        "orientation_entropy": orientation_entropy,
+    }
+    cells = gpd.GeoDataFrame(data, index=index, geometry=geometry, crs=G.graph["crs"])
+    utils.log(f"Calculated stats for {n_cells} grid cells")
+    return cells
+
+
+def _get_grid_cells(x, y, cell_size, shape):
+    """
+    Assign points to the cells of a square or hexagonal grid.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        the points' x coordinates
+    y : numpy.ndarray
+        the points' y coordinates
+    cell_size : float
+        width of square cells, or distance between the centers of adjacent
+        hexagonal cells
+    shape : string
+        {"square", "hex"} shape of the grid's cells
+
+    Returns
+    -------
+    cols, rows : tuple of numpy.ndarray
+        each point's cell's col and row, or axial coordinates for hexagons
+    """
+    if shape == "square":
+        return np.floor(x / cell_size).astype(np.int64), np.floor(y / cell_size).astype(np.int64)
+
+    # convert to fractional axial coordinates of pointy-topped hexagons, then
+    # round to the nearest hexagon in cube coordinates
+    radius = cell_size / np.sqrt(3)
+    q = (np.sqrt(3) / 3 * x - y / 3) / radius
+    r = (2 / 3 * y) / radius
+    s = -q - r
+    q_round, r_round, s_round = np.round(q), np.round(r), np.round(s)
+    q_diff, r_diff, s_diff = np.abs(q_round - q), np.abs(r_round - r), np.abs(s_round - s)
+    fix_q = (q_diff > r_diff) & (q_diff > s_diff)
+    fix_r = ~fix_q & (r_diff > s_diff)
+    q_round = np.where(fix_q, -r_round - s_round, q_round)
+    r_round = np.where(fix_r, -q_round - s_round, r_round)
+    return q_round.astype(np.int64), r_round.astype(np.int64)
+
+
+def _get_cell_polygons(cols, rows, cell_size, shape):
+    """
+    Get the polygons of cells of a square or hexagonal grid.
+
+    Parameters
+    ----------
+    cols : numpy.ndarray
+        the cells' cols, or q axial coordinates for hexagons
+    rows : numpy.ndarray
+        the cells' rows, or r axial coordinates for hexagons
+    cell_size : float
+        width of square cells, or distance between the centers of adjacent
+        hexagonal cells
+    shape : string
+        {"square", "hex"} shape of the grid's cells
+
+    Returns
+    -------
+    polygons : list of shapely.geometry.Polygon
+    """
+    if shape == "square":
+        # the corners of each cell, counter-clockwise from the bottom left
+        corner_x = np.array([0, 1, 1, 0])
+        corner_y = np.array([0, 0, 1, 1])
+        vertex_x = (cols[:, None] + corner_x) * cell_size
+        vertex_y = (rows[:, None] + corner_y) * cell_size
+    else:
+        # the vertices of each pointy-topped hexagon around its center
+        radius = cell_size / np.sqrt(3)
+        angles = np.radians(60 * np.arange(6) - 30)
+        center_x = radius * (np.sqrt(3) * cols + np.sqrt(3) / 2 * rows)
+        center_y = radius * 1.5 * rows
+        vertex_x = center_x[:, None] + radius * np.cos(angles)
+        vertex_y = center_y[:, None] + radius * np.sin(angles)
+    return [Polygon(zip(vx, vy)) for vx, vy in zip(vertex_x.tolist(), vertex_y.tolist())]
+
+
+# extended stats calculated from the centrality module's shortest path
+# searches, which depend on its sampling parameters
+_SAMPLED_STATS = {
+    "closeness_centrality",
+    "closeness_centrality_avg",
+    "betweenness_centrality",
+    "betweenness_centrality_avg",
+}
+
+# intermediate values that extended stats share but that are not stats
+_INTERMEDIATES = {"G_dir", "G_undir", "G_strong", "centralities"}
+
+# each extended stat and intermediate value: a function to calculate it from
+# the graph, the values calculated so far, and the parameters, and the names
+# of the values it depends on
+_EXTENDED_STATS = {
+    # a DiGraph from the MultiDiGraph, for those metrics that require it
+    "G_dir": (lambda G, v, p: nx.DiGraph(G), []),
+    # an undirected Graph from the MultiDiGraph, for those metrics that require
+    # it
+    "G_undir": (lambda G, v, p: nx.Graph(G), []),
+    # the largest strongly connected component, for those metrics that require
+    # strongly connected graphs
+    "G_strong": (lambda G, v, p: utils_graph.get_largest_component(G, strongly=True), []),
+    # node closeness and/or betweenness centrality, from the same shortest path
+    # searches
+    "centralities": (
+        lambda G, v, p: centrality._get_centralities(
+            G,
+            "length",
+            k=p["k"],
+            cpus=p["cpus"],
+            seed=p["seed"],
+            betweenness=p["bc"],
+            closeness=p["cc"],
+        ),
+        [],
+    ),
+    # average degree of the neighborhood of each node, and average for the
+    # graph
+    "avg_neighbor_degree": (lambda G, v, p: nx.average_neighbor_degree(G), []),
+    "avg_neighbor_degree_avg": (
+        lambda G, v, p: _mean(v["avg_neighbor_degree"]),
+        ["avg_neighbor_degree"],
+    ),
+    # average weighted degree of the neighborhood of each node, and average for
+    # the graph
+    "avg_weighted_neighbor_degree": (
+        lambda G, v, p: nx.average_neighbor_degree(G, weight="length"),
+        [],
+    ),
+    "avg_weighted_neighbor_degree_avg": (
+        lambda G, v, p: _mean(v["avg_weighted_neighbor_degree"]),
+        ["avg_weighted_neighbor_degree"],
+    ),
+    # degree centrality for a node is the fraction of nodes it is connected to
+    "degree_centrality": (lambda G, v, p: nx.degree_centrality(G), []),
+    "degree_centrality_avg": (
+        lambda G, v, p: _mean(v["degree_centrality"]),
+        ["degree_centrality"],
+    ),
+    # clustering coefficient for the nodes, and average for the graph
+    "clustering_coefficient": (lambda G, v, p: nx.clustering(v["G_undir"]), ["G_undir"]),
+    "clustering_coefficient_avg": (
+        lambda G, v, p: _mean(v["clustering_coefficient"]),
+        ["clustering_coefficient"],
+    ),
+    # weighted clustering coefficient for the nodes, and average for the graph
+    "clustering_coefficient_weighted": (
+        lambda G, v, p: nx.clustering(v["G_undir"], weight="length"),
+        ["G_undir"],
+    ),
+    "clustering_coefficient_weighted_avg": (
+        lambda G, v, p: _mean(v["clustering_coefficient_weighted"]),
+        ["clustering_coefficient_weighted"],
+    ),
+    # pagerank: a ranking of the nodes in the graph based on the structure of
+    # the incoming links
+    "pagerank": (lambda G, v, p: nx.pagerank(v["G_dir"], weight="length"), ["G_dir"]),
+    # node with the highest page rank, and its value
+    "pagerank_max_node": (
+        lambda G, v, p: max(v["pagerank"], key=lambda x: v["pagerank"][x]),
+        ["pagerank"],
+    ),
+    "pagerank_max": (
+        lambda G, v, p: v["pagerank"][v["pagerank_max_node"]],
+        ["pagerank", "pagerank_max_node"],
+    ),
+    # node with the lowest page rank, and its value
+    "pagerank_min_node": (
+        lambda G, v, p: min(v["pagerank"], key=lambda x: v["pagerank"][x]),
+        ["pagerank"],
+    ),
+    "pagerank_min": (
+        lambda G, v, p: v["pagerank"][v["pagerank_min_node"]],
+        ["pagerank", "pagerank_min_node"],
+    ),
+    # node connectivity is the minimum number of nodes that must be removed to
+    # disconnect G or render it trivial
+    "node_connectivity": (lambda G, v, p: nx.node_connectivity(v["G_strong"]), ["G_strong"]),
+    # mean number of internally node-disjoint paths between each pair of nodes
+    # in G, i.e., the expected number of nodes that must be removed to
+    # disconnect a randomly selected pair of non-adjacent nodes
+    "node_connectivity_avg": (lambda G, v, p: nx.average_node_connectivity(G), []),
+    # edge connectivity is equal to the minimum number of edges that must be
+    # removed to disconnect G or render it trivial
+    "edge_connectivity": (lambda G, v, p: nx.edge_connectivity(v["G_strong"]), ["G_strong"]),
+    # eccentricity of a node v is the maximum distance from v to all other
+    # nodes in G, calculated from a shortest path search from each node without
+    # keeping all their path lengths in memory
+    "eccentricity": (
+        lambda G, v, p: centrality.eccentricity(v["G_strong"], weight="length", cpus=p["cpus"]),
+        ["G_strong"],
+    ),
+    # diameter is the maximum eccentricity
+    "diameter": (
+        lambda G, v, p: nx.diameter(v["G_strong"], e=v["eccentricity"]),
+        ["G_strong", "eccentricity"],
+    ),
+    # radius is the minimum eccentricity
+    "radius": (
+        lambda G, v, p: nx.radius(v["G_strong"], e=v["eccentricity"]),
+        ["G_strong", "eccentricity"],
+    ),
+    # center is the set of nodes with eccentricity equal to radius
+    "center": (
+        lambda G, v, p: nx.center(v["G_strong"], e=v["eccentricity"]),
+        ["G_strong", "eccentricity"],
+    ),
+    # periphery is the set of nodes with eccentricity equal to the diameter
+    "periphery": (
+        lambda G, v, p: nx.periphery(v["G_strong"], e=v["eccentricity"]),
+        ["G_strong", "eccentricity"],
+    ),
+    # closeness centrality of a node is the reciprocal of the sum of the
+    # shortest path distances from u to all other nodes
+    "closeness_centrality": (lambda G, v, p: v["centralities"]["closeness"][0], ["centralities"]),
+    "closeness_centrality_avg": (
+        lambda G, v, p: _mean(v["closeness_centrality"]),
+        ["closeness_centrality"],
+    ),
+    # betweenness centrality of a node is the sum of the fraction of all-pairs
+    # shortest paths that pass through node
+    "betweenness_centrality": (
+        lambda G, v, p: v["centralities"]["betweenness"][0],
+        ["centralities"],
+    ),
+    "betweenness_centrality_avg": (
+        lambda G, v, p: _mean(v["betweenness_centrality"]),
+        ["betweenness_centrality"],
+    ),
+}
+
+# each graph's cached extended stats, with the graph's version stamp when they
+# were calculated
+_extended_stats_cache = weakref.WeakKeyDictionary()
+
+
+def extended_stats(
+    G,
+    connectivity=False,
+    anc=False,
+    ecc=False,
+    bc=False,
+    cc=False,
+    cpus=1,
+    k=None,
+    seed=None,
+    metrics=None,
+    return_timings=False,
+):
     """
     Calculate extended topological stats and metrics for a graph.
 
@@ -245,7 +1022,14 @@ def extended_stats(G, connectivity=False, anc=False, ecc=False, bc=False, cc=Fal
     topological analysis of large complex networks is extremely time consuming
     and may exhaust computer memory. Consider using function arguments to not
     run metrics that require computation of a full matrix of paths if they
-    will not be needed.
+    will not be needed, or pass `metrics` to calculate only those metrics
+    (and whatever they depend on).
+
+    Results are cached for as long as the graph exists, and reused by later
+    calls unless the graph's nodes, edges, or edge lengths have changed since.
+    Each call returns copies of the cached results, so modifying them does
+    not affect later calls. Centralities estimated from a random sample of
+    sources (i.e., with k but without a seed) are never cached.
 
     Parameters
     ----------
@@ -262,12 +1046,29 @@ def extended_stats(G, connectivity=False, anc=False, ecc=False, bc=False, cc=Fal
         if True, calculate node betweenness centrality
     cc : bool
         if True, calculate node closeness centrality
+    cpus : int
+        how many processes to calculate eccentricity and betweenness and
+        closeness centrality with, in parallel. if None, use all available
+        CPUs
+    k : int
+        if not None, estimate betweenness and closeness centrality from
+        shortest paths from this many randomly sampled source nodes. see the
+        centrality module to also get their standard errors
+    seed : int
+        seed for the random sample of source nodes
+    metrics : list
+        if not None, calculate only these metrics, named as in the returned
+        dict, and ignore the connectivity, anc, ecc, bc, and cc arguments
+    return_timings : bool
+        if True, also return a dict of how many seconds it took to calculate
+        each metric and intermediate graph that was not already cached
 
     Returns
     -------
-    stats : dict
+    stats or (stats, timings) : dict or tuple of dicts
         dictionary of network measures containing the following elements (some
-        only calculated/returned optionally, based on passed parameters):
+        only calculated/returned optionally, based on passed parameters), and
+        optionally a dictionary of timings:
 
           - avg_neighbor_degree
           - avg_neighbor_degree_avg
@@ -298,137 +1099,173 @@ def extended_stats(G, connectivity=False, anc=False, ecc=False, bc=False, cc=Fal
           - betweenness_centrality_avg
 
     """
-    stats = {}
+    if metrics is None:
+        metrics = _get_default_metrics(connectivity, anc, ecc, bc, cc)
+    for metric in metrics:
+        if metric not in _EXTENDED_STATS or metric in _INTERMEDIATES:
+            raise ValueError(f'Unknown metric "{metric}"')
 
-    # create a DiGraph from the MultiDiGraph, for those metrics that require it
-    G_dir = nx.DiGraph(G)
+    # get this graph's cached stats, unless it has changed since they were
+    # calculated
+    stamp = _get_version_stamp(G)
+    cached_stamp, cache = _extended_stats_cache.get(G, (None, {}))
+    if cached_stamp != stamp:
+        cache = {}
+        _extended_stats_cache[G] = (stamp, cache)
 
-    # create an undirected Graph from the MultiDiGraph, for those metrics that
-    # require it
-    G_undir = nx.Graph(G)
+    def get_cache_key(name):
+        # stats from sampled shortest path searches depend on the sample, so
+        # don't cache them at all if it is unseeded (key None)
+        if name in _SAMPLED_STATS:
+            return (name, k, seed) if k is None or seed is not None else None
+        return name
 
-    # get the largest strongly connected component, for those metrics that
-    # require strongly connected graphs
-    G_strong = utils_graph.get_largest_component(G, strongly=True)
-
-    # average degree of the neighborhood of each node, and average for the graph
-    avg_neighbor_degree = nx.average_neighbor_degree(G)
-    stats["avg_neighbor_degree"] = avg_neighbor_degree
-    stats["avg_neighbor_degree_avg"] = sum(avg_neighbor_degree.values()) / len(avg_neighbor_degree)
-
-    # average weighted degree of the neighborhood of each node, and average for
-    # the graph
-    avg_wtd_nbr_deg = nx.average_neighbor_degree(G, weight="length")
-    stats["avg_weighted_neighbor_degree"] = avg_wtd_nbr_deg
-    stats["avg_weighted_neighbor_degree_avg"] = sum(avg_wtd_nbr_deg.values()) / len(avg_wtd_nbr_deg)
+    # only run the shortest path searches for the centralities that are needed
+    needed = _get_dependencies(metrics)
+    params = {"cpus": cpus, "k": k, "seed": seed}
+    for name, param in (("betweenness_centrality", "bc"), ("closeness_centrality", "cc")):
+        params[param] = name in needed and get_cache_key(name) not in cache
 
-    # degree centrality for a node is the fraction of nodes it is connected to
-    degree_centrality = nx.degree_centrality(G)
-    stats["degree_centrality"] = degree_centrality
-    stats["degree_centrality_avg"] = sum(degree_centrality.values()) / len(degree_centrality)
+    # calculate each metric after the values it depends on, reusing cached
+    # stats and sharing intermediate values between metrics
+    values = {}
+    timings = {}
 
-    # calculate clustering coefficient for the nodes
-    stats["clustering_coefficient"] = nx.clustering(G_undir)
+    def calculate(name):
+        if name in values:
+            return
+        cache_key = get_cache_key(name)
+        if cache_key in cache:
+            values[name] = cache[cache_key]
+            return
+        func, dependencies = _EXTENDED_STATS[name]
+        for dependency in dependencies:
+            calculate(dependency)
+        start_time = time.time()
+        values[name] = func(G, values, params)
+        timings[name] = time.time() - start_time
+        utils.log(f"Calculated {name} in {timings[name]:,.2f} seconds")
+        if name not in _INTERMEDIATES and cache_key is not None:
+            cache[cache_key] = values[name]
 
-    # average clustering coefficient for the graph
-    stats["clustering_coefficient_avg"] = nx.average_clustering(G_undir)
+    for metric in metrics:
+        calculate(metric)
 
-    # calculate weighted clustering coefficient for the nodes
-    stats["clustering_coefficient_weighted"] = nx.clustering(G_undir, weight="length")
+    # return copies of the (cached) dicts and lists so callers can't modify
+    # the cache
+    stats = {metric: copy.copy(values[metric]) for metric in metrics}
 
-    # average clustering coefficient (weighted) for the graph
-    stats["clustering_coefficient_weighted_avg"] = nx.average_clustering(G_undir, weight="length")
+    utils.log("Calculated extended stats")
+    return (stats, timings) if return_timings else stats
 
-    # pagerank: a ranking of the nodes in the graph based on the structure of
-    # the incoming links
-    pagerank = nx.pagerank(G_dir, weight="length")
-    stats["pagerank"] = pagerank
 
-    # node with the highest page rank, and its value
-    pagerank_max_node = max(pagerank, key=lambda x: pagerank[x])
-    stats["pagerank_max_node"] = pagerank_max_node
-    stats["pagerank_max"] = pagerank[pagerank_max_node]
+def _get_default_metrics(connectivity, anc, ecc, bc, cc):
+    """
+    Get the names of the extended stats to calculate by default.
 
-    # node with the lowest page rank, and its value
-    pagerank_min_node = min(pagerank, key=lambda x: pagerank[x])
-    stats["pagerank_min_node"] = pagerank_min_node
-    stats["pagerank_min"] = pagerank[pagerank_min_node]
+    Parameters
+    ----------
+    connectivity : bool
+        if True, include node and edge connectivity
+    anc : bool
+        if True, include average node connectivity
+    ecc : bool
+        if True, include eccentricity and the metrics that use it
+    bc : bool
+        if True, include node betweenness centrality
+    cc : bool
+        if True, include node closeness centrality
 
-    # if True, calculate node and edge connectivity
+    Returns
+    -------
+    metrics : list
+    """
+    metrics = [
+        "avg_neighbor_degree",
+        "avg_neighbor_degree_avg",
+        "avg_weighted_neighbor_degree",
+        "avg_weighted_neighbor_degree_avg",
+        "degree_centrality",
+        "degree_centrality_avg",
+        "clustering_coefficient",
+        "clustering_coefficient_avg",
+        "clustering_coefficient_weighted",
+        "clustering_coefficient_weighted_avg",
+        "pagerank",
+        "pagerank_max_node",
+        "pagerank_max",
+        "pagerank_min_node",
+        "pagerank_min",
+    ]
     if connectivity:
+        metrics += ["node_connectivity", "edge_connectivity"]
+    if anc:
+        metrics += ["node_connectivity_avg"]
+    if ecc:
+        metrics += ["eccentricity", "diameter", "radius", "center", "periphery"]
+    if cc:
+        metrics += ["closeness_centrality", "closeness_centrality_avg"]
+    if bc:
+        metrics += ["betweenness_centrality", "betweenness_centrality_avg"]
+    return metrics
 
-        # node connectivity is the minimum number of nodes that must be removed
-        # to disconnect G or render it trivial
-        stats["node_connectivity"] = nx.node_connectivity(G_strong)
 
-        # edge connectivity is equal to the minimum number of edges that must be
-        # removed to disconnect G or render it trivial
-        stats["edge_connectivity"] = nx.edge_connectivity(G_strong)
-        utils.log("Calculated node and edge connectivity")
+def _get_dependencies(metrics):
+    """
+    Get the names of metrics and all the values they depend on.
 
-    # if True, calculate average node connectivity
-    if anc:
-        # mean number of internally node-disjoint paths between each pair of
-        # nodes in G, i.e., the expected number of nodes that must be removed to
-        # disconnect a randomly selected pair of non-adjacent nodes
-        stats["node_connectivity_avg"] = nx.average_node_connectivity(G)
-        utils.log("Calculated average node connectivity")
-
-    # if True, calculate shortest paths, eccentricity, and topological metrics
-    # that use eccentricity
-    if ecc:
-        # precompute shortest paths between all nodes for eccentricity-based
-        # stats
-        sp = {
-            source: dict(nx.single_source_dijkstra_path_length(G_strong, source, weight="length"))
-            for source in G_strong.nodes()
-        }
+    Parameters
+    ----------
+    metrics : list
+        names of extended stats
 
-        utils.log("Calculated shortest path lengths")
+    Returns
+    -------
+    names : set
+        names of the metrics and the values they depend on, recursively
+    """
+    names = set()
+    to_visit = list(metrics)
+    while to_visit:
+        name = to_visit.pop()
+        if name not in names:
+            names.add(name)
+            to_visit.extend(_EXTENDED_STATS[name][1])
+    return names
 
-        # eccentricity of a node v is the maximum distance from v to all other
-        # nodes in G
-        eccentricity = nx.eccentricity(G_strong, sp=sp)
-        stats["eccentricity"] = eccentricity
 
-        # diameter is the maximum eccentricity
-        diameter = nx.diameter(G_strong, e=eccentricity)
-        stats["diameter"] = diameter
+def _get_version_stamp(G):
+    """
+    Get a stamp of the graph's nodes, edges, and edge lengths.
 
-        # radius is the minimum eccentricity
-        radius = nx.radius(G_strong, e=eccentricity)
-        stats["radius"] = radius
+    The stamp changes whenever nodes or edges are added or removed or edge
+    lengths change, so cached stats calculated from them can be invalidated.
 
-        # center is the set of nodes with eccentricity equal to radius
-        center = nx.center(G_strong, e=eccentricity)
-        stats["center"] = center
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
 
-        # periphery is the set of nodes with eccentricity equal to the diameter
-        periphery = nx.periphery(G_strong, e=eccentricity)
-        stats["periphery"] = periphery
+    Returns
+    -------
+    stamp : int
+    """
+    nodes = tuple(G.nodes)
+    edges = tuple((u, v, k, d.get("length")) for u, v, k, d in G.edges(keys=True, data=True))
+    return hash((nodes, edges))
 
-    # if True, calculate node closeness centrality
-    if cc:
-        # closeness centrality of a node is the reciprocal of the sum of the
-        # shortest path distances from u to all other nodes
-        closeness_centrality = nx.closeness_centrality(G, distance="length")
-        stats["closeness_centrality"] = closeness_centrality
-        stats["closeness_centrality_avg"] = sum(closeness_centrality.values()) / len(
-            closeness_centrality
-        )
-        utils.log("Calculated closeness centrality")
 
-    # if True, calculate node betweenness centrality
-    if bc:
-        # betweenness centrality of a node is the sum of the fraction of
-        # all-pairs shortest paths that pass through node
-        # networkx 2.4+ implementation cannot run on Multi(Di)Graphs, so use DiGraph
-        betweenness_centrality = nx.betweenness_centrality(G_dir, weight="length")
-        stats["betweenness_centrality"] = betweenness_centrality
-        stats["betweenness_centrality_avg"] = sum(betweenness_centrality.values()) / len(
-            betweenness_centrality
-        )
-        utils.log("Calculated betweenness centrality")
+def _mean(values):
+    """
+    Get the mean of a dict's values.
 
-    utils.log("Calculated extended stats")
-    return stats
+    Parameters
+    ----------
+    values : dict
+        dict of numeric values
+
+    Returns
+    -------
+    mean : float
+    """
+    return sum(values.values()) / len(values)
@@ -1,14 +1,10 @@
 """Graph utility functions."""
 
-from collections import Counter
-from itertools import chain
-
 import geopandas as gpd
 import networkx as nx
 import numpy as np
 import pandas as pd
 from shapely.geometry import LineString
-from shapely.geometry import Point
 
 from . import distance
 from . import utils
@@ -47,9 +43,10 @@ def graph_to_gdfs(G, nodes=True, edges=True, node_geometry=True, fill_edge_geome
         nodes, data = zip(*G.nodes(data=True))
 
         if node_geometry:
-            # convert node x/y attributes to Points for geometry column
-            geom = map(lambda d: Point(d["x"], d["y"]), data)
-            gdf_nodes = gpd.GeoDataFrame(data, index=nodes, crs=crs, geometry=list(geom))
+            # convert node x/y attributes to Points for geometry column, in
+            # one call from the nodes' coordinate arrays
+            geom = gpd.points_from_xy([d["x"] for d in data], [d["y"] for d in data])
+            gdf_nodes = gpd.GeoDataFrame(data, index=nodes, crs=crs, geometry=geom)
         else:
             gdf_nodes = gpd.GeoDataFrame(data, index=nodes, crs=crs)
 
@@ -62,19 +59,13 @@ def graph_to_gdfs(G, nodes=True, edges=True, node_geometry=True, fill_edge_geome
 
         if fill_edge_geometry:
 
-            x_lookup = nx.get_node_attributes(G, "x")
-            y_lookup = nx.get_node_attributes(G, "y")
-
-            # function to get geometry for every edge: if edge already has
-            # geometry return it, otherwise create it using the incident nodes
-            def make_geom(u, v, data, x=x_lookup, y=y_lookup):
-                if "geometry" in data:
-                    return data["geometry"]
-                else:
-                    return LineString((Point((x[u], y[u])), Point((x[v], y[v]))))
-
-            geom = map(make_geom, u, v, data)
-            gdf_edges = gpd.GeoDataFrame(data, crs=crs, geometry=list(geom))
+            # if edge already has geometry keep it, otherwise create it as a
+            # straight line between the incident nodes
+            geom = [d.get("geometry") for d in data]
+            missing = [i for i, d in enumerate(data) if "geometry" not in d]
+            for i, line in zip(missing, _make_straight_lines(G, u, v, missing)):
+                geom[i] = line
+            gdf_edges = gpd.GeoDataFrame(data, crs=crs, geometry=geom)
 
         else:
             gdf_edges = gpd.GeoDataFrame(data, crs=crs)
@@ -97,6 +88,163 @@ def graph_to_gdfs(G, nodes=True, edges=True, node_geometry=True, fill_edge_geome
         return to_return[0]
 
 
+def _make_straight_lines(G, u, v, positions):
+    """
+    Make straight LineStrings between edges' incident nodes.
+
+    Gathers the edges' endpoint coordinates from arrays of node coordinates,
+    rather than looking up each node's attribute dict per edge.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    u : list-like
+        every edge's origin node
+    v : list-like
+        every edge's destination node
+    positions : list
+        positions (in u and v) of the edges to make LineStrings for
+
+    Returns
+    -------
+    lines : list
+        list of shapely.geometry.LineString
+    """
+    if len(positions) < 1:
+        return []
+
+    node_pos = {node: i for i, node in enumerate(G.nodes)}
+    xy = np.array([(x, y) for (_, x), (_, y) in zip(G.nodes(data="x"), G.nodes(data="y"))])
+    u_xy = xy[[node_pos[u[i]] for i in positions]]
+    v_xy = xy[[node_pos[v[i]] for i in positions]]
+    return [LineString(coords) for coords in np.stack((u_xy, v_xy), axis=1)]
+
+
+def graph_to_dfs(G, nodes=True, edges=True, node_attrs=None, edge_attrs=None):
+    """
+    Convert a graph's node and/or edge attributes to DataFrames.
+
+    Unlike graph_to_gdfs, this creates no geometries at all, so it is a cheap
+    way to get tables of just the attributes a caller needs.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    nodes : bool
+        if True, convert graph nodes to a DataFrame and return it
+    edges : bool
+        if True, convert graph edges to a DataFrame and return it
+    node_attrs : list
+        the node attributes to include as columns. if None, include every
+        node attribute. a column is only created if at least one node has
+        that attribute
+    edge_attrs : list
+        the edge attributes to include as columns (plus u, v, and key). if
+        None, include every edge attribute except geometry. a column is only
+        created if at least one edge has that attribute
+
+    Returns
+    -------
+    pandas.DataFrame or tuple
+        df_nodes or df_edges or tuple of (df_nodes, df_edges)
+    """
+    if not (nodes or edges):
+        raise ValueError("You must request nodes or edges, or both.")
+
+    to_return = []
+
+    # graphs without nodes or edges give empty DataFrames
+    if nodes:
+        nodes, data = zip(*G.nodes(data=True)) if len(G) > 0 else ((), ())
+        df_nodes = _attr_dicts_to_df(data, node_attrs, index=nodes)
+        to_return.append(df_nodes)
+
+    if edges:
+        if G.number_of_edges() > 0:
+            u, v, k, data = zip(*G.edges(keys=True, data=True))
+        else:
+            u, v, k, data = (), (), (), ()
+        if edge_attrs is None:
+            attrs = (attr for d in data for attr in d if attr != "geometry")
+            edge_attrs = list(dict.fromkeys(attrs))
+        df_edges = _attr_dicts_to_df(data, edge_attrs)
+        df_edges["u"] = u
+        df_edges["v"] = v
+        df_edges["key"] = k
+        to_return.append(df_edges)
+
+    if len(to_return) > 1:
+        return tuple(to_return)
+    else:
+        return to_return[0]
+
+
+def _attr_dicts_to_df(data, attrs=None, index=None):
+    """
+    Convert a sequence of attribute dicts into a DataFrame of some attributes.
+
+    Parameters
+    ----------
+    data : tuple
+        the attribute dicts
+    attrs : list
+        the attributes to include as columns. if None, include all of them
+    index : list-like
+        the index of the DataFrame
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if attrs is None:
+        return pd.DataFrame(data, index=index)
+
+    columns = {}
+    for attr in attrs:
+        # only create a column if at least one dict has this attribute
+        if any(attr in d for d in data):
+            columns[attr] = [d.get(attr, np.nan) for d in data]
+    return pd.DataFrame(columns, index=index if index is not None else range(len(data)))
+
+
+def get_graph_bounds(G):
+    """
+    Get the bounding box of a graph's nodes and edge geometries.
+
+    This computes the bounds from the node coordinates and any existing edge
+    geometries' bounds, without creating any new geometries.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+
+    Returns
+    -------
+    tuple
+        (north, south, east, west)
+    """
+    if len(G) < 1:
+        raise ValueError("Graph must have at least one node to get its bounds")
+
+    xs = np.array([x for _, x in G.nodes(data="x")], dtype=float)
+    ys = np.array([y for _, y in G.nodes(data="y")], dtype=float)
+    west, south, east, north = xs.min(), ys.min(), xs.max(), ys.max()
+
+    # curved edge geometries may extend beyond their incident nodes
+    bounds = [g.bounds for _, _, g in G.edges(data="geometry") if g is not None]
+    if len(bounds) > 0:
+        bounds = np.array(bounds)
+        west = min(west, bounds[:, 0].min())
+        south = min(south, bounds[:, 1].min())
+        east = max(east, bounds[:, 2].max())
+        north = max(north, bounds[:, 3].max())
+
+    return north, south, east, west
+
+
 def graph_from_gdfs(gdf_nodes, gdf_edges, graph_attrs=None):
     """
     Convert node and edge GeoDataFrames into a MultiDiGraph.
@@ -119,20 +267,54 @@ def graph_from_gdfs(gdf_nodes, gdf_edges, graph_attrs=None):
         graph_attrs = {"crs": gdf_nodes.crs}
     G = nx.MultiDiGraph(**graph_attrs)
 
-    # add the nodes then each node's non-null attributes
-    G.add_nodes_from(gdf_nodes.index)
-    for col in gdf_nodes.columns:
-        nx.set_node_attributes(G, name=col, values=gdf_nodes[col].dropna())
+    # add the nodes and their non-null attributes
+    node_attrs = _non_null_attr_dicts(gdf_nodes, gdf_nodes.columns)
+    G.add_nodes_from(zip(gdf_nodes.index, node_attrs))
 
     # add each edge and its non-null attributes
-    for (u, v, k), row in gdf_edges.set_index(["u", "v", "key"]).iterrows():
-        d = {label: val for label, val in row.items() if isinstance(val, list) or pd.notnull(val)}
-        G.add_edge(u, v, k, **d)
+    attr_cols = [col for col in gdf_edges.columns if col not in {"u", "v", "key"}]
+    edge_attrs = _non_null_attr_dicts(gdf_edges, attr_cols)
+    G.add_edges_from(
+        zip(gdf_edges["u"].tolist(), gdf_edges["v"].tolist(), gdf_edges["key"].tolist(), edge_attrs)
+    )
 
     utils.log("Created graph from node/edge GeoDataFrames")
     return G
 
 
+def _non_null_attr_dicts(df, columns):
+    """
+    Convert each row of a DataFrame into a dict of its non-null values.
+
+    Works column by column rather than row by row: each column's non-null
+    values are extracted in bulk (as python objects) then distributed into
+    the rows' dicts (converted to python objects if they are stored in
+    pandas extension arrays). List values are always considered non-null.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        the DataFrame to convert
+    columns : list
+        the columns to include in the dicts
+
+    Returns
+    -------
+    attr_dicts : list
+        list of dicts, one per row, of column name to non-null value
+    """
+    attr_dicts = [{} for _ in range(len(df))]
+    for col in columns:
+        values = df[col]
+        positions = np.flatnonzero(pd.notnull(values.values))
+        values = values.iloc[positions]
+        if pd.api.types.is_extension_array_dtype(values.dtype):
+            values = values.astype(object)
+        for pos, val in zip(positions, values.tolist()):
+            attr_dicts[pos][col] = val
+    return attr_dicts
+
+
 def induce_subgraph(G, node_subset):
     """
     Induce a subgraph of G.
@@ -291,48 +473,65 @@ def count_streets_per_node(G, nodes=None):
         counts of how many streets emanate from each node with
         keys=node id and values=count
     """
-    # to calculate the counts, get undirected representation of the graph. for
-    # each node, get the list of the set of unique u,v,key edges, including
-    # parallel edges but excluding self-loop parallel edges (this is necessary
-    # because bi-directional self-loops will appear twice in the undirected
-    # graph as you have u,v,key0 and u,v,key1 where u==v when you convert from
-    # MultiDiGraph to MultiGraph - BUT, one-way self-loops will appear only
-    # once. to get consistent accurate counts of physical streets, ignoring
-    # directionality, we need the list of the set of unique edges...). then,
-    # count how many times the node appears in the u,v tuples in the list. this
-    # is the count of how many street segments emanate from this node. finally,
-    # create a dict of node id:count
-    G_undir = G.to_undirected(reciprocal=False)
-    all_edges = G_undir.edges(keys=False)
+    # to calculate the counts, get the unique undirected edges without making an
+    # undirected copy of the graph: each (u, v, key) edge collapses with its
+    # reciprocal (v, u, key) edge, but parallel edges with different keys are
+    # kept. self-loops are counted once per node regardless of key, because
+    # bi-directional self-loops would otherwise be double-counted while one-way
+    # self-loops would not. then count how many times each node appears as an
+    # endpoint of these edges: this is the count of how many street segments
+    # emanate from this node (a self-loop counts twice). finally, create a dict
+    # of node id:count
+    positions = {node: i for i, node in enumerate(G.nodes)}
+    edges = [(positions[u], positions[v], k) for u, v, k in G.edges(keys=True)]
+    edges = pd.DataFrame.from_records(edges, columns=["u", "v", "key"])
+    u = edges["u"].to_numpy(dtype=int)
+    v = edges["v"].to_numpy(dtype=int)
+    counts = _count_streets(u, v, edges["key"], len(positions))
+    counts = dict(zip(positions, counts.tolist()))
+
     if nodes is None:
-        nodes = G_undir.nodes()
+        nodes = G.nodes
+    streets_per_node = {node: counts.get(node, 0) for node in nodes}
+    utils.log("Counted undirected street segments incident to each node")
+    return streets_per_node
 
-    # get all unique edges - this throws away any parallel edges (including
-    # those in self-loops)
-    all_unique_edges = set(all_edges)
 
-    # get all edges (including parallel edges) that are not self-loops
-    non_self_loop_edges = [e for e in all_edges if not e[0] == e[1]]
+def _count_streets(u_pos, v_pos, keys, n):
+    """
+    Count how many street segments emanate from each node, from edge arrays.
 
-    # get a single copy of each self-loop edge (ie, if it's bi-directional, we
-    # ignore the parallel edge going the reverse direction and keep only one
-    # copy)
-    set_non_self_loop_edges = set(non_self_loop_edges)
-    self_loop_edges = [e for e in all_unique_edges if e not in set_non_self_loop_edges]
+    See count_streets_per_node for how the street segments are counted.
 
-    # final list contains all unique edges, including each parallel edge, unless
-    # the parallel edge is a self-loop, in which case it doesn't double-count
-    # the self-loop
-    edges = non_self_loop_edges + self_loop_edges
+    Parameters
+    ----------
+    u_pos : numpy.ndarray
+        each edge's u node's position in the nodes
+    v_pos : numpy.ndarray
+        each edge's v node's position in the nodes
+    keys : list-like
+        each edge's key
+    n : int
+        number of nodes
 
-    # flatten the list of (u,v) tuples
-    edges_flat = list(chain.from_iterable(edges))
+    Returns
+    -------
+    counts : numpy.ndarray
+        count of street segments emanating from each node, by position
+    """
+    # sort each edge's endpoints so reciprocal edges share the same (a, b, key)
+    a = np.minimum(u_pos, v_pos)
+    b = np.maximum(u_pos, v_pos)
+    is_self_loop = a == b
+    unique = ~pd.DataFrame({"a": a, "b": b, "key": keys}).duplicated().to_numpy()
+    unique_self_loops = np.unique(a[is_self_loop])
 
-    # count how often each node appears in the list of flattened edge endpoints
-    counts = Counter(edges_flat)
-    streets_per_node = {node: counts[node] for node in nodes}
-    utils.log("Counted undirected street segments incident to each node")
-    return streets_per_node
+    # count unique non-self-loop edge endpoints, plus twice for each self-loop
+    non_self_loop = unique & ~is_self_loop
+    counts = np.bincount(a[non_self_loop], minlength=n)
+    counts += np.bincount(b[non_self_loop], minlength=n)
+    counts[unique_self_loops] += 2
+    return counts
 
 
 def remove_isolated_nodes(G):
@@ -413,17 +612,13 @@ def _is_same_geometry(ls1, ls2):
     -------
     bool
     """
-    # extract geometries from each edge data dict
-    geom1 = [list(coords) for coords in ls1.xy]
-    geom2 = [list(coords) for coords in ls2.xy]
-
-    # reverse the first edge's list of x's and y's to look for a match in
-    # either order
-    geom1_r = [list(reversed(list(coords))) for coords in ls1.xy]
+    # extract the x, y coordinates from each edge's geometry
+    geom1 = [coords[:2] for coords in ls1.coords]
+    geom2 = [coords[:2] for coords in ls2.coords]
 
     # if the edge's geometry matches its reverse's geometry in either order,
     # return True
-    return geom1 == geom2 or geom1_r == geom2
+    return geom1 == geom2 or geom1[::-1] == geom2
 
 
 def _update_edge_keys(G):
@@ -446,27 +641,26 @@ def _update_edge_keys(G):
     # identify all the edges that are duplicates based on a sorted combination
     # of their origin, destination, and key. that is, edge uv will match edge vu
     # as a duplicate, but only if they have the same key
-    edges = graph_to_gdfs(G, nodes=False, fill_edge_geometry=False)
-    edges["uvk"] = edges.apply(
-        lambda row: "_".join(sorted([str(row["u"]), str(row["v"])]) + [str(row["key"])]), axis=1
-    )
-    edges["dupe"] = edges["uvk"].duplicated(keep=False)
-    dupes = edges[edges["dupe"]].dropna(subset=["geometry"])
+    uvk_edges = dict()
+    for u, v, k, data in G.edges(keys=True, data=True):
+        if data.get("geometry") is not None:
+            uvk = tuple(sorted([str(u), str(v)])) + (k,)
+            uvk_edges.setdefault(uvk, []).append((u, v, k, data["geometry"]))
 
     different_streets = []
-    groups = dupes[["geometry", "uvk", "u", "v", "key", "dupe"]].groupby("uvk")
 
     # for each set of duplicate edges
-    for _, group in groups:
+    for group in uvk_edges.values():
+        if len(group) < 2:
+            continue
+        geoms = [geom for _, _, _, geom in group]
 
         # if there are more than 2 edges here, make sure to compare all
-        if len(group["geometry"]) > 2:
-            li = group["geometry"].tolist()
-            li.append(li[0])
-            geom_pairs = list(zip(li[:-1], li[1:]))
+        if len(geoms) > 2:
+            geom_pairs = list(zip(geoms, geoms[1:] + geoms[:1]))
         # otherwise, just compare the first edge to the second edge
         else:
-            geom_pairs = [(group["geometry"].iloc[0], group["geometry"].iloc[1])]
+            geom_pairs = [(geoms[0], geoms[1])]
 
         # for each pair of edges to compare
         for geom1, geom2 in geom_pairs:
@@ -474,9 +668,7 @@ def _update_edge_keys(G):
             if not _is_same_geometry(geom1, geom2):
                 # add edge uvk, but not edge vuk, otherwise we'll iterate both their keys
                 # and they'll still duplicate each other at the end of this process
-                different_streets.append(
-                    (group["u"].iloc[0], group["v"].iloc[0], group["key"].iloc[0])
-                )
+                different_streets.append(group[0][:3])
 
     # for each unique different street, iterate its key + 1 so it's unique
     for u, v, k in set(different_streets):
@@ -512,8 +704,8 @@ def get_undirected(G):
         # add geometry if it doesn't already exist, to retain parallel
         # edges' distinct geometries
         if "geometry" not in data:
-            point_u = Point((G.nodes[u]["x"], G.nodes[u]["y"]))
-            point_v = Point((G.nodes[v]["x"], G.nodes[v]["y"]))
+            point_u = (G.nodes[u]["x"], G.nodes[u]["y"])
+            point_v = (G.nodes[v]["x"], G.nodes[v]["y"])
             data["geometry"] = LineString([point_u, point_v])
 
     # update edge keys so we don't retain only one edge of sets of parallel edges
@@ -531,7 +723,7 @@ def get_undirected(G):
     # the previous operation added all directed edges from G as undirected
     # edges in H. this means we have duplicate edges for every bi-directional
     # street. so, look through the edges and remove any duplicates
-    duplicate_edges = []
+    duplicate_edges = set()
     for u, v, key, data in H.edges(keys=True, data=True):
 
         # if we haven't already flagged this edge as a duplicate
@@ -549,7 +741,7 @@ def get_undirected(G):
                     if _is_duplicate_edge(data, data_other):
 
                         # if they match up, flag the duplicate for removal
-                        duplicate_edges.append((u, v, key_other))
+                        duplicate_edges.add((u, v, key_other))
 
     H.remove_edges_from(duplicate_edges)
     utils.log("Made undirected graph")
@@ -557,53 +749,91 @@ def get_undirected(G):
     return H
 
 
-def add_edge_lengths(G):
+def add_edge_lengths(G, use_geometry=False):
     """
     Add length (meters) attribute to each edge.
 
-    Calculate via great circle distance between nodes u and v.
+    Calculate via great circle distance between nodes u and v, or, if
+    use_geometry is True, as the sum of the great circle distances between
+    consecutive coordinates of each edge's geometry (if it has one).
 
     Parameters
     ----------
     G : networkx.MultiDiGraph
         input graph
+    use_geometry : bool
+        if True, measure edges along their geometries rather than straight
+        between their endpoints
 
     Returns
     -------
     G : networkx.MultiDiGraph
     """
-    # first load all the edges' origin and destination coordinates as a
-    # dataframe indexed by u, v, key
-    try:
-        coords = np.array(
-            [
-                (u, v, k, G.nodes[u]["y"], G.nodes[u]["x"], G.nodes[v]["y"], G.nodes[v]["x"])
-                for u, v, k in G.edges(keys=True)
-            ]
-        )
-    except KeyError:  # pragma: no cover
-        missing_nodes = {
-            str(i)
-            for u, v, _ in G.edges(keys=True)
-            if not (G.nodes[u] or G.nodes[u])
-            for i in (u, v)
-            if not G.nodes[i]
-        }
-        missing_str = ", ".join(missing_nodes)
-        raise KeyError(f"Edge(s) missing nodes {missing_str} possibly due to clipping issue")
-
-    df_coords = pd.DataFrame(coords, columns=["u", "v", "k", "u_y", "u_x", "v_y", "v_x"])
-    df_coords[["u", "v", "k"]] = df_coords[["u", "v", "k"]].astype(np.int64)
-    df_coords = df_coords.set_index(["u", "v", "k"])
+    edges, segments, segment_edges = _get_edge_segments(G, use_geometry)
 
-    # then calculate the great circle distance with the vectorized function
-    gc_distances = distance.great_circle_vec(
-        lat1=df_coords["u_y"], lng1=df_coords["u_x"], lat2=df_coords["v_y"], lng2=df_coords["v_x"]
-    )
+    # calculate the great circle distances with the vectorized function,
+    # then sum each edge's segments
+    x1, y1, x2, y2 = segments.T
+    lengths = distance.great_circle_vec(lat1=y1, lng1=x1, lat2=y2, lng2=x2)
+    lengths = np.bincount(segment_edges, weights=np.nan_to_num(lengths), minlength=len(edges))
 
-    # fill nulls with zeros and round to the millimeter
-    gc_distances = gc_distances.fillna(value=0).round(3)
-    nx.set_edge_attributes(G, name="length", values=gc_distances.to_dict())
+    # round to the millimeter
+    values = dict(zip(edges, lengths.round(3).tolist()))
+    nx.set_edge_attributes(G, name="length", values=values)
 
     utils.log("Added edge lengths to graph")
     return G
+
+
+def _get_edge_segments(G, use_geometry=False):
+    """
+    Get the straight line segments making up each edge as a single array.
+
+    Each edge is one segment from its u node to its v node, or, if
+    use_geometry is True and it has a geometry attribute, one segment between
+    each pair of consecutive geometry coordinates.
+
+    Parameters
+    ----------
+    G : networkx.MultiDiGraph
+        input graph
+    use_geometry : bool
+        if True, split edges with geometries into their segments
+
+    Returns
+    -------
+    edges, segments, segment_edges : tuple
+        edges is a list of (u, v, key) tuples, segments is an array of shape
+        (s, 4) of each segment's x1, y1, x2, y2 coordinates, and
+        segment_edges is an array of the position in edges of each
+        segment's edge
+    """
+    try:
+        xy = {node: (data["x"], data["y"]) for node, data in G.nodes(data=True)}
+    except KeyError:  # pragma: no cover
+        missing_nodes = {str(node) for node, data in G.nodes(data=True) if "x" not in data}
+        missing_str = ", ".join(missing_nodes)
+        raise KeyError(f"Edge(s) missing nodes {missing_str} possibly due to clipping issue")
+
+    if not use_geometry:
+        edges = list(G.edges(keys=True))
+        segments = np.array([xy[u] + xy[v] for u, v, _ in edges], dtype=float).reshape(-1, 4)
+        return edges, segments, np.arange(len(edges))
+
+    # gather every edge's coordinates into one array
+    edges = []
+    coords = []
+    counts = []
+    for u, v, k, geom in G.edges(keys=True, data="geometry"):
+        points = [xy[u], xy[v]] if geom is None else [point[:2] for point in geom.coords]
+        edges.append((u, v, k))
+        coords.extend(points)
+        counts.append(len(points))
+    coords = np.array(coords, dtype=float).reshape(-1, 2)
+
+    # each pair of consecutive coordinates is a segment, unless they belong
+    # to two different edges
+    point_edges = np.repeat(np.arange(len(edges)), counts)
+    is_segment = point_edges[:-1] == point_edges[1:]
+    segments = np.hstack((coords[:-1], coords[1:]))[is_segment].reshape(-1, 4)
+    return edges, segments, point_edges[:-1][is_segment]
@@ -78,5 +78,7 @@ setup(
         "folium": ["folium>=0.11"],
         "kdtree": ["scipy>=1.4"],
         "balltree": ["scikit-learn>=0.23"],
+        "geoparquet": ["pyarrow>=1.0"],
+        "raster": ["rasterio>=1.1"],
     },
 )
@@ -12,13 +12,20 @@ import logging as lg
 import os
 import shutil
 import tempfile
+import threading
+import time
 from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
 
 import folium
 import networkx as nx
 import numpy as np
 import pandas as pd
 import pytest
+import rasterio
 from shapely import wkt
 from shapely.geometry import LineString
 from shapely.geometry import MultiLineString
@@ -136,6 +143,332 @@ def test_graph_from_xml():
 
     os.remove(temp_filename)
 
+    # convert graph to node/edge GeoDataFrames and back again
+    gdf_nodes, gdf_edges = ox.graph_to_gdfs(G, fill_edge_geometry=False)
+    G2 = ox.graph_from_gdfs(gdf_nodes, gdf_edges, graph_attrs=G.graph)
+    assert set(G2.edges(keys=True)) == set(G.edges(keys=True))
+    for u, v, k, data in G.edges(keys=True, data=True):
+        assert G2.edges[u, v, k] == data
+
+    # get attribute tables and bounds without creating any geometries
+    df_nodes, df_edges = ox.utils_graph.graph_to_dfs(G, edge_attrs=["length", "oneway"])
+    assert list(df_edges.columns) == ["length", "oneway", "u", "v", "key"]
+    assert len(df_nodes) == len(G)
+    west, south, east, north = ox.graph_to_gdfs(G, nodes=False).total_bounds
+    assert ox.utils_graph.get_graph_bounds(G) == (north, south, east, west)
+
+    # graphs without edges or nodes give empty tables, and no bounds
+    G = nx.MultiDiGraph(crs=ox.settings.default_crs)
+    df_nodes, df_edges = ox.utils_graph.graph_to_dfs(G, edge_attrs=["length"])
+    assert len(df_nodes) == 0 and len(df_edges) == 0
+    assert list(df_edges.columns) == ["u", "v", "key"]
+    with pytest.raises(ValueError):
+        ox.utils_graph.get_graph_bounds(G)
+    G.add_node(1, x=-122.3, y=37.8)
+    assert len(ox.utils_graph.graph_to_dfs(G, nodes=False)) == 0
+    assert ox.utils_graph.get_graph_bounds(G) == (37.8, 37.8, -122.3, -122.3)
+    G = ox.add_edge_travel_times(ox.add_edge_speeds(G))
+    assert len(G.edges) == 0
+
+
+def test_project_graph():
+    # test projecting a graph to UTM and back to lat-lng
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2")
+    G_proj = ox.project_graph(G)
+    assert G_proj.graph["crs"].is_projected
+    assert len(G_proj) == len(G)
+    assert len(G_proj.edges) == len(G.edges)
+
+    # node lat-lng is preserved and edge geometries are projected
+    node, data = next(iter(G.nodes(data=True)))
+    assert G_proj.nodes[node]["lon"] == data["x"]
+    assert G_proj.nodes[node]["lat"] == data["y"]
+    u, v, k, geom = [e for e in G_proj.edges(keys=True, data="geometry") if e[3] is not None][0]
+    assert geom.coords[0] == (G_proj.nodes[u]["x"], G_proj.nodes[u]["y"])
+
+    # the simplified graph's edges without geometry get straight-line ones
+    u, v, k = [e for e in G.edges(keys=True, data="geometry") if e[3] is None][0][:3]
+    assert all(geom is not None for *_, geom in G_proj.edges(data="geometry"))
+    assert list(G_proj.edges[u, v, k]["geometry"].coords) == [
+        (G_proj.nodes[n]["x"], G_proj.nodes[n]["y"]) for n in (u, v)
+    ]
+
+    # the original graph is left untouched
+    assert "lon" not in data
+    assert "geometry" not in G.edges[u, v, k]
+
+    G_latlng = ox.project_graph(G_proj, to_crs=ox.settings.default_crs)
+    assert G_latlng.nodes[node]["x"] == pytest.approx(data["x"])
+    assert G_latlng.nodes[node]["y"] == pytest.approx(data["y"])
+
+    # projecting geometries between the same CRSs reuses cached transformers
+    build = ox.projection._get_thread_cache("build_transformer", ox.projection._build_transformer)
+    poly_proj, crs_utm = ox.projection.project_geometry(polygon)
+    hits = build.cache_info().hits
+    poly_latlng, _ = ox.projection.project_geometry(poly_proj, crs=crs_utm, to_latlong=True)
+    poly_proj, _ = ox.projection.project_geometry(poly_latlng)
+    assert build.cache_info().hits == hits + 2
+    assert poly_latlng.equals_exact(polygon, tolerance=1e-9)
+
+    # but transformers are never shared between threads
+    transformers = [ox.projection._get_transformer(crs_utm, ox.settings.default_crs)]
+    thread = threading.Thread(
+        target=lambda: transformers.append(
+            ox.projection._get_transformer(crs_utm, ox.settings.default_crs)
+        )
+    )
+    thread.start()
+    thread.join()
+    assert transformers[1] is not transformers[0]
+
+
+def test_edge_attributes():
+    # lengths along geometries match the simplified edges' summed lengths
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2")
+    lengths = nx.get_edge_attributes(G, "length")
+    G = ox.utils_graph.add_edge_lengths(G, use_geometry=True)
+    for edge, length in nx.get_edge_attributes(G, "length").items():
+        assert length == pytest.approx(lengths[edge], abs=0.01)
+    G = ox.utils_graph.add_edge_lengths(G)
+    assert all(G.edges[e]["length"] <= lengths[e] + 0.01 for e in G.edges)
+
+    # vectorized bearings match the scalar calculation, along edge geometries
+    # too if the edges are straight
+    G = ox.add_edge_bearings(G)
+    u, v, k, data = [e for e in G.edges(keys=True, data=True) if "geometry" not in e[3]][0]
+    origin = (G.nodes[u]["y"], G.nodes[u]["x"])
+    destination = (G.nodes[v]["y"], G.nodes[v]["x"])
+    assert data["bearing"] == round(ox.bearing.get_bearing(origin, destination), 3)
+    assert ox.bearing.get_bearing_vec(*origin, *destination) == pytest.approx(
+        data["bearing"], abs=1e-3
+    )
+    G.add_edge(u, u, geometry=LineString([origin[::-1], destination[::-1], origin[::-1]]))
+    G = ox.add_edge_bearings(G, use_geometry=True)
+    assert np.isnan(G.edges[u, u, 0]["bearing"])
+    assert G.edges[u, v, k]["bearing"] == data["bearing"]
+
+    # parse and impute edge speeds
+    maxspeeds = pd.Series(["30 mph", "50", "signals", ["30", "40 mph"], np.nan, "50"])
+    speeds = ox.speed._clean_maxspeeds(maxspeeds).tolist()
+    assert speeds[:2] == [30 * 1.60934, 50] and speeds[3] == 47 and speeds[5] == 50
+    assert np.isnan(speeds[2]) and np.isnan(speeds[4])
+    G = ox.add_edge_speeds(G, fallback=40)
+    G = ox.add_edge_speeds(G, hwy_speeds={"residential": 35})
+    assert all(
+        d["speed_kph"] == 35 for *_, d in G.edges(data=True) if d.get("highway") == "residential"
+    )
+
+    # route on time-dependent speed profiles, with a congested residential hour
+    G.remove_edge(u, u)
+    G = ox.add_edge_travel_times(G)
+    factors = {"residential": [1] * 8 + [0.25] + [1] * 15}
+    G = ox.add_edge_speed_profiles(G, hwy_factors=factors)
+    assert G.graph["speed_profiles"].shape == (len(G.edges), 24)
+    assert G.graph["speed_profiles"].dtype == np.float32
+    orig, dest = list(G.nodes)[0], list(G.nodes)[-1]
+    route, time = ox.shortest_path_time_dependent(G, orig, dest, 3600, return_time=True)
+    assert time == pytest.approx(nx.shortest_path_length(G, orig, dest, weight="travel_time"))
+    _, time_congested = ox.shortest_path_time_dependent(G, orig, dest, 8 * 3600, return_time=True)
+    assert time_congested >= time
+
+    # the speed profiles survive saving and loading the graph
+    folder = os.path.join(ox.settings.data_folder, "profiles")
+    ox.save_graphml(G, os.path.join(folder, "graph.graphml"))
+    ox.save_graph_binary(G, os.path.join(folder, "binary"))
+    ox.save_graph_geoparquet(G, os.path.join(folder, "graph.parquet"))
+    Gs = [
+        ox.load_graphml(os.path.join(folder, "graph.graphml")),
+        ox.load_graph_binary(os.path.join(folder, "binary")),
+        ox.load_graph_geoparquet(os.path.join(folder, "graph.parquet")),
+    ]
+    for G2 in Gs:
+        assert G2.graph["speed_profiles"].dtype == np.float32
+        assert np.array_equal(G2.graph["speed_profiles"], G.graph["speed_profiles"])
+        _, time2 = ox.shortest_path_time_dependent(G2, orig, dest, 8 * 3600, return_time=True)
+        assert time2 == pytest.approx(time_congested)
+    closed = pd.DataFrame([[0] * 24], index=pd.MultiIndex.from_tuples([(route[0], route[1], 0)]))
+    G = ox.add_edge_speed_profiles(G, edge_speeds=closed)
+    assert ox.shortest_path_time_dependent(G, orig, dest, 3600)[:2] != route[:2]
+    G.add_edge(orig, dest, length=1)
+    with pytest.raises(ValueError):
+        ox.shortest_path_time_dependent(G, orig, dest, 3600)
+
+
+def test_elevation():
+    # serve elevations from a local stand-in for an elevation API, where each
+    # location's elevation is its latitude plus longitude
+    requested = []
+    request_times = []
+    failing = set()
+
+    class ElevationHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            request_times.append(time.time())
+            locations = parse_qs(urlparse(self.path).query)["locations"][0].split("|")
+            requested.extend(locations)
+            lat_lngs = [[float(c) for c in location.split(",")] for location in locations]
+            results = [{"elevation": lat + lng} for lat, lng in lat_lngs]
+            if any(location in failing for location in locations):
+                results = []
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(json.dumps({"results": results}).encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), ElevationHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    provider = f"http://127.0.0.1:{server.server_port}/elevation?locations={{locations}}"
+
+    # request elevations in batches limited by URL length, then reuse them
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2", simplify=False)
+    G = ox.add_node_elevations(G, provider=provider, max_url_length=500, max_workers=2)
+    assert 0 < len(requested) == len(set(requested)) <= len(G)
+    for _, data in G.nodes(data=True):
+        assert data["elevation"] == pytest.approx(data["y"] + data["x"], abs=1e-3)
+    n_requested = len(requested)
+    G = ox.truncate.truncate_graph_dist(G, list(G)[0], 500)
+    G = ox.add_node_elevations(G, provider=provider)
+    assert len(requested) == n_requested
+
+    # if a batch fails, the batches that succeeded before it are still cached
+    provider = provider.replace("/elevation", "/failing")
+    x, y = G.nodes[list(G)[-1]]["x"], G.nodes[list(G)[-1]]["y"]
+    failing.add(f"{y:.5f},{x:.5f}")
+    kwargs = {"provider": provider, "max_url_length": 500, "max_workers": 1, "retries": 0}
+    with pytest.raises(Exception, match="failed after 0 retries"):
+        ox.add_node_elevations(G, **kwargs)
+    with open(ox.elevation._get_elevation_cache_filepath(provider)) as f:
+        assert 0 < len(json.load(f)) < len(G)
+    failing.clear()
+    requested.clear()
+    G = ox.add_node_elevations(G, **kwargs)
+    assert 0 < len(requested) < len(G)
+
+    # concurrent requests take turns pausing, so they are spaced out
+    request_times.clear()
+    url = provider.format(locations="1,2")
+    args = [(url, 1, 0.05, 0)] * 4
+    threads = [threading.Thread(target=ox.elevation._request_elevations, args=a) for a in args]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(request_times) == 4
+    assert np.diff(sorted(request_times)).min() > 0.04
+    server.shutdown()
+
+    batches = ox.elevation._make_elevation_batches(["1,2", "3,4", "5,6"], "{locations}", None, 7, 5)
+    assert batches == [["1,2", "3,4"], ["5,6"]]
+    with pytest.raises(ValueError):
+        ox.add_node_elevations(G, provider="google")
+
+    # sample elevations from two overlapping raster tiles, where each pixel's
+    # elevation is a plane over its center's coordinates, so interpolation is
+    # exact
+    os.makedirs(ox.settings.data_folder, exist_ok=True)
+    filepaths = []
+    for west in (-122.32, -122.30):
+        filepath = os.path.join(ox.settings.data_folder, f"dem_{west}.tif")
+        transform = rasterio.transform.from_origin(west, 37.82, 0.0001, 0.0001)
+        cols, rows = np.meshgrid(np.arange(250) + 0.5, np.arange(250) + 0.5)
+        xs, ys = transform * (cols, rows)
+        with rasterio.open(
+            filepath,
+            "w",
+            driver="GTiff",
+            width=250,
+            height=250,
+            count=1,
+            dtype="float64",
+            crs="epsg:4326",
+            transform=transform,
+        ) as dst:
+            dst.write(100 * (xs + 122.32) + 200 * (ys - 37.8), 1)
+        filepaths.append(filepath)
+
+    for cpus in (1, 2):
+        G = ox.add_node_elevations_raster(G, filepaths, cpus=cpus)
+        for _, data in G.nodes(data=True):
+            expected = 100 * (data["x"] + 122.32) + 200 * (data["y"] - 37.8)
+            assert data["elevation"] == pytest.approx(expected, abs=1e-3)
+
+    # grades along the edges of a plane match their endpoint grades where the
+    # edges are straight
+    G.add_edge(*list(G.edges)[0][:2], length=0)
+    G = ox.add_edge_grades(G)
+    G = ox.add_edge_grade_profiles(G, filepaths, interval=5)
+    for u, v, data in G.edges(data=True):
+        if data["length"] == 0:
+            assert np.isnan(data["grade"]) and np.isnan(data["grade_abs"])
+        elif "geometry" not in data and u != v:
+            assert data["grade_max"] == pytest.approx(data["grade"], abs=2e-3)
+            assert data["grade_mean"] == pytest.approx(data["grade_abs"], abs=2e-3)
+            climb = max(G.nodes[v]["elevation"] - G.nodes[u]["elevation"], 0)
+            assert data["climb"] == pytest.approx(climb, abs=2e-3)
+
+
+def test_columnar():
+    # test converting a graph to columns and back again
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2")
+    columns = ox.columnar.graph_to_columns(G)
+    assert columns["nodes"]["highway"].dtype == "category"
+    assert len(columns["offsets"]) == len(G.edges) + 1
+    G2 = ox.columnar.graph_from_columns(columns)
+    assert G2.graph == G.graph
+    assert dict(G2.nodes(data=True)) == dict(G.nodes(data=True))
+    for u, v, k, data in G.edges(keys=True, data=True):
+        assert G2.edges[u, v, k].keys() == data.keys()
+        assert all(str(G2.edges[u, v, k][a]) == str(data[a]) for a in data)
+
+    # project, measure, and get bounds of the columnar graph directly
+    lengths = columns["edges"]["length"].copy()
+    columns_proj = ox.columnar.project_columns(columns)
+    G_proj = ox.project_graph(G)
+    node = list(G.nodes)[0]
+    assert columns_proj["nodes"].loc[node, "x"] == G_proj.nodes[node]["x"]
+    columns_proj = ox.columnar.add_edge_speeds(columns_proj, fallback=30)
+    columns_proj = ox.columnar.add_edge_lengths(columns_proj)
+    assert columns_proj["edges"] is not columns["edges"]
+    assert columns_proj["offsets"] is not columns["offsets"]
+    assert "speed_kph" not in columns["edges"].columns
+    assert columns["edges"]["length"].equals(lengths)
+
+    # columnar stats match the graph's stats
+    stats = ox.basic_stats(G)
+    stats_columns = ox.columnar.basic_stats(columns)
+    assert stats_columns.keys() == stats.keys()
+    for key, value in stats.items():
+        if isinstance(value, float):
+            assert stats_columns[key] == pytest.approx(value, nan_ok=True)
+        else:
+            assert stats_columns[key] == value
+    columns_proj["graph"].pop("streets_per_node", None)
+    stats_proj = ox.columnar.basic_stats(columns_proj, area=1e6, circuity_dist="euclidean")
+    assert stats_proj["intersection_count"] == stats["intersection_count"]
+    assert stats_proj["streets_per_node_counts"] == stats["streets_per_node_counts"]
+    assert ox.columnar.get_bounds(columns) == ox.utils_graph.get_graph_bounds(G)
+    columns = ox.columnar.add_edge_lengths(columns)
+    columns = ox.columnar.add_edge_speeds(columns, fallback=30)
+    G = ox.add_edge_speeds(G, fallback=30)
+    edge = list(G.edges)[0]
+    assert columns["edges"]["speed_kph"].iloc[0] == G.edges[edge]["speed_kph"]
+    columns = ox.columnar.add_edge_travel_times(columns)
+    assert columns["edges"]["travel_time"].notnull().all()
+
+    # plot the columnar graph directly
+    fig, ax = ox.plot_graph(columns, show=False, save=False, close=True, annotate=True)
+    fig, ax = ox.plot_graph(columns_proj, show=False, save=False, close=True, use_geom=False)
+
+    # graphs without edges or nodes convert too
+    G = nx.MultiDiGraph(crs=ox.settings.default_crs)
+    assert len(ox.columnar.graph_from_columns(ox.columnar.graph_to_columns(G))) == 0
+    G.add_node(1, x=-122.3, y=37.8)
+    columns = ox.columnar.graph_to_columns(G)
+    assert len(columns["edges"]) == 0
+    assert dict(ox.columnar.graph_from_columns(columns).nodes(data=True)) == {1: G.nodes[1]}
+
 
 def test_routing_folium():
 
@@ -324,6 +657,113 @@ def test_api_endpoints():
     ox.settings.overpass_endpoint = default_overpass_endpoint
 
 
+def test_graph_file_saving_loading():
+    # save/load graph as binary files
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2")
+    ox.save_graph_binary(G)
+    filepath = os.path.join(ox.settings.data_folder, "graph_binary")
+    G2 = ox.load_graph_binary(filepath)
+    assert G2.graph == G.graph
+    assert dict(G2.nodes(data=True)) == dict(G.nodes(data=True))
+    for u, v, k, data in G.edges(keys=True, data=True):
+        assert G2.edges[u, v, k].keys() == data.keys()
+        assert all(str(G2.edges[u, v, k][a]) == str(data[a]) for a in data)
+    columns = ox.load_graph_binary(filepath, mmap=True, as_columns=True)
+    assert isinstance(columns["coords"], np.memmap)
+
+    # save/load graph as geoparquet files, then load just a bounding box
+    ox.save_graph_geoparquet(G, grid_size=4)
+    filepath = os.path.join(ox.settings.data_folder, "graph_geoparquet")
+    G2 = ox.load_graph_geoparquet(filepath)
+    assert dict(G2.nodes(data=True)) == dict(G.nodes(data=True))
+    for u, v, k, data in G.edges(keys=True, data=True):
+        assert all(G2.edges[u, v, k][a] == data[a] for a in data if a != "geometry")
+    bbox = (37.810, 37.805, -122.300, -122.305)
+    G2 = ox.load_graph_geoparquet(filepath, bbox=bbox, node_attrs=[], edge_attrs=["length"])
+    G3 = ox.truncate.truncate_graph_bbox(G, *bbox, retain_all=True)
+    assert set(G2.edges(keys=True)) == set(G3.edges(keys=True))
+
+    # graphs without edges or nodes save and load as geoparquet too
+    G2 = nx.MultiDiGraph(crs=ox.settings.default_crs)
+    filepath = os.path.join(ox.settings.data_folder, "graph_geoparquet_empty")
+    ox.save_graph_geoparquet(G2, filepath)
+    assert len(ox.load_graph_geoparquet(filepath)) == 0
+    G2.add_node(1, x=-122.302, y=37.807)
+    ox.save_graph_geoparquet(G2, filepath)
+    G3 = ox.load_graph_geoparquet(filepath, bbox=bbox)
+    assert dict(G3.nodes(data=True)) == dict(G2.nodes(data=True))
+    assert len(G3.edges) == 0
+
+    # save graph as spatial tiles, then load just the tiles within a polygon
+    ox.save_graph_tiles(G, grid_size=4)
+    filepath = os.path.join(ox.settings.data_folder, "graph_tiles")
+    polygon = Polygon([(-122.305, 37.805), (-122.300, 37.806), (-122.302, 37.810)])
+    G2 = ox.load_graph_tiles(filepath, polygon, retain_all=True, truncate_by_edge=True)
+    G3 = ox.truncate.truncate_graph_polygon(G, polygon, retain_all=True, truncate_by_edge=True)
+    assert set(G2.nodes) == set(G3.nodes)
+    assert set(G2.edges(keys=True)) == set(G3.edges(keys=True))
+    G2 = ox.load_graph_tiles(filepath, polygon)
+    G3 = ox.truncate.truncate_graph_polygon(G, polygon)
+    assert set(G2.nodes) == set(G3.nodes)
+    assert set(G2.edges(keys=True)) == set(G3.edges(keys=True))
+    G2 = ox.load_graph_tiles(filepath, polygon, truncate_by_edge=True)
+    G3 = ox.truncate.truncate_graph_polygon(G, polygon, truncate_by_edge=True)
+    assert set(G2.nodes) == set(G3.nodes)
+    assert set(G2.edges(keys=True)) == set(G3.edges(keys=True))
+
+    # save graph as geopackage and shapefiles, directed and in chunks
+    ox.save_graph_geopackage(G, directed=True, chunksize=50)
+    ox.save_graph_shapefile(G, chunksize=50)
+
+    # save/load graph as graphml file, with a custom attribute type schema.
+    # values that cannot be converted to the schema's type stay strings
+    G2 = G.copy()
+    u, v, k = list(G2.edges)[0]
+    G2.edges[u, v, k]["lanes"] = "2;3"
+    G2.edges[u, v, k]["oneway"] = -1
+    ox.save_graphml(G2)
+    filepath = os.path.join(ox.settings.data_folder, "graph.graphml")
+    G2 = ox.load_graphml(filepath, edge_dtypes={"lanes": int})
+    assert G2.edges[u, v, k]["lanes"] == "2;3"
+    assert G2.edges[u, v, k]["oneway"] == -1 and type(G2.edges[u, v, k]["oneway"]) is int
+    for u, v, k, data in list(G.edges(keys=True, data=True))[1:]:
+        assert G2.edges[u, v, k]["osmid"] == data["osmid"]
+        assert G2.edges[u, v, k]["length"] == data["length"]
+        assert G2.edges[u, v, k]["oneway"] == data["oneway"]
+        if "lanes" in data:
+            assert isinstance(G2.edges[u, v, k]["lanes"], (int, list))
+
+    # save/load gzip-compressed graphml file, and graphml file for gephi
+    filepath = os.path.join(ox.settings.data_folder, "graph.graphml.gz")
+    ox.save_graphml(G, filepath)
+    G2 = ox.load_graphml(filepath)
+    assert G2.graph == {key: str(value) for key, value in G.graph.items()}
+    assert set(G2.edges(keys=True)) == set(G.edges(keys=True))
+    ox.save_graphml(G, gephi=True)
+    G2 = nx.read_graphml(os.path.join(ox.settings.data_folder, "graph.graphml"))
+    assert len(G2.edges) == len(G.edges)
+    assert all("geometry" in data for _, _, data in G2.edges(data=True))
+
+    # save osm xml file merging edges by way, then load it back
+    default_all_oneway = ox.settings.all_oneway
+    ox.settings.all_oneway = True
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2", simplify=False)
+    nx.set_edge_attributes(G, nx.get_edge_attributes(G, "osmid"), "uniqueid")
+    filepath = os.path.join(ox.settings.data_folder, "graph.osm")
+    ox.save_graph_xml(G, filepath, merge_edges=True, edge_tag_aggs=[("length", "sum")])
+    G2 = ox.graph_from_xml(filepath, simplify=False)
+    assert set(G2.edges) == set(G.edges)
+    assert ox.io._order_way_nodes([3, 1, 2], [1, 2, 3]) == [3, 1, 2, 3]
+    ox.settings.all_oneway = default_all_oneway
+
+    assert ox.io._parse_list_string("['a', \"O'Farrell St\", 'b, c']") == [
+        "a",
+        "O'Farrell St",
+        "b, c",
+    ]
+    assert ox.io._parse_list_string("[1, 2]", int) == [1, 2]
+
+
 def test_network_saving_loading():
 
     # save graph as shapefile and geopackage
@@ -398,6 +838,229 @@ def test_get_network_methods():
     )
 
 
+def test_basic_stats():
+    # street stats match the graph's undirected representation
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2")
+    stats = ox.basic_stats(G, area=1e6)
+    G_undir = G.to_undirected()
+    assert stats["street_segments_count"] == len(G_undir.edges)
+    street_length_total = sum(d["length"] for u, v, d in G_undir.edges(data=True))
+    assert stats["street_length_total"] == pytest.approx(street_length_total)
+    assert stats["street_density_km"] == pytest.approx(street_length_total)
+    assert sum(stats["streets_per_node_counts"].values()) == len(G)
+    assert stats["self_loop_proportion"] == 0
+    assert stats["circuity_avg"] >= 1
+
+    # gridded stats add up to the graph's stats, and cells contain their nodes
+    G_proj = ox.project_graph(G)
+    stats = ox.basic_stats(G_proj, circuity_dist="euclidean")
+    for shape in ("square", "hex"):
+        cells = ox.gridded_stats(G_proj, 300, shape=shape)
+        assert cells["node_count"].sum() == len(G)
+        assert cells["intersection_count"].sum() == stats["intersection_count"]
+        assert cells["street_segments_count"].sum() == stats["street_segments_count"]
+        assert cells["street_length_total"].sum() == pytest.approx(stats["street_length_total"])
+        assert cells.unary_union.contains(
+            MultiPoint([(d["x"], d["y"]) for _, d in G_proj.nodes(data=True)])
+        )
+        assert cells["orientation_entropy"].max() <= np.log(36)
+    cells = ox.gridded_stats(G_proj, 1e6)
+    assert cells["circuity_avg"].iloc[0] == pytest.approx(stats["circuity_avg"])
+    with pytest.raises(ValueError):
+        ox.gridded_stats(G, 300)
+
+    # graphs without edges get node-only cells, and empty graphs get no cells
+    G_proj.remove_edges_from(list(G_proj.edges))
+    cells = ox.gridded_stats(G_proj, 300)
+    assert cells["node_count"].sum() == len(G_proj)
+    assert cells["street_segments_count"].sum() == 0
+    assert cells["orientation_entropy"].isnull().all()
+    G_proj.remove_nodes_from(list(G_proj.nodes))
+    assert len(ox.gridded_stats(G_proj, 300, shape="hex")) == 0
+
+    # reciprocal edges count once, parallel edges each count, self-loops once
+    H = nx.MultiDiGraph()
+    H.add_nodes_from(range(5))
+    H.add_edges_from([(0, 1, 0), (1, 0, 0), (1, 0, 1), (2, 2, 0), (2, 2, 1), (1, 2, 0)])
+    spn = ox.utils_graph.count_streets_per_node(H)
+    assert spn == {0: 2, 1: 3, 2: 3, 3: 0, 4: 0}
+    assert ox.utils_graph.count_streets_per_node(H, nodes=[1, 3]) == {1: 3, 3: 0}
+
+
+def test_centrality():
+    # exact centralities match networkx, in serial and in parallel
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2")
+    bc = nx.betweenness_centrality(G, weight="length")
+    cc = nx.closeness_centrality(G, distance="length")
+    for cpus in (1, 2):
+        bc2 = ox.centrality.betweenness_centrality(G, cpus=cpus)
+        cc2 = ox.centrality.closeness_centrality(G, cpus=cpus)
+        assert bc2 == pytest.approx(bc)
+        assert cc2 == pytest.approx(cc)
+
+    # and on undirected graphs, normalized or not
+    G_undir = ox.utils_graph.get_undirected(G)
+    for normalized in (True, False):
+        bc_undir = nx.betweenness_centrality(G_undir, weight="length", normalized=normalized)
+        bc2 = ox.centrality.betweenness_centrality(G_undir, normalized=normalized)
+        assert bc2 == pytest.approx(bc_undir)
+
+    # sampled centralities and their standard errors
+    bc2, error = ox.centrality.betweenness_centrality(G, k=20, seed=0, return_error=True)
+    assert set(bc2) == set(error) == set(G)
+    assert all(e >= 0 for e in error.values())
+    cc2, error = ox.centrality.closeness_centrality(G, k=len(G), return_error=True)
+    assert cc2 == pytest.approx(cc)
+    assert set(error.values()) == {0}
+
+    # local centralities only count paths up to the radius
+    radius = 200
+    cc2 = ox.centrality.closeness_centrality(G, radius=radius)
+    for node in list(G)[:10]:
+        sp = nx.single_source_dijkstra_path_length(G.reverse(), node, radius, weight="length")
+        total = sum(sp.values())
+        assert cc2[node] == pytest.approx((len(sp) - 1) / total if total > 0 else 0)
+    bc2 = ox.centrality.betweenness_centrality(G, radius=radius, normalized=False)
+    assert all(b <= bc[node] * (len(G) - 1) * (len(G) - 2) + 1e-9 for node, b in bc2.items())
+
+    stats = ox.extended_stats(G, bc=True, cc=True)
+    assert stats["betweenness_centrality"] == pytest.approx(bc)
+    assert stats["closeness_centrality"] == pytest.approx(cc)
+
+    # eccentricity matches networkx, and saves the distance matrix
+    G_strong = ox.utils_graph.get_largest_component(G, strongly=True)
+    ecc = nx.eccentricity(G_strong, sp=dict(nx.shortest_path_length(G_strong, weight="length")))
+    filepath = os.path.join(ox.settings.data_folder, "distances.npy")
+    for cpus in (1, 2):
+        assert ox.centrality.eccentricity(G_strong, cpus=cpus, filepath=filepath) == ecc
+    distances = np.load(filepath, mmap_mode="r")
+    assert distances.dtype == np.float32 and distances.shape == (len(G_strong), len(G_strong))
+    sp = nx.single_source_dijkstra_path_length(G_strong, list(G_strong)[0], weight="length")
+    assert distances[0] == pytest.approx([sp[node] for node in G_strong])
+    with pytest.raises(nx.NetworkXError):
+        ox.centrality.eccentricity(G)
+
+    stats = ox.extended_stats(G, ecc=True, cpus=2)
+    assert stats["eccentricity"] == ecc
+    assert stats["diameter"] == max(ecc.values())
+    assert stats["radius"] == min(ecc.values())
+
+
+def test_extended_stats():
+    # selected metrics calculate only what they depend on, and are cached
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2")
+    stats, timings = ox.extended_stats(G, metrics=["diameter", "pagerank_max"], return_timings=True)
+    assert list(stats) == ["diameter", "pagerank_max"]
+    assert set(timings) == {
+        "G_strong",
+        "eccentricity",
+        "diameter",
+        "G_dir",
+        "pagerank",
+        "pagerank_max_node",
+        "pagerank_max",
+    }
+    stats2, timings = ox.extended_stats(G, metrics=["diameter"], return_timings=True)
+    assert stats2["diameter"] == stats["diameter"]
+    assert timings == {}
+
+    # modifying the returned stats does not modify the cached stats
+    stats = ox.extended_stats(G, metrics=["eccentricity"])
+    stats["eccentricity"].clear()
+    assert len(ox.extended_stats(G, metrics=["eccentricity"])["eccentricity"]) > 0
+
+    # unseeded sampled centralities are not cached, but seeded ones are
+    metrics = ["betweenness_centrality"]
+    _, timings = ox.extended_stats(G, metrics=metrics, k=10, return_timings=True)
+    _, timings = ox.extended_stats(G, metrics=metrics, k=10, return_timings=True)
+    assert "betweenness_centrality" in timings
+    _, timings = ox.extended_stats(G, metrics=metrics, k=10, seed=0, return_timings=True)
+    _, timings = ox.extended_stats(G, metrics=metrics, k=10, seed=0, return_timings=True)
+    assert timings == {}
+
+    # changing the graph invalidates the cache
+    u, v, k = list(G.edges(keys=True))[0]
+    G.edges[u, v, k]["length"] += 1
+    _, timings = ox.extended_stats(G, metrics=["diameter"], return_timings=True)
+    assert "diameter" in timings
+
+    # the default metrics are unchanged
+    stats = ox.extended_stats(G, ecc=True, bc=True, cc=True)
+    assert stats["clustering_coefficient_avg"] == nx.average_clustering(nx.Graph(G))
+    assert stats["pagerank"] == nx.pagerank(nx.DiGraph(G), weight="length")
+    assert "node_connectivity" not in stats
+
+    with pytest.raises(ValueError):
+        ox.extended_stats(G, metrics=["G_dir"])
+
+
+def test_basic_stats_batch():
+    # serve the street network from a local stand-in for the Overpass API
+    G = ox.graph_from_xml("tests/input_data/West-Oakland.osm.bz2", simplify=False)
+    elements = [
+        {"type": "node", "id": n, "lat": d["y"], "lon": d["x"]} for n, d in G.nodes(data=True)
+    ]
+    for i, (u, v, d) in enumerate(G.edges(data=True)):
+        if d["oneway"] or u < v:
+            tags = {"highway": d["highway"], "oneway": "yes" if d["oneway"] else "no"}
+            elements.append({"type": "way", "id": i, "nodes": [u, v], "tags": tags})
+    requested = []
+
+    class OverpassHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(
+                b"Connected as: 1\nCurrent time: 0\nRate limit: 2\n2 slots available now."
+            )
+
+        def do_POST(self):
+            requested.append(self.path)
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(json.dumps({"elements": elements}).encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), OverpassHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    overpass_endpoint, use_cache = ox.settings.overpass_endpoint, ox.settings.use_cache
+    ox.settings.overpass_endpoint = f"http://127.0.0.1:{server.server_port}/api"
+    ox.settings.use_cache = False
+
+    # get stats for two halves of the network, and an empty polygon that fails
+    north, south, east, west = ox.utils_graph.get_graph_bounds(G)
+    mid = (east + west) / 2
+    polygons = [Polygon([(west, south), (mid, south), (mid, north), (west, north)])]
+    polygons.append(Polygon([(mid, south), (east, south), (east, north), (mid, north)]))
+    polygons.append(Polygon([(0, 0), (0.01, 0), (0.01, 0.01), (0, 0.01)]))
+    G_west = ox.graph_from_polygon(polygons[0])
+    area = ox.projection.project_geometry(polygons[0])[0].area
+    stats = ox.basic_stats(G_west, area=area)
+
+    filepath = os.path.join(ox.settings.data_folder, "stats_checkpoint.jsonl")
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    for cpus in (1, 2):
+        df = ox.basic_stats_batch(polygons, filepath=filepath, cpus=cpus)
+        assert list(df.index) == [0, 1, 2]
+        assert df.loc[0, "street_length_total"] == pytest.approx(stats["street_length_total"])
+        assert df.loc[0, "streets_per_node_counts_3"] == stats["streets_per_node_counts"][3]
+        assert df["error"].isnull().tolist() == [True, True, False]
+
+    # completed places were checkpointed and are not requested again, even
+    # at different list positions, unless requested with different arguments
+    n_requested = len(requested)
+    df = ox.basic_stats_batch(polygons[1::-1], filepath=filepath, cpus=2)
+    assert len(requested) == n_requested
+    assert df.loc[1, "street_length_total"] == pytest.approx(stats["street_length_total"])
+    ox.basic_stats_batch(polygons[:1], filepath=filepath, simplify=False)
+    assert len(requested) == n_requested + 1
+    ox.settings.overpass_endpoint, ox.settings.use_cache = overpass_endpoint, use_cache
+    server.shutdown()
+
+
 def test_stats():
     # create graph, add bearings, project it
     G = ox.graph_from_point(location_point, dist=500, network_type="drive")